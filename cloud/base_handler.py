@@ -2,12 +2,26 @@
 Base handler class for request processing
 """
 from abc import ABC, abstractmethod
-from generate_pet_asc_table import Petscii
+from typing import Callable, Iterator, Optional, Tuple
+from generate_pet_asc_table import PETSCII_CODEC, FALLBACK_ERRORS
 
 
 class BaseHandler(ABC):
     """Base class for all request handlers"""
 
+    # Lower case input prefixes the dispatcher routes to this handler
+    prefixes: Tuple[str, ...] = ()
+    # Session 'active_module' value that routes unprefixed input to this handler
+    module_key: Optional[str] = None
+
+    # Execution budget: seconds the dispatcher waits for a response, requests
+    # run at the same time and further requests that may wait for a slot
+    timeout: float = 30.0
+    max_workers: int = 4
+    max_queue: int = 16
+    # Whether the dispatcher streams requests through handle_progress()
+    reports_progress: bool = False
+
     @abstractmethod
     def can_handle(self, text: str, session_id: int = 0) -> bool:
         """
@@ -36,6 +50,39 @@ class BaseHandler(ABC):
         """
         pass
 
+    def handle_stream(self, text: str, session_id: int = 0) -> Iterator[str]:
+        """
+        Process the request and yield the response in chunks
+
+        Handlers that produce output incrementally (e.g. LLM tokens) override
+        this; the default yields the whole handle() response at once.
+
+        Args:
+            text: UTF-8 text to process
+            session_id: The session ID for the request
+
+        Yields:
+            UTF-8 response text chunks
+        """
+        yield self.handle(text, session_id)
+
+    def handle_progress(self, text: str, session_id: int, progress: Callable[[str], None]) -> str:
+        """
+        Process the request, reporting progress while it runs
+
+        Used instead of handle_stream() for handlers with reports_progress set;
+        the default reports nothing.
+
+        Args:
+            text: UTF-8 text to process
+            session_id: The session ID for the request
+            progress: Called with each chunk of progress text, sent to the client as is
+
+        Returns:
+            UTF-8 response text
+        """
+        return self.handle(text, session_id)
+
     @staticmethod
     def petscii_to_utf8(petscii_bytes: bytes) -> str:
         """
@@ -47,18 +94,20 @@ class BaseHandler(ABC):
         Returns:
             UTF-8 string
         """
-        ascii_bytes = bytes([Petscii.petscii2ascii(b) for b in petscii_bytes])
-        return ascii_bytes.decode('ascii', errors='replace')
+        return petscii_bytes.decode(PETSCII_CODEC, errors='replace')
 
     @staticmethod
     def utf8_to_petscii(text: str) -> bytes:
         """
         Convert UTF-8 string to PETSCII bytes
 
+        Characters outside ASCII are replaced by an ASCII approximation
+        (e.g. curly quotes, dashes, accented letters) or '?'.
+
         Args:
             text: UTF-8 string
 
         Returns:
             PETSCII encoded bytes
         """
-        return bytes([Petscii.ascii2petscii(ord(c)) for c in text])
+        return text.encode(PETSCII_CODEC, errors=FALLBACK_ERRORS)
@@ -0,0 +1,227 @@
+"""
+Offline benchmark and regression check for the CSDB page parsers
+
+Runs parse_csdb_find, parse_csdb_group_detail and parse_csdb_release_detail
+over the saved pages in fixtures/csdb/ (the file name prefix selects the
+parser: search_*, group_*, release_*). For each page it reports the median
+parse time and the peak memory, compares the result with the golden JSON
+next to the page, and fails when a parser got slower than the recorded
+baseline by more than the threshold. No network access is needed.
+
+Golden results are those of html.parser, the default backend. Running with
+CSDB_HTML_PARSER=lxml shows the pages lxml parses differently (broken
+markup such as group_broken_markup.html); record live pages with the
+record command to check it against real csdb.dk markup.
+
+Times are stored relative to a fixed pure-Python calibration workload, so
+a baseline recorded on one machine is usable on another. Baselines are
+kept per HTML backend (lxml, html.parser).
+
+Usage:
+    python bench_parsers.py                      # report, check golden results and baseline
+    python bench_parsers.py --update-goldens     # accept current results as golden
+    python bench_parsers.py --update-baseline    # record current times as baseline
+    python bench_parsers.py record URL NAME      # save a live csdb.dk page as a fixture
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import csdb_html
+from csdb_group_parser import parse_csdb_group_detail
+from csdb_release_parser import parse_csdb_release_detail
+from csdb_search_parser import parse_csdb_find
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures' / 'csdb'
+BASELINE_FILE = FIXTURE_DIR / 'baseline.json'
+
+# Fixture file name prefix -> parser
+PARSERS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    'search': parse_csdb_find,
+    'group': parse_csdb_group_detail,
+    'release': parse_csdb_release_detail,
+}
+
+# Allowed slowdown against the baseline (0.5 = 50 % slower)
+DEFAULT_THRESHOLD = 0.5
+# Slowdowns smaller than this many seconds are timer noise, whatever the ratio
+NOISE_FLOOR_S = 0.002
+DEFAULT_REPEAT = 7
+
+
+def fixtures() -> List[Path]:
+    """Saved pages with a known parser, sorted by name"""
+    return sorted(p for p in FIXTURE_DIR.glob('*.html') if p.name.split('_')[0] in PARSERS)
+
+
+def parser_for(path: Path) -> Callable[[str], Dict[str, Any]]:
+    """Parser selected by the fixture's name prefix"""
+    return PARSERS[path.name.split('_')[0]]
+
+
+def golden_path(path: Path) -> Path:
+    return path.with_suffix('.json')
+
+
+def to_json(result: Dict[str, Any]) -> str:
+    """Serialize a result for golden comparison; key order is significant"""
+    return json.dumps(result, indent=1, ensure_ascii=False) + '\n'
+
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Time a fixed pure-Python workload, the unit baselines are stored in
+
+    Returns:
+        Median seconds of the workload
+    """
+    def workload():
+        words = [f"release{i} by group{i % 97}" for i in range(20000)]
+        index: Dict[str, int] = {}
+        for w in words:
+            for part in w.split():
+                index[part] = index.get(part, 0) + 1
+        return sorted(index)[:10]
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench(path: Path, repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """
+    Parse one fixture repeatedly
+
+    Returns:
+        Dict with 'result', 'median_s' (median parse time) and 'peak_bytes' (peak traced memory)
+    """
+    html = path.read_text(encoding='utf-8')
+    parse = parser_for(path)
+    result = parse(html)  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(html)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        parse(html)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'result': result, 'median_s': statistics.median(times), 'peak_bytes': peak}
+
+
+def load_baseline() -> Dict[str, Dict[str, float]]:
+    """Recorded relative times per backend and fixture"""
+    if BASELINE_FILE.exists():
+        return json.loads(BASELINE_FILE.read_text())
+    return {}
+
+
+def run(repeat: int = DEFAULT_REPEAT, threshold: float = DEFAULT_THRESHOLD, update_goldens: bool = False,
+        update_baseline: bool = False, out=sys.stdout) -> List[str]:
+    """
+    Benchmark all fixtures and check them against golden results and the baseline
+
+    Args:
+        repeat: Timed parses per fixture
+        threshold: Allowed slowdown against the baseline
+        update_goldens: Write current results as golden JSON; without it a missing golden fails
+        update_baseline: Record current times as the baseline of this backend
+        out: Stream the report is written to
+
+    Returns:
+        Failure messages; empty when everything passed
+    """
+    backend = csdb_html.HTML_BACKEND
+    unit = calibrate()
+    baseline = load_baseline()
+    recorded = baseline.get(backend, {})
+    current: Dict[str, float] = {}
+    failures = []
+
+    print(f"Backend {backend}, calibration {unit * 1000:.1f} ms, threshold +{threshold:.0%}", file=out)
+    print(f"{'fixture':<28} {'median':>9} {'relative':>9} {'baseline':>9} {'peak':>9}  golden", file=out)
+    for path in fixtures():
+        stats = bench(path, repeat)
+        relative = stats['median_s'] / unit
+        current[path.name] = round(relative, 4)
+
+        golden = golden_path(path)
+        actual = to_json(stats['result'])
+        if update_goldens:
+            golden.write_text(actual, encoding='utf-8')
+            status = 'written'
+        elif not golden.exists():
+            status = 'MISSING'
+            failures.append(f"{path.name}: no {golden.name}; check the result and run with --update-goldens")
+        elif golden.read_text(encoding='utf-8') == actual:
+            status = 'ok'
+        else:
+            status = 'DIFFERS'
+            failures.append(f"{path.name}: result differs from {golden.name}")
+
+        expected: Optional[float] = recorded.get(path.name)
+        if (expected and not update_baseline and relative > expected * (1 + threshold)
+                and (relative - expected) * unit > NOISE_FLOOR_S):
+            status += ' SLOWER'
+            failures.append(f"{path.name}: {relative:.3f} units, baseline {expected:.3f} (+{threshold:.0%} allowed)")
+
+        print(f"{path.name:<28} {stats['median_s'] * 1000:>7.2f}ms {relative:>9.3f} "
+              f"{expected if expected else '-':>9} {stats['peak_bytes'] / 1024:>7.0f}KB  {status}", file=out)
+
+    if update_baseline:
+        baseline[backend] = current
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=1, sort_keys=True) + '\n')
+        print(f"Baseline for {backend} written to {BASELINE_FILE.name}", file=out)
+    return failures
+
+
+def record(url: str, name: str):
+    """Save a live csdb.dk page as a fixture (the only command needing network access)"""
+    from http_client import get_http_session
+    prefix = name.split('_')[0]
+    if prefix not in PARSERS or not name.endswith('.html'):
+        raise SystemExit(f"Fixture name must look like {{{'|'.join(PARSERS)}}}_<what>.html")
+    resp = get_http_session().get(url)
+    resp.raise_for_status()
+    (FIXTURE_DIR / name).write_text(resp.text, encoding='utf-8')
+    print(f"Saved {url} as {name}; run with --update-goldens after checking the parse result")
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Benchmark the CSDB page parsers on saved pages')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Timed parses per fixture (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Allowed slowdown against the baseline (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--update-goldens', action='store_true', help='Accept current results as golden')
+    parser.add_argument('--update-baseline', action='store_true', help='Record current times as baseline')
+    commands = parser.add_subparsers(dest='command')
+    record_cmd = commands.add_parser('record', help='Save a live csdb.dk page as a fixture')
+    record_cmd.add_argument('url')
+    record_cmd.add_argument('name', help='Fixture file name, e.g. group_oxyron.html')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.url, args.name)
+        return
+    failures = run(args.repeat, args.threshold, args.update_goldens, args.update_baseline)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,10 @@ Processes requests starting with "I:"
 """
 import os
 import logging
+from typing import Iterator, Optional, Tuple
 from base_handler import BaseHandler
 from dotenv import load_dotenv
-from shared_state import get_session_state
+from shared_state import get_session_state, session_lock
 
 # Load environment variables (override=True to prevent system vars from interfering)
 load_dotenv(override=True)
@@ -26,6 +27,11 @@ Be friendly but brief."""
 class ChatHandler(BaseHandler):
     """Handler for general chat requests using LLM"""
 
+    prefixes = ("i:",)
+    module_key = 'i'
+    # LLM completions can take a while
+    timeout = 60.0
+
     def __init__(self):
         """Initialize ChatHandler with LangChain components"""
         self.llm = None
@@ -133,23 +139,9 @@ class ChatHandler(BaseHandler):
         Returns:
             UTF-8 response text
         """
-        t = text.strip()
-        t_lower = t.lower()
-        state = get_session_state(session_id)
-
-        if t_lower.startswith("i:"):
-            query = t[2:].strip()
-            if not query:
-                state['active_module'] = 'i'
-                return "Chat mode. I'm listening."
-        elif state.get('active_module') == 'i':
-            query = t
-        else:
-            # This should not be reached if can_handle is correct
-            return self._fallback_response("Internal error: handle called unexpectedly.")
-
-        if not query:
-            return "Please provide a question or statement."
+        query, reply = self._parse_query(text, session_id)
+        if reply is not None:
+            return reply
 
         logger.info(f"Chat query: {query}")
 
@@ -166,6 +158,63 @@ class ChatHandler(BaseHandler):
             logger.error(f"Error processing chat request: {e}")
             return f"Error: {str(e)}"
 
+    def handle_stream(self, text: str, session_id: int = 0) -> Iterator[str]:
+        """
+        Process chat request, yielding LLM tokens as they arrive
+
+        Args:
+            text: UTF-8 text (should start with "I:")
+            session_id: The session ID for the request
+
+        Yields:
+            UTF-8 response text chunks
+        """
+        query, reply = self._parse_query(text, session_id)
+        if reply is not None:
+            yield reply
+            return
+
+        logger.info(f"Chat query (streamed): {query}")
+
+        if not self.llm:
+            yield self._fallback_response(query)
+            return
+
+        yield from self._stream_llm(query)
+
+    def _parse_query(self, text: str, session_id: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract the chat query from the request text
+
+        Args:
+            text: UTF-8 text
+            session_id: The session ID for the request
+
+        Returns:
+            Tuple of (query, reply); reply is set when the request is answered
+            without asking the LLM
+        """
+        t = text.strip()
+        t_lower = t.lower()
+        state = get_session_state(session_id)
+
+        if t_lower.startswith("i:"):
+            query = t[2:].strip()
+            if not query:
+                with session_lock(session_id):
+                    state['active_module'] = 'i'
+                return None, "Chat mode. I'm listening."
+        elif state.get('active_module') == 'i':
+            query = t
+        else:
+            # This should not be reached if can_handle is correct
+            return None, self._fallback_response("Internal error: handle called unexpectedly.")
+
+        if not query:
+            return None, "Please provide a question or statement."
+
+        return query, None
+
     def _fallback_response(self, query: str) -> str:
         """
         Provide fallback response when LLM is not available
@@ -189,16 +238,45 @@ class ChatHandler(BaseHandler):
             LLM response
         """
         try:
-            from langchain_core.messages import HumanMessage, SystemMessage
-
-            messages = [
-                SystemMessage(content=CHAT_SYSTEM_PROMPT),
-                HumanMessage(content=query)
-            ]
-
-            response = self.llm.invoke(messages)
+            response = self.llm.invoke(self._build_messages(query))
             return response.content
 
         except Exception as e:
             logger.error(f"Error querying LLM: {e}")
             return "I encountered an error processing your request."
+
+    def _stream_llm(self, query: str) -> Iterator[str]:
+        """
+        Query LLM with the user's request and yield the answer as it is generated
+
+        Args:
+            query: User query
+
+        Yields:
+            LLM response tokens
+        """
+        try:
+            for chunk in self.llm.stream(self._build_messages(query)):
+                if chunk.content:
+                    yield chunk.content
+
+        except Exception as e:
+            logger.error(f"Error streaming from LLM: {e}")
+            yield "I encountered an error processing your request."
+
+    def _build_messages(self, query: str) -> list:
+        """
+        Build the LLM message list for a user query
+
+        Args:
+            query: User query
+
+        Returns:
+            System and user messages
+        """
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        return [
+            SystemMessage(content=CHAT_SYSTEM_PROMPT),
+            HumanMessage(content=query)
+        ]
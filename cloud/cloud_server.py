@@ -7,18 +7,25 @@ Requires C64 Ultimate with network target on the client side.
 """
 import socket
 import threading
+import asyncio
 import logging
 import sys
 import os
 import argparse
-from typing import Tuple, Optional, List
-from generate_pet_asc_table import Petscii
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple, Optional, List, Iterator
+from generate_pet_asc_table import Petscii, PETSCII_CODEC
 from base_handler import BaseHandler
 from chat_handler import ChatHandler
 from help_handler import HelpHandler
 from python_eval_handler import PythonEvalHandler
 from csdb_handler import CSDBHandler
-from shared_state import get_session_state
+from handler_pool import HandlerBusyError, HandlerPool
+from session_backend import SQLiteSessionBackend
+from worker_pool import WorkerPool
+from shared_state import (get_session_state, get_session_store, new_session_id, persist_session_state,
+                          release_session_state, resume_session_state)
 
 # Configure logging
 logging.basicConfig(
@@ -31,11 +38,16 @@ logger = logging.getLogger(__name__)
 # Protocol constants
 MAGIC_BYTES = bytes([0xFE, 0xFF])
 
+# Seconds the accept loop blocks before checking for a requested drain
+ACCEPT_POLL_INTERVAL = 0.5
+
 
 class CommandID:
     """Command IDs from C64 client"""
     KEYPRESS = 0x01
     TEXT_INPUT = 0x02
+    MORE = 0x03  # Client is ready for the next window of a streamed response
+    RESUME_SESSION = 0x04  # Client presents a session token (NUL-terminated, may be empty)
 
 
 class ResponseType:
@@ -43,6 +55,8 @@ class ResponseType:
     PETSCII_NULL_TERMINATED = 0x01
     MIX_COMMANDS_SCREEN_CODES = 0x02
     MTEXT_FORMAT = 0x03
+    PETSCII_CHUNK = 0x04  # Null-terminated window of a streamed response, more follows
+    SESSION_TOKEN = 0x05  # Null-terminated session token to present on reconnect
 
 
 class ModifierFlags:
@@ -52,13 +66,179 @@ class ModifierFlags:
     COMMODORE = 0x04
 
 
+class FrameDecoder:
+    """
+    Splits a TCP byte stream into complete command packets
+
+    TCP may split one packet across several reads or coalesce several
+    packets into one, so bytes are accumulated in a per-connection buffer
+    and complete packets are cut off its front:
+      - KEYPRESS:   MAGIC_BYTES + $01 + 2 byte payload
+      - TEXT_INPUT: MAGIC_BYTES + $02 + PETSCII text + $00
+    Bytes that do not start a known packet are skipped up to the next
+    MAGIC_BYTES.
+    """
+
+    # Commands with a fixed payload length
+    FIXED_PAYLOAD = {
+        CommandID.KEYPRESS: 2,
+        CommandID.MORE: 0,
+    }
+    # Commands whose payload ends with a NUL terminator
+    NUL_TERMINATED = {
+        CommandID.TEXT_INPUT,
+        CommandID.RESUME_SESSION,
+    }
+    # Unterminated data beyond this is discarded
+    MAX_BUFFER = 4096
+
+    def __init__(self, max_buffer: int = MAX_BUFFER):
+        """
+        Initialize an empty decoder
+
+        Args:
+            max_buffer: Maximum number of buffered bytes without a complete packet
+        """
+        self.buffer = bytearray()
+        self.max_buffer = max_buffer
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        Append received bytes and return all packets completed by them
+
+        Args:
+            data: Bytes as returned by recv()
+
+        Returns:
+            Complete packets in the order they were received
+        """
+        self.buffer += data
+        packets = []
+        while True:
+            packet = self._next_packet()
+            if packet is None:
+                break
+            packets.append(packet)
+
+        if len(self.buffer) > self.max_buffer:
+            logger.warning(
+                f"Discarding {len(self.buffer)} bytes of unterminated input")
+            self.buffer.clear()
+        return packets
+
+    def _next_packet(self) -> Optional[bytes]:
+        """Cut the next complete packet off the buffer, if there is one"""
+        buf = self.buffer
+        while True:
+            start = buf.find(MAGIC_BYTES)
+            if start == -1:
+                # Keep a trailing byte that may be the first half of MAGIC_BYTES
+                keep = 1 if buf[-1:] == MAGIC_BYTES[:1] else 0
+                if len(buf) > keep:
+                    logger.warning(
+                        f"Skipping {len(buf) - keep} bytes without magic bytes")
+                    del buf[:len(buf) - keep]
+                return None
+            if start:
+                logger.warning(f"Skipping {start} bytes before magic bytes")
+                # Deleting from the front of a bytearray does not copy the rest
+                del buf[:start]
+
+            if len(buf) < 3:
+                return None
+
+            cmd_id = buf[2]
+            if cmd_id in self.FIXED_PAYLOAD:
+                end = 3 + self.FIXED_PAYLOAD[cmd_id]
+                if len(buf) < end:
+                    return None
+            elif cmd_id in self.NUL_TERMINATED:
+                nul = buf.find(0x00, 3)
+                if nul == -1:
+                    return None
+                end = nul + 1
+            else:
+                logger.warning(f"Unknown command ID: ${cmd_id:02X}")
+                del buf[:2]  # Resynchronize on the next magic bytes
+                continue
+
+            packet = bytes(buf[:end])
+            del buf[:end]
+            return packet
+
+
+class ResponseStream:
+    """
+    Cuts a lazily produced response into windows for the C64 receive buffer
+
+    Chunks are only pulled from the handler when the next window is
+    requested, so at most one window plus one chunk is held in memory.
+    """
+
+    def __init__(self, chunks: Iterator[bytes], window_size: int):
+        """
+        Initialize the stream
+
+        Args:
+            chunks: PETSCII encoded response chunks
+            window_size: Maximum number of bytes per window
+        """
+        self.chunks = chunks
+        self.window_size = window_size
+        self.buffer = bytearray()
+        self.exhausted = False
+
+    def next_window(self) -> Tuple[bytes, bool]:
+        """
+        Get the next window of the response
+
+        Returns:
+            Tuple of (window bytes, True if this is the last window)
+        """
+        # Read one byte past the window to know whether anything follows it
+        while len(self.buffer) <= self.window_size and not self.exhausted:
+            try:
+                self.buffer += next(self.chunks)
+            except StopIteration:
+                self.exhausted = True
+
+        window = bytes(self.buffer[:self.window_size])
+        del self.buffer[:self.window_size]
+        return window, self.exhausted and not self.buffer
+
+    def close(self):
+        """Stop the underlying handler if it is still producing chunks"""
+        close = getattr(self.chunks, 'close', None)
+        if close:
+            close()
+        self.buffer.clear()
+        self.exhausted = True
+
+
 class RequestDispatcher:
     """Dispatches text input requests to appropriate handlers"""
 
-    def __init__(self):
-        """Initialize dispatcher with all available handlers"""
+    # Answer sent when a handler's pool is full or misses its deadline
+    BUSY_MESSAGE = "Busy, please retry."
+
+    def __init__(self, budgets: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Initialize dispatcher with all available handlers
+
+        Args:
+            budgets: Per handler class name overrides of its timeout, max_workers and max_queue
+        """
         self.handlers: List[BaseHandler] = []
+        self.budgets = budgets or {}
+        # One bounded pool per handler class, created on first use
+        self._pools: Dict[str, HandlerPool] = {}
+        self._pools_lock = threading.Lock()
+        # Routing tables built from the handlers' prefixes and module keys
+        self._prefix_routes: Dict[str, BaseHandler] = {}
+        self._prefix_lengths: List[int] = []
+        self._module_routes: Dict[str, BaseHandler] = {}
         self._initialize_handlers()
+        self._build_routes()
 
     def _initialize_handlers(self):
         """Initialize all request handlers in priority order"""
@@ -75,6 +255,72 @@ class RequestDispatcher:
             logger.error(f"Error initializing handlers: {e}")
             self.handlers = []
 
+    def _build_routes(self):
+        """Build the prefix and active module routing tables"""
+        self._prefix_routes.clear()
+        self._module_routes.clear()
+        # Earlier handlers keep a prefix or module key claimed twice
+        for handler in self.handlers:
+            for prefix in handler.prefixes:
+                self._prefix_routes.setdefault(prefix.lower(), handler)
+            if handler.module_key:
+                self._module_routes.setdefault(handler.module_key, handler)
+        # Longest prefix wins when one prefix starts another
+        self._prefix_lengths = sorted({len(p) for p in self._prefix_routes}, reverse=True)
+
+    def _find_handler(self, utf8_text: str, session_id: int) -> Optional[BaseHandler]:
+        """
+        Find the handler responsible for a request
+
+        A request starting with a handler prefix goes to that handler;
+        anything else goes to the handler of the session's active module.
+
+        Args:
+            utf8_text: Decoded text input
+            session_id: The session ID for the request
+
+        Returns:
+            Matching handler or None
+        """
+        text = utf8_text.strip().lower()
+        for length in self._prefix_lengths:
+            handler = self._prefix_routes.get(text[:length])
+            if handler:
+                logger.info(f"Dispatching to {handler.__class__.__name__}")
+                return handler
+
+        active_module = get_session_state(session_id).get('active_module')
+        handler = self._module_routes.get(active_module) if active_module else None
+        if handler:
+            logger.info(
+                f"Dispatching to active module handler {handler.__class__.__name__}")
+        return handler
+
+    def _pool_for(self, handler: BaseHandler) -> HandlerPool:
+        """Get the bounded pool that runs requests of a handler's class"""
+        name = handler.__class__.__name__
+        with self._pools_lock:
+            pool = self._pools.get(name)
+            if pool is None:
+                budget = {
+                    'timeout': handler.timeout,
+                    'max_workers': handler.max_workers,
+                    'max_queue': handler.max_queue,
+                    **self.budgets.get(name, {}),
+                }
+                pool = HandlerPool(name, max_workers=int(budget['max_workers']),
+                                   max_queue=int(budget['max_queue']), timeout=budget['timeout'])
+                self._pools[name] = pool
+            return pool
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get queue depth and rejection counters of each handler pool
+        """
+        with self._pools_lock:
+            pools = list(self._pools.values())
+        return {pool.name: pool.stats() for pool in pools}
+
     def dispatch(self, petscii_text: bytes, session_id: int = 0) -> bytes:
         """
         Dispatch request to appropriate handler
@@ -91,38 +337,77 @@ class RequestDispatcher:
             utf8_text = BaseHandler.petscii_to_utf8(petscii_text.rstrip(b'\x00'))
             logger.info(f"Session {session_id}: Received: '{utf8_text}'")
 
-            # Find appropriate handler
-            for handler in self.handlers:
-                if handler.can_handle(utf8_text, session_id):
-                    logger.info(
-                        f"Dispatching to {handler.__class__.__name__}")
-                    response_text = handler.handle(utf8_text, session_id)
-                    logger.info(f"Response: '{response_text[:100]}...'")
-                    # Convert response back to PETSCII
-                    return BaseHandler.utf8_to_petscii(response_text)
-
-            # If no handler claims it, but a module is active, send it to that module's handler
-            state = get_session_state(session_id)
-            active_module = state.get('active_module')
-            if active_module:
-                for handler in self.handlers:
-                    # A bit of a hack to see which handler corresponds to the module
-                    if (active_module == 'c' and isinstance(handler, CSDBHandler)) or \
-                       (active_module == 'i' and isinstance(handler, ChatHandler)):
-                        logger.info(
-                            f"Dispatching to active module handler {handler.__class__.__name__}")
-                        response_text = handler.handle(utf8_text, session_id)
-                        logger.info(f"Response: '{response_text[:100]}...'")
-                        return BaseHandler.utf8_to_petscii(response_text)
+            handler = self._find_handler(utf8_text, session_id)
+            if handler:
+                response_text = self._pool_for(handler).run(handler.handle, utf8_text, session_id)
+                logger.info(f"Response: '{response_text[:100]}...'")
+                # Convert response back to PETSCII
+                return BaseHandler.utf8_to_petscii(response_text)
 
             # Default response if no handler is found
             logger.warning("No handler found for the request.")
             return BaseHandler.utf8_to_petscii("Unknown command. Type 'help' for assistance.")
 
+        except HandlerBusyError:
+            return BaseHandler.utf8_to_petscii(self.BUSY_MESSAGE)
         except Exception as e:
             logger.error(f"Error during dispatch: {e}", exc_info=True)
             return BaseHandler.utf8_to_petscii(f"Server error: {str(e)}")
 
+    def dispatch_stream(self, petscii_text: bytes, session_id: int = 0) -> Iterator[bytes]:
+        """
+        Dispatch request to appropriate handler and stream its response
+
+        Args:
+            petscii_text: PETSCII encoded text input (null-terminated)
+            session_id: The session ID for the request
+
+        Yields:
+            PETSCII encoded response chunks
+        """
+        try:
+            utf8_text = BaseHandler.petscii_to_utf8(petscii_text.rstrip(b'\x00'))
+            logger.info(f"Session {session_id}: Received: '{utf8_text}'")
+
+            handler = self._find_handler(utf8_text, session_id)
+            if not handler:
+                logger.warning("No handler found for the request.")
+                yield BaseHandler.utf8_to_petscii("Unknown command. Type 'help' for assistance.")
+                return
+
+            pool = self._pool_for(handler)
+            if handler.reports_progress:
+                # The request runs on one pool worker; its progress is passed on as it comes
+                for chunk in pool.run_with_progress(handler.handle_progress, utf8_text, session_id):
+                    if chunk:
+                        yield BaseHandler.utf8_to_petscii(chunk)
+                return
+
+            # Each chunk is pulled on the handler's pool, so the deadline applies per chunk
+            chunks = iter(handler.handle_stream(utf8_text, session_id))
+            try:
+                while True:
+                    chunk = pool.run(next, chunks, None)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        yield BaseHandler.utf8_to_petscii(chunk)
+            except HandlerBusyError:
+                yield BaseHandler.utf8_to_petscii(self.BUSY_MESSAGE)
+            finally:
+                close = getattr(chunks, 'close', None)
+                try:
+                    if close:
+                        close()
+                except ValueError:
+                    pass  # Still running on the pool after a timeout
+
+        except HandlerBusyError:
+            yield BaseHandler.utf8_to_petscii(self.BUSY_MESSAGE)
+        except Exception as e:
+            logger.error(f"Error during dispatch: {e}", exc_info=True)
+            yield BaseHandler.utf8_to_petscii(f"Server error: {str(e)}")
+
 
 class CommandHandler:
     """Handles processing of commands from C64 client"""
@@ -130,6 +415,14 @@ class CommandHandler:
     # Class-level dispatcher instance
     _dispatcher = None
 
+    # Window size in bytes for streamed text responses (0 = send whole response at once)
+    stream_window = 0
+
+    # Pending streamed response per session. Kept apart from the session state under a
+    # lock of its own, so "more" never waits behind a command changing that state
+    _streams: Dict[int, 'ResponseStream'] = {}
+    _streams_lock = threading.Lock()
+
     @classmethod
     def get_dispatcher(cls) -> RequestDispatcher:
         """Get or create the request dispatcher instance"""
@@ -203,9 +496,7 @@ class CommandHandler:
             f"Keypress: {char} (PETSCII ${petscii_code:02X}), Modifiers: {mod_desc}")
 
         # Create echo response
-        response_text = f"key: {char}\r".encode('ascii')
-        petscii_response = bytes([Petscii.ascii2petscii(b)
-                                 for b in response_text])
+        petscii_response = f"key: {char}\r".encode(PETSCII_CODEC)
         petscii_response += bytes([0x00])  # Null terminator
 
         return CommandHandler.create_response(
@@ -221,6 +512,71 @@ class CommandHandler:
         dispatcher = CommandHandler.get_dispatcher()
         return dispatcher.dispatch(data, session_id)
 
+    @staticmethod
+    def start_stream(data: bytes, session_id: int = 0) -> bytes:
+        """
+        Handle text input as a streamed response and send its first window
+
+        Any response still pending for the session is dropped.
+        """
+        dispatcher = CommandHandler.get_dispatcher()
+        stream = ResponseStream(dispatcher.dispatch_stream(data, session_id), CommandHandler.stream_window)
+        with CommandHandler._streams_lock:
+            pending = CommandHandler._streams.get(session_id)
+            CommandHandler._streams[session_id] = stream
+        if pending:
+            pending.close()
+        return CommandHandler.handle_more(session_id)
+
+    @staticmethod
+    def handle_more(session_id: int = 0) -> bytes:
+        """
+        Handle "more" command ($03) by sending the next window of a streamed response
+
+        Non-final windows are sent as PETSCII_CHUNK, the final one as
+        PETSCII_NULL_TERMINATED, which also answers "more" when nothing is pending.
+        Does not wait for the session lock, so progress of a running command
+        keeps coming window by window.
+        """
+        with CommandHandler._streams_lock:
+            stream = CommandHandler._streams.get(session_id)
+        if not stream:
+            return CommandHandler.create_response(
+                ResponseType.PETSCII_NULL_TERMINATED, b'')
+
+        window, last = stream.next_window()
+        if last:
+            with CommandHandler._streams_lock:
+                if CommandHandler._streams.get(session_id) is stream:
+                    del CommandHandler._streams[session_id]
+            return CommandHandler.create_response(
+                ResponseType.PETSCII_NULL_TERMINATED, window)
+        return CommandHandler.create_response(ResponseType.PETSCII_CHUNK, window)
+
+    @staticmethod
+    def handle_resume(data: bytes, session_id: int = 0) -> bytes:
+        """
+        Handle resume session command ($04)
+
+        Restores the navigation state saved under the client's token, or
+        issues a new token. The response carries the token to present on the
+        next reconnect; it is empty when no persistent backend is configured.
+        """
+        token = data.rstrip(b'\x00').decode(PETSCII_CODEC, errors='replace').strip()
+        token = resume_session_state(session_id, token) or ''
+        return CommandHandler.create_response(
+            ResponseType.SESSION_TOKEN, token.encode(PETSCII_CODEC))
+
+    @staticmethod
+    def release_session(session_id: int, state: dict):
+        """
+        Free per-session resources when a session is released or evicted
+        """
+        with CommandHandler._streams_lock:
+            stream = CommandHandler._streams.pop(session_id, None)
+        if stream:
+            stream.close()
+
     @staticmethod
     def create_response(response_type: int, data: bytes) -> bytes:
         """
@@ -233,8 +589,9 @@ class CommandHandler:
         Returns:
             Complete response packet with magic bytes and type
         """
-        # Null-terminate only if PETSCII_NULL_TERMINATED
-        if response_type == ResponseType.PETSCII_NULL_TERMINATED:
+        # Null-terminate only PETSCII text responses
+        if response_type in (ResponseType.PETSCII_NULL_TERMINATED, ResponseType.PETSCII_CHUNK,
+                             ResponseType.SESSION_TOKEN):
             if not data or data[-1] != 0x00:
                 data += bytes([0x00])
         return MAGIC_BYTES + bytes([response_type]) + data
@@ -255,9 +612,18 @@ class CommandHandler:
 
             if cmd_id == CommandID.KEYPRESS:
                 response_data = CommandHandler.handle_keypress(data)
+            elif cmd_id == CommandID.TEXT_INPUT and CommandHandler.stream_window:
+                response = CommandHandler.start_stream(data, session_id)
+                persist_session_state(session_id)
+                return response
+            elif cmd_id == CommandID.MORE:
+                return CommandHandler.handle_more(session_id)
+            elif cmd_id == CommandID.RESUME_SESSION:
+                return CommandHandler.handle_resume(data, session_id)
             elif cmd_id == CommandID.TEXT_INPUT:
                 response_data = CommandHandler.handle_text_input(
                     data, session_id)
+                persist_session_state(session_id)
 
             if response_data:
                 return CommandHandler.create_response(response_type, response_data)
@@ -270,29 +636,42 @@ class CommandHandler:
         return None
 
 
+get_session_store().add_release_listener(CommandHandler.release_session)
+
+
 class C64Server:
     """TCP server for C64 communication"""
 
-    def __init__(self, host: str = '0.0.0.0', port: int = 6464):
+    def __init__(self, host: str = '0.0.0.0', port: int = 6464, reuse_port: bool = False):
         """
         Initialize the C64 server
 
         Args:
             host: Host address to bind to
             port: Port number to listen on (default 6464)
+            reuse_port: Set SO_REUSEPORT so several worker processes can share the port
         """
         self.host = host
         self.port = port
+        self.reuse_port = reuse_port
         self.running = False
         self.server_socket = None
         self.clients = []
         self.lock = threading.Lock()
+        # Number of commands being processed, for draining
+        self.busy = 0
+        self.idle = threading.Condition(self.lock)
+        # Set by request_drain(); the accept loop drains once it sees it
+        self.drain_timeout: Optional[float] = None
 
     def start(self):
         """Start the server and begin accepting connections"""
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(
             socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            self.server_socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.server_socket.bind((self.host, self.port))
 
         # Get actual port if 0 was specified (for testing)
@@ -300,28 +679,35 @@ class C64Server:
             self.port = self.server_socket.getsockname()[1]
 
         self.server_socket.listen(5)
+        # Wake up now and then to notice request_drain()
+        self.server_socket.settimeout(ACCEPT_POLL_INTERVAL)
         self.running = True
 
         logger.info(f"C64 Server started on {self.host}:{self.port}")
 
         try:
-            while self.running:
+            while self.running and self.drain_timeout is None:
                 try:
                     client_socket, address = self.server_socket.accept()
                     with self.lock:
                         self.clients.append(client_socket)
                     logger.info(f"Accepted connection from {address}")
                     # Use a unique session ID for each client connection
-                    session_id = id(client_socket)
+                    session_id = new_session_id()
                     thread = threading.Thread(
                         target=self.handle_client, args=(client_socket, address, session_id))
                     thread.daemon = True
                     thread.start()
+                except socket.timeout:
+                    continue
                 except OSError:
                     # This can happen when the socket is closed by another thread
                     break
         finally:
-            self.stop()
+            if self.drain_timeout is not None:
+                self.drain(self.drain_timeout)
+            else:
+                self.stop()
 
     def handle_client(self, client_socket: socket.socket, address: Tuple[str, int], session_id: int):
         """
@@ -332,14 +718,24 @@ class C64Server:
             address: Client address tuple
             session_id: A unique ID for this client session
         """
+        decoder = FrameDecoder()
         try:
             while self.running:
                 data = client_socket.recv(1024)
                 if not data:
                     break  # Connection closed
-                response = CommandHandler.process_command(data, session_id)
-                if response:
-                    client_socket.sendall(response)
+                for packet in decoder.feed(data):
+                    with self.lock:
+                        self.busy += 1
+                    try:
+                        response = CommandHandler.process_command(
+                            packet, session_id)
+                        if response:
+                            client_socket.sendall(response)
+                    finally:
+                        with self.lock:
+                            self.busy -= 1
+                            self.idle.notify_all()
         except ConnectionResetError:
             logger.info(f"Connection reset by {address}")
         except Exception as e:
@@ -347,19 +743,46 @@ class C64Server:
                 f"Error handling client {address}: {e}", exc_info=True)
         finally:
             logger.info(f"Connection from {address} closed")
+            release_session_state(session_id)
             with self.lock:
                 if client_socket in self.clients:
                     self.clients.remove(client_socket)
             client_socket.close()
 
+    def drain(self, timeout: float = 10.0):
+        """
+        Stop accepting connections, let commands in progress finish, then stop
+
+        Args:
+            timeout: Maximum seconds to wait for commands in progress
+        """
+        logger.info("Draining server...")
+        self.running = False
+        self._close_listener()
+
+        with self.lock:
+            if not self.idle.wait_for(lambda: self.busy == 0, timeout):
+                logger.warning(
+                    f"Drain timeout: {self.busy} commands still in progress")
+        self.stop()
+
+    def request_drain(self, timeout: float = 10.0):
+        """
+        Ask the accept loop to drain the server (safe to call from a signal handler)
+
+        Only sets a flag: drain() takes the lock and waits, which must not
+        happen in a signal handler interrupting the thread that holds it.
+
+        Args:
+            timeout: Maximum seconds to wait for commands in progress
+        """
+        self.drain_timeout = timeout
+
     def stop(self):
         """Stop the server and close all connections"""
         logger.info("Stopping server...")
         self.running = False
-        if self.server_socket:
-            # This will unblock the accept() call
-            self.server_socket.close()
-            self.server_socket = None
+        self._close_listener()
 
         with self.lock:
             for client in self.clients:
@@ -372,6 +795,198 @@ class C64Server:
 
         logger.info("C64 Server stopped.")
 
+    def _close_listener(self):
+        """Close the listening socket and unblock the accept() call"""
+        # The accept loop calls stop() as well once accept() is unblocked
+        with self.lock:
+            server_socket, self.server_socket = self.server_socket, None
+        if server_socket:
+            try:
+                # close() alone leaves a socket blocked in accept() listening on Linux
+                server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server_socket.close()
+
+    def cleanup(self):
+        """Cleanup resources"""
+        logger.info("Server stopped")
+
+
+class AsyncC64Server:
+    """
+    asyncio TCP server for C64 communication
+
+    All sessions share one event loop instead of pinning a thread each.
+    Command processing (which may block on CSDB HTTP or LLM calls) runs on
+    a bounded thread pool, so a slow handler never stalls the loop.
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 6464, max_workers: int = 16,
+                 max_pending: int = 64, reuse_port: bool = False):
+        """
+        Initialize the asyncio C64 server
+
+        Args:
+            host: Host address to bind to
+            port: Port number to listen on (default 6464)
+            max_workers: Number of threads used to run command handlers
+            max_pending: Maximum commands queued for or running on the pool
+            reuse_port: Set SO_REUSEPORT so several worker processes can share the port
+        """
+        self.host = host
+        self.port = port
+        self.reuse_port = reuse_port
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.running = False
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.clients = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        # Number of commands being processed, for draining
+        self.busy = 0
+
+    def start(self):
+        """Start the server and block until it is stopped"""
+        try:
+            asyncio.run(self.serve())
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.running = False
+
+    async def serve(self):
+        """Start listening and serve clients until stopped"""
+        self.loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='c64-handler')
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._server = await asyncio.start_server(
+            self.handle_client, self.host, self.port, reuse_address=True,
+            reuse_port=self.reuse_port or None)
+
+        # Get actual port if 0 was specified (for testing)
+        if self.port == 0:
+            self.port = self._server.sockets[0].getsockname()[1]
+
+        self.running = True
+        logger.info(
+            f"C64 async server started on {self.host}:{self.port} "
+            f"({self.max_workers} handler threads)")
+
+        try:
+            await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self._drain_task:
+                await self._drain_task
+            self._close_all()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("C64 async server stopped.")
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Handle communication with a connected client
+
+        Args:
+            reader: Stream reader for the client connection
+            writer: Stream writer for the client connection
+        """
+        address = writer.get_extra_info('peername')
+        # Use a unique session ID for each client connection
+        session_id = new_session_id()
+        self.clients.add(writer)
+        logger.info(f"Accepted connection from {address}")
+        decoder = FrameDecoder()
+        try:
+            while self.running:
+                data = await reader.read(1024)
+                if not data:
+                    break  # Connection closed
+                for packet in decoder.feed(data):
+                    self.busy += 1
+                    try:
+                        async with self._slots:
+                            response = await self.loop.run_in_executor(
+                                self.executor, CommandHandler.process_command, packet, session_id)
+                        if response:
+                            writer.write(response)
+                            await writer.drain()
+                    finally:
+                        self.busy -= 1
+        except ConnectionResetError:
+            logger.info(f"Connection reset by {address}")
+        except Exception as e:
+            logger.error(
+                f"Error handling client {address}: {e}", exc_info=True)
+        finally:
+            logger.info(f"Connection from {address} closed")
+            release_session_state(session_id)
+            self.clients.discard(writer)
+            writer.close()
+
+    def _close_all(self):
+        """Close the listening socket and all client connections (loop thread only)"""
+        self.running = False
+        if self._server:
+            self._server.close()
+        for writer in list(self.clients):
+            writer.close()
+        self.clients.clear()
+
+    async def _drain(self, timeout: float):
+        """Stop accepting connections and close them once no command is in progress"""
+        logger.info("Draining server...")
+        self._server.close()
+        deadline = self.loop.time() + timeout
+        while self.busy and self.loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if self.busy:
+            logger.warning(
+                f"Drain timeout: {self.busy} commands still in progress")
+        self._close_all()
+
+    def drain(self, timeout: float = 10.0):
+        """
+        Stop accepting connections, let commands in progress finish, then stop
+        (safe to call from any thread)
+
+        Args:
+            timeout: Maximum seconds to wait for commands in progress
+        """
+        self.request_drain(timeout)
+
+    def request_drain(self, timeout: float = 10.0):
+        """
+        Drain the server (safe to call from a signal handler)
+
+        Neither logs nor takes locks; the drain itself runs on the event loop.
+
+        Args:
+            timeout: Maximum seconds to wait for commands in progress
+        """
+        if self.loop and not self.loop.is_closed() and self._server:
+            def start_drain():
+                self._drain_task = self.loop.create_task(self._drain(timeout))
+            try:
+                self.loop.call_soon_threadsafe(start_drain)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def stop(self):
+        """Stop the server and close all connections (safe to call from any thread)"""
+        logger.info("Stopping server...")
+        self.running = False
+        if self.loop and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self._close_all)
+            except RuntimeError:
+                pass  # Loop already closed
+
     def cleanup(self):
         """Cleanup resources"""
         logger.info("Server stopped")
@@ -389,13 +1004,70 @@ def main():
                         help='Port to listen on (default: 6464)')
     parser.add_argument('--debug', action='store_true',
                         help='Enable debug logging')
+    parser.add_argument('--asyncio', action='store_true',
+                        help='Serve all sessions on one asyncio event loop')
+    parser.add_argument('--max-workers', type=int, default=16,
+                        help='Handler threads in asyncio mode (default: 16)')
+    parser.add_argument('--max-sessions', type=int, default=1024,
+                        help='Maximum number of sessions kept in memory (default: 1024)')
+    parser.add_argument('--session-ttl', type=float, default=3600,
+                        help='Seconds an idle session is kept (default: 3600)')
+    parser.add_argument('--session-db',
+                        help='SQLite file for sessions that can be resumed after reconnecting')
+    parser.add_argument('--stream-window', type=int, default=0,
+                        help='Stream text responses in windows of this many bytes, '
+                             'waiting for a "more" command between them (default: 0 = off)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes sharing the port via SO_REUSEPORT (default: 1)')
+    parser.add_argument('--drain-timeout', type=float, default=10,
+                        help='Seconds to let commands finish on SIGTERM (default: 10)')
 
     args = parser.parse_args()
 
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    server = C64Server(host=args.host, port=args.port)
+    if args.workers <= 1:
+        _run_server(args)
+        return
+
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error('--workers needs SO_REUSEPORT, which this platform does not support')
+    if args.port == 0:
+        parser.error('--workers needs a fixed --port')
+    if not args.session_db:
+        logger.warning("Running several workers without --session-db: "
+                       "a session cannot be resumed on another worker")
+
+    pool = WorkerPool(lambda index: _run_server(args, reuse_port=True), args.workers,
+                      shutdown_timeout=args.drain_timeout + 5)
+    pool.run()
+
+
+def _run_server(args: argparse.Namespace, reuse_port: bool = False):
+    """
+    Run one server until it is stopped or drained by SIGTERM
+
+    Args:
+        args: Parsed command line arguments
+        reuse_port: Share the port with other worker processes
+    """
+    CommandHandler.stream_window = args.stream_window
+    store = get_session_store()
+    store.max_sessions = args.max_sessions
+    store.idle_ttl = args.session_ttl
+    # Opened here rather than in main() so each worker has its own connections
+    if args.session_db:
+        store.backend = SQLiteSessionBackend(args.session_db)
+
+    if args.asyncio:
+        server = AsyncC64Server(
+            host=args.host, port=args.port, max_workers=args.max_workers, reuse_port=reuse_port)
+    else:
+        server = C64Server(host=args.host, port=args.port, reuse_port=reuse_port)
+
+    # The handler only asks for a drain; the server's own loop carries it out
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.request_drain(args.drain_timeout))
 
     try:
         server.start()
@@ -404,6 +1076,8 @@ def main():
     finally:
         server.stop()
         server.cleanup()
+        if store.backend:
+            store.backend.close()
 
 
 if __name__ == '__main__':
@@ -7,7 +7,7 @@ Useful for testing the TCP communication protocol.
 """
 import socket
 import sys
-from generate_pet_asc_table import Petscii
+from generate_pet_asc_table import PETSCII_CODEC, FALLBACK_ERRORS
 
 # Protocol constants
 MAGIC_BYTES = bytes([0xFE, 0xFF])
@@ -17,6 +17,8 @@ class CommandID:
     """Command IDs to send to server"""
     KEYPRESS = 0x01
     TEXT_INPUT = 0x02
+    MORE = 0x03
+    RESUME_SESSION = 0x04
 
 
 class ResponseType:
@@ -24,6 +26,8 @@ class ResponseType:
     PETSCII_NULL_TERMINATED = 0x01
     MIX_COMMANDS_SCREEN_CODES = 0x02
     MTEXT_FORMAT = 0x03
+    PETSCII_CHUNK = 0x04
+    SESSION_TOKEN = 0x05
 
 
 class C64TestClient:
@@ -64,8 +68,7 @@ class C64TestClient:
             commodore: Commodore key pressed
         """
         # Convert to PETSCII
-        ascii_code = ord(key)
-        petscii_code = Petscii.ascii2petscii(ascii_code)
+        petscii_code = key.encode(PETSCII_CODEC, errors=FALLBACK_ERRORS)[0]
 
         # Build modifier flags
         modifiers = 0
@@ -99,7 +102,7 @@ class C64TestClient:
             text: Text string to send
         """
         # Convert to PETSCII
-        petscii_bytes = bytes([Petscii.ascii2petscii(ord(c)) for c in text])
+        petscii_bytes = text.encode(PETSCII_CODEC, errors=FALLBACK_ERRORS)
 
         # Build packet (with null terminator)
         packet = MAGIC_BYTES + \
@@ -116,6 +119,42 @@ class C64TestClient:
         self.print_response(response)
         return self.decode_response(response)
 
+    def send_more(self):
+        """
+        Request the next window of a streamed response
+        """
+        packet = MAGIC_BYTES + bytes([CommandID.MORE])
+
+        print("\nSending more")
+        print(f"  Packet: {packet.hex()}")
+
+        self.socket.send(packet)
+
+        # Receive response
+        response = self.socket.recv(4096)
+        self.print_response(response)
+        return self.decode_response(response)
+
+    def send_resume(self, token: str = ''):
+        """
+        Resume a session saved on the server, or request a new session token
+
+        Args:
+            token: Token returned by an earlier resume, empty for a new one
+        """
+        packet = MAGIC_BYTES + bytes([CommandID.RESUME_SESSION]) + \
+            token.encode(PETSCII_CODEC, errors=FALLBACK_ERRORS) + bytes([0x00])
+
+        print(f"\nSending resume: '{token}'")
+        print(f"  Packet: {packet.hex()}")
+
+        self.socket.send(packet)
+
+        # Receive response
+        response = self.socket.recv(4096)
+        self.print_response(response)
+        return self.decode_response(response)
+
     def decode_response(self, response: bytes):
         """
         Decode response and return text
@@ -139,7 +178,8 @@ class C64TestClient:
         data = response[3:]
 
         # Try to decode PETSCII to UTF-8
-        if resp_type == ResponseType.PETSCII_NULL_TERMINATED:
+        if resp_type in (ResponseType.PETSCII_NULL_TERMINATED, ResponseType.PETSCII_CHUNK,
+                         ResponseType.SESSION_TOKEN):
             # Find null terminator
             null_pos = data.find(0x00)
             if null_pos != -1:
@@ -150,10 +190,7 @@ class C64TestClient:
             if len(petscii_data) > 0:
                 # Convert to ASCII/UTF-8
                 try:
-                    ascii_bytes = bytes([Petscii.petscii2ascii(b)
-                                        for b in petscii_data])
-                    text = ascii_bytes.decode('ascii')
-                    return text
+                    return petscii_data.decode(PETSCII_CODEC)
                 except Exception:
                     return None
 
@@ -185,14 +222,17 @@ class C64TestClient:
         type_names = {
             ResponseType.PETSCII_NULL_TERMINATED: "PETSCII NULL-TERMINATED",
             ResponseType.MIX_COMMANDS_SCREEN_CODES: "MIX COMMANDS/SCREEN CODES",
-            ResponseType.MTEXT_FORMAT: "MTEXT FORMAT"
+            ResponseType.MTEXT_FORMAT: "MTEXT FORMAT",
+            ResponseType.PETSCII_CHUNK: "PETSCII CHUNK (send more)",
+            ResponseType.SESSION_TOKEN: "SESSION TOKEN"
         }
 
         type_name = type_names.get(resp_type, f"UNKNOWN (${resp_type:02X})")
         print(f"  Response type: {type_name}")
 
         # Try to decode PETSCII to UTF-8
-        if resp_type == ResponseType.PETSCII_NULL_TERMINATED:
+        if resp_type in (ResponseType.PETSCII_NULL_TERMINATED, ResponseType.PETSCII_CHUNK,
+                         ResponseType.SESSION_TOKEN):
             # Find null terminator
             null_pos = data.find(0x00)
             if null_pos != -1:
@@ -203,9 +243,7 @@ class C64TestClient:
             if len(petscii_data) > 0:
                 # Convert to ASCII/UTF-8
                 try:
-                    ascii_bytes = bytes([Petscii.petscii2ascii(b)
-                                        for b in petscii_data])
-                    text = ascii_bytes.decode('ascii')
+                    text = petscii_data.decode(PETSCII_CODEC)
                     print(f"  Text: '{text}'")
                 except Exception as e:
                     print(f"  Could not decode: {e}")
@@ -229,6 +267,8 @@ def interactive_mode(client: C64TestClient):
     print("  ks <char>         - Send keypress with SHIFT")
     print("  kc <char>         - Send keypress with CTRL")
     print("  t <text>          - Send text input (e.g., 't hello')")
+    print("  m                 - Request next window of a streamed response")
+    print("  r [token]         - Resume a session, or get a new session token")
     print("  q                 - Quit")
     print()
 
@@ -242,6 +282,14 @@ def interactive_mode(client: C64TestClient):
             if cmd == 'q':
                 break
 
+            if cmd == 'm':
+                client.send_more()
+                continue
+
+            if cmd == 'r' or cmd.startswith('r '):
+                client.send_resume(cmd[2:].strip())
+                continue
+
             parts = cmd.split(maxsplit=1)
 
             if parts[0] == 'k' and len(parts) == 2:
@@ -0,0 +1,86 @@
+"""
+Shared pytest fixtures
+"""
+import pytest
+import requests
+import csdb_handler
+import download_store
+import http_client
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-benchmarks', action='store_true',
+                     help='Also run the wall-clock checks marked benchmark')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: wall-clock check, skipped unless --run-benchmarks is given')
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip timing checks by default; they depend on the machine and its load"""
+    if config.getoption('--run-benchmarks'):
+        return
+    skip = pytest.mark.skip(reason='timing check, run with --run-benchmarks or python bench_parsers.py')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+class FakeClock:
+    """Manually advanced time source, starting away from 0 like a real clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Clock for code taking a clock function; tests move it with clock.now += seconds"""
+    return FakeClock()
+
+
+class PageSession:
+    """Session serving a fixed page body and counting requests"""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.requests = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests += 1
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = self.body
+        resp.encoding = 'utf-8'
+        resp.url = url
+        return resp
+
+
+@pytest.fixture
+def page_session():
+    """Factory of sessions serving a fixed page body: page_session(b'<html>...')"""
+    return PageSession
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """Start every test with closed circuit breakers; they are shared process-wide"""
+    http_client._breakers.clear()
+    yield
+    http_client._breakers.clear()
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_download_dirs(tmp_path_factory):
+    """Keep the process-wide download store and page cache out of /tmp/c64cloud"""
+    root = tmp_path_factory.mktemp('c64cloud')
+    patch = pytest.MonkeyPatch()
+    patch.setattr(download_store, 'DEFAULT_ROOT', str(root))
+    patch.setattr(download_store, '_store', None)
+    patch.setattr(csdb_handler, 'CSDB_CACHE_DIR', str(root / 'cache'))
+    yield root
+    patch.undo()
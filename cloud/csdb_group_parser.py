@@ -1,14 +1,14 @@
-from bs4 import BeautifulSoup
+import re
 from typing import Dict, Any
+from csdb_html import Sections, parse_main
 
 
 def parse_csdb_group_detail(html: str) -> Dict[str, Any]:
-    # ...existing code...
-    soup = BeautifulSoup(html, 'html.parser')
     result = {}
-    main = soup.find('td', valign='top', width="100%")
+    main = parse_main(html)
     if not main:
         return result
+    sections = Sections(main)
 
     def format_member(m):
         name = m.get('name', '')
@@ -51,22 +51,20 @@ def parse_csdb_group_detail(html: str) -> Dict[str, Any]:
 
     # Group type
     group_type = None
-    for b in main.find_all('b'):
-        if 'Group Type' in b.get_text():
-            a = b.find_next('a')
-            if a:
-                group_type = a.get_text(strip=True)
-            break
+    b = sections.first('Group Type')
+    if b:
+        a = b.find_next('a')
+        if a:
+            group_type = a.get_text(strip=True)
     result['group_type'] = group_type
 
     # Base country
     country = None
-    for b in main.find_all('b'):
-        if 'Base Country' in b.get_text():
-            a = b.find_next('a')
-            if a:
-                country = a.get_text(strip=True)
-            break
+    b = sections.first('Base Country')
+    if b:
+        a = b.find_next('a')
+        if a:
+            country = a.get_text(strip=True)
     result['country'] = country
 
     # User rating
@@ -75,25 +73,26 @@ def parse_csdb_group_detail(html: str) -> Dict[str, Any]:
     votes_left = None
     vote_url = None
     votestat_url = None
-    for b in main.find_all('b'):
-        if 'User rating' in b.get_text():
-            td = b.parent.find_next('td')
-            if td:
-                text = td.get_text(' ', strip=True)
-                import re
-                m = re.search(r'awaiting (\d+) votes \((\d+) left\)', text)
-                if m:
-                    votes_needed = m.group(1)
-                    votes_left = m.group(2)
-                # Find vote and statistics links
-                vote_a = td.find('a', href=lambda h: h and 'voteview.php' in h)
-                if vote_a:
-                    vote_url = vote_a['href']
-                stat_a = td.find(
-                    'a', href=lambda h: h and 'votestatistics.php' in h)
-                if stat_a:
-                    votestat_url = stat_a['href']
-            break
+    b = sections.first('User rating')
+    if b:
+        td = b.parent.find_next('td')
+        if td:
+            text = td.get_text(' ', strip=True)
+            m = re.search(r'awaiting (\d+) votes \((\d+) left\)', text)
+            if m:
+                votes_needed = m.group(1)
+                votes_left = m.group(2)
+            m = re.search(r'(\d\.\d/\d+)\s*\((\d+)\s*votes\)', text)
+            if m:
+                user_rating = f"{m.group(1)} ({m.group(2)} votes)"
+            # Find vote and statistics links
+            vote_a = td.find('a', href=lambda h: h and 'voteview.php' in h)
+            if vote_a:
+                vote_url = vote_a['href']
+            stat_a = td.find(
+                'a', href=lambda h: h and 'votestatistics.php' in h)
+            if stat_a:
+                votestat_url = stat_a['href']
     result['user_rating'] = user_rating
     result['votes_needed'] = votes_needed
     result['votes_left'] = votes_left
@@ -102,54 +101,50 @@ def parse_csdb_group_detail(html: str) -> Dict[str, Any]:
 
     # Members
     members = []
-    for b in main.find_all('b'):
-        if 'All Members' in b.get_text():
-            table = b.find_next('table')
-            if table:
-                member_rows = table.find_all('tr')
-                for tr in member_rows:
-                    tds = tr.find_all('td')
-                    if len(tds) >= 1:
-                        name_a = tds[0].find('a')
-                        name = name_a.get_text(strip=True) if name_a else tds[0].get_text(strip=True)
-                        member_id = None
-                        if name_a and 'scener/?id=' in name_a.get('href', ''):
-                            member_id = name_a['href'].split('id=')[-1]
-                        status = tds[0].find('small')
-                        status_str = status.get_text(strip=True).strip('()') if status else None
-                        roles = tds[-1].get_text(strip=True) if len(tds) > 1 else None
-                        members.append({
-                            'id': member_id,
-                            'name': name,
-                            'status': status_str,
-                            'roles': roles
-                        })
-            break
+    b = sections.first('All Members')
+    table = b.find_next('table') if b else None
+    if table:
+        for tr in table.find_all('tr'):
+            tds = tr.find_all('td')
+            if len(tds) >= 1:
+                name_a = tds[0].find('a')
+                name = name_a.get_text(strip=True) if name_a else tds[0].get_text(strip=True)
+                member_id = None
+                if name_a and 'scener/?id=' in name_a.get('href', ''):
+                    member_id = name_a['href'].split('id=')[-1]
+                status = tds[0].find('small')
+                status_str = status.get_text(strip=True).strip('()') if status else None
+                roles = tds[-1].get_text(strip=True) if len(tds) > 1 else None
+                members.append({
+                    'id': member_id,
+                    'name': name,
+                    'status': status_str,
+                    'roles': roles
+                })
     result['members'] = members
 
     # Releases
     releases = []
-    for b in main.find_all('b'):
-        if 'Releases' in b.get_text():
-            release_table = b.find_next('table')
-            if release_table:
-                for row in release_table.find_all('tr'):
-                    cols = row.find_all('td')
-                    if len(cols) >= 4:
-                        release_link = cols[0].find('a', href=lambda href: href and '/release/?id=' in href)
-                        if release_link:
-                            release_id = release_link['href'].split('id=')[-1]
-                            title = release_link.get_text(strip=True)
-                            year_font = cols[2].find('font')
-                            year = year_font.get_text(strip=True) if year_font else None
-                            type_font = cols[3].find('font')
-                            release_type = type_font.get_text(strip=True).replace('\xa0', ' ').strip() if type_font else None
-                            releases.append({
-                                'id': release_id,
-                                'title': title,
-                                'year': year,
-                                'type': release_type
-                            })
+    for b in sections.all('Releases'):
+        release_table = b.find_next('table')
+        if release_table:
+            for row in release_table.find_all('tr'):
+                cols = row.find_all('td')
+                if len(cols) >= 4:
+                    release_link = cols[0].find('a', href=lambda href: href and '/release/?id=' in href)
+                    if release_link:
+                        release_id = release_link['href'].split('id=')[-1]
+                        title = release_link.get_text(strip=True)
+                        year_font = cols[2].find('font')
+                        year = year_font.get_text(strip=True) if year_font else None
+                        type_font = cols[3].find('font')
+                        release_type = type_font.get_text(strip=True).replace('\xa0', ' ').strip() if type_font else None
+                        releases.append({
+                            'id': release_id,
+                            'title': title,
+                            'year': year,
+                            'type': release_type
+                        })
     result['releases'] = releases
 
     return result
@@ -4,45 +4,40 @@ CSDBHandler - Handles requests to csdb.dk database
 Queries the CSDB.dk API for C64 scene information.
 Processes requests starting with "c:"
 """
+import copy
 import logging
 import os
+import tempfile
+import threading
+import time
 import requests
 import zipfile
+import zlib
 import fnmatch
+import functools
 import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional, List
-from pydantic import BaseModel
+from urllib.parse import urlparse
+from typing import Callable, Dict, Optional, List
 from base_handler import BaseHandler
 from dotenv import load_dotenv
-from shared_state import get_session_state
+from shared_state import get_session_state, session_lock
+from http_cache import HTTPCache
+from http_client import get_http_session
+from parsed_cache import ParsedCache
+from single_flight import SingleFlight
+from csdb_mirror import ENTITY_TYPES, CSDBMirror
+from download_store import get_download_store
+from handler_pool import RequestCancelledError
+from http_range_file import RangeNotSupportedError, open_range_file
+from prefetcher import PREFETCH_ENABLED, PREFETCH_TOP_K, get_prefetcher, prefetch_checkpoint
 from csdb_group_parser import parse_csdb_group_detail
 from csdb_search_parser import parse_csdb_find
-
-
-class CSDBRelease(BaseModel):
-    name: str
-    release_type: str
-    release_date: str
-    groups: List[str]
-
-
-class CSDBGroup(BaseModel):
-    name: str
-    member_count: int
-    release_count: int
-
-
-class CSDBScener(BaseModel):
-    handle: str
-    real_name: Optional[str] = None
-    groups: List[str]
-
-
-class CSDBEvent(BaseModel):
-    name: str
-    start_date: str
-    end_date: Optional[str] = None
+import csdb_pager
+from csdb_xml import (CSDBEvent, CSDBGroup, CSDBRelease, CSDBScener,  # noqa: F401
+                      event_from_xml, format_entity, parse_group_xml, parse_release_xml,
+                      read_entity, scener_from_xml)
 
 # Load environment variables (override=True to prevent system vars from interfering)
 
@@ -54,16 +49,42 @@ logger = logging.getLogger(__name__)
 # CSDB API base URL
 CSDB_API_URL = "https://csdb.dk/webservice/"
 
+# Directory of the on-disk page cache (empty to keep pages in memory only)
+CSDB_CACHE_DIR = os.getenv('CSDB_CACHE_DIR', '/tmp/c64cloud/cache')
+
+# Local full-text mirror answering find before csdb.dk is scraped (see csdb_mirror.py)
+CSDB_MIRROR_DB = os.getenv('CSDB_MIRROR_DB')
+
+# Largest file cp and cd <zip> download; bigger ones are aborted
+CSDB_MAX_DOWNLOAD_BYTES = int(os.getenv('CSDB_MAX_DOWNLOAD_BYTES', str(32 * 1024 * 1024)))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Files of one cp downloaded at the same time, across all sessions
+CSDB_DOWNLOAD_WORKERS = int(os.getenv('CSDB_DOWNLOAD_WORKERS', '4'))
+# Seconds a cp waits for all its files; below the handler's 30 s budget
+CSDB_CP_DEADLINE = float(os.getenv('CSDB_CP_DEADLINE', '25'))
+# List and copy from zips with HTTP Range requests instead of downloading them ('0' to disable)
+CSDB_LAZY_ZIP = os.getenv('CSDB_LAZY_ZIP', '1') != '0'
+# Bytes between two progress reports of a download
+PROGRESS_STEP = 256 * 1024
+
+
+class DownloadTooLargeError(Exception):
+    """Raised when a download exceeds CSDB_MAX_DOWNLOAD_BYTES"""
+
 
 class CSDBHandler(BaseHandler):
     """Handler for CSDB.dk database queries"""
 
+    prefixes = ("c:",)
+    module_key = 'c'
+    # cp streams download progress before its result
+    reports_progress = True
+
     def __init__(self):
         """Initialize CSDBHandler"""
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'C64-Cloud-Server/1.0'
-        })
+        # Pooled keep-alive connections shared with other handlers, with timeouts,
+        # retries and a circuit breaker for every csdb.dk request
+        self.session = get_http_session()
 
         # Add authentication if available
         csdb_user = os.getenv('CSDB_USER')
@@ -72,16 +93,55 @@ class CSDBHandler(BaseHandler):
             self.session.auth = (csdb_user, csdb_password)
             logger.info("CSDB authentication enabled.")
 
+        # Release, group and search pages are cached and revalidated instead of re-fetched
+        self.http_cache = HTTPCache(self.session, cache_dir=CSDB_CACHE_DIR or None)
+        # Parse results of those pages, so revisiting a release or group skips BeautifulSoup
+        self.parsed_cache = ParsedCache()
+        # Sessions opening the same page at once share one fetch and parse
+        self.flights = SingleFlight()
+
+        self.mirror = None
+        if CSDB_MIRROR_DB and os.path.exists(CSDB_MIRROR_DB):
+            self.mirror = CSDBMirror(CSDB_MIRROR_DB)
+            logger.info(f"CSDB mirror enabled: {CSDB_MIRROR_DB}")
+
+        # Downloads are shared between sessions; each session gets its own directory of copies
+        self.downloads = get_download_store()
+        self.max_download_bytes = CSDB_MAX_DOWNLOAD_BYTES
+        self.lazy_zip = CSDB_LAZY_ZIP
+        # cp of several files downloads them concurrently, bounded for the whole server
+        self.download_pool = ThreadPoolExecutor(max_workers=CSDB_DOWNLOAD_WORKERS,
+                                                thread_name_prefix='csdb-download')
+        self.cp_deadline = CSDB_CP_DEADLINE
+        # Opt-in background fetch of the releases a group or find listing links to
+        self.prefetcher = get_prefetcher() if PREFETCH_ENABLED else None
+        self.prefetch_top_k = PREFETCH_TOP_K
+        # Progress sink of the request running on this thread (set by handle_progress)
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        """
+        Get HTTP client, cache and download store counters for monitoring
+        """
+        stats = {
+            'http': self.session.stats(),
+            'http_cache': self.http_cache.stats(),
+            'parsed_cache': self.parsed_cache.stats(),
+            'downloads': self.downloads.stats(),
+        }
+        if self.prefetcher is not None:
+            stats['prefetch'] = self.prefetcher.stats()
+        return stats
+
     def can_handle(self, text: str, session_id: int = 0) -> bool:
         """
         Only handle if text starts with c:, or if c: is the active module for this session.
         """
         t = text.strip().lower()
-        state = get_session_state(session_id)
         if t.startswith("c:"):
             return True
         # Only assume csdb module if user explicitly switched to it
-        if state.get('active_module') == 'c':
+        if self._location(session_id)[0] == 'c':
             # Don't handle if another command is detected
             if any(t.startswith(p) for p in ["i:", "?", "help"]):
                 return False
@@ -91,28 +151,68 @@ class CSDBHandler(BaseHandler):
     def handle(self, text: str, session_id: int = 0) -> str:
         """
         Process CSDB query or virtual navigation (cd/find/etc) for a session
+
+        The session lock is held only while the session state is read or
+        changed, never across a fetch or download.
         """
+        location = self._location(session_id)
+        self._local.prefetched = False
+        self._local.viewed = None
+        try:
+            return self._handle(text, session_id)
+        finally:
+            self._follow_prefetch(session_id, location)
+
+    def _handle(self, text: str, session_id: int) -> str:
         t = text.strip()
         t_lower = t.lower()
-        state = get_session_state(session_id)
 
         # If starts with c:, reset module and parse rest
         if t_lower.startswith("c:"):
-            state['active_module'] = 'c'
-            state['active_dir'] = None
-            state['active_id'] = None
+            self._update_session(session_id, active_module='c', active_dir=None, active_id=None)
             query = t[2:].strip()
             if not query:
                 return "CSDB mode"
             return self._process_csdb_command(query, session_id)
 
         # If c: is active module, interpret commands
-        if state.get('active_module') == 'c':
+        if self._location(session_id)[0] == 'c':
             return self._process_csdb_command(t, session_id)
 
         # Fallback: not handled
         return "Unknown command. Type 'help' for available commands."
 
+    @staticmethod
+    def _location(session_id: int) -> tuple:
+        """(active_module, active_dir, active_id) of a session"""
+        with session_lock(session_id):
+            state = get_session_state(session_id)
+            return state.get('active_module'), state.get('active_dir'), state.get('active_id')
+
+    @staticmethod
+    def _update_session(session_id: int, **changes):
+        """Change keys of a session's state under its lock"""
+        with session_lock(session_id):
+            get_session_state(session_id).update(changes)
+
+    def handle_progress(self, text: str, session_id: int, progress: Callable[[str], None]) -> str:
+        """
+        Process a CSDB request, reporting download progress lines while it runs
+
+        Args:
+            text: UTF-8 text to process
+            session_id: The session ID for the request
+            progress: Called with each progress line
+
+        Returns:
+            UTF-8 response text
+        """
+        self._local.progress = lambda line: progress(line + '\n')
+        try:
+            return self.handle(text, session_id)
+        finally:
+            self._local.progress = None
+
     def _process_csdb_command(self, query: str, session_id: int = 0) -> str:
         """
         Parse and execute a CSDB command string (e.g. 'group 123', 'find foo', etc) for a session
@@ -123,100 +223,232 @@ class CSDBHandler(BaseHandler):
             logger.error(f"Error processing CSDB command: {e}")
             return f"Error: {str(e)}"
 
-    def _format_find_result(self, result: dict, custom_section=None) -> str:
+    def _prefetch_releases(self, release_ids: List, session_id: Optional[int]):
+        """Fetch and parse the first linked releases of a listing in the background"""
+        if self.prefetcher is None or session_id is None:
+            return
+        ids = [int(i) for i in release_ids if i and str(i).isdigit()][:self.prefetch_top_k]
+        if not ids:
+            return
+        host = urlparse(CSDB_API_URL).hostname
+        self.prefetcher.submit(session_id, [
+            (('release', release_id), host, functools.partial(self._get_parsed_release_info, release_id))
+            for release_id in ids])
+        self._local.prefetched = True
+
+    def _follow_prefetch(self, session_id: int, location: tuple):
+        """Cancel a session's prefetches when it moved or showed anything but a prefetched release"""
+        if self.prefetcher is None or getattr(self._local, 'prefetched', False):
+            return
+        viewed = getattr(self._local, 'viewed', None)
+        moved = self._location(session_id) != location
+        if viewed is not None:
+            if not self.prefetcher.covers(session_id, viewed):
+                self.prefetcher.cancel(session_id)
+        elif moved:
+            self.prefetcher.cancel(session_id)
+
+    def _format_find_result(self, result: dict, entity_type: Optional[str] = None,
+                            session_id: Optional[int] = None) -> str:
         """
-        Format a find result dict as text (same as _find_csdb output)
-        If custom_section is provided, only format that section: (section, show_all_label, key, count_key)
+        Format the first page of a find result dict, keeping it as the session's cursor
+        If entity_type is provided, only format the section of that type (e.g. 'bbs')
         """
         if 'error' in result:
             return result['error']
 
-        def fmt_items(items, count, section, show_all_label):
-            output = []
-            if items:
-                output.append(f"{count} {section} matches:")
-                for item in items[:10]:  # Limit to 10 items
-                    output.append(f"  {item['id']}: {item['name']}")
-                if count > 10:
-                    output.append(f"  (and {count - 10} more...)")
-            return output
-
-        output = []
-        if custom_section:
-            section, show_all_label, key, count_key = custom_section
-            output += fmt_items(result.get(key, []),
-                                result.get(count_key, 0), section, show_all_label)
+        # Mirror results hold the best few items of each type; the rest are loaded when paged to
+        mirror_query = result.get('mirror_query')
+
+        def find_section(key, count_key, section, entity_type):
+            items = result.get(key, [])
+            if not items:
+                return None
+            source = {'text': mirror_query, 'type': entity_type} if mirror_query else None
+            lines = [f"  {item['id']}: {item.get('name') or item.get('text', '')}" for item in items]
+            count = result.get(count_key, 0)
+            # A scraped page is all there is to page through; only the mirror can load more
+            return csdb_pager.section(f"{count} {section} matches:", count if source else len(lines), lines, source)
+
+        if entity_type:
+            sections = [find_section(ENTITY_TYPES.get(entity_type, f"{entity_type}s"), f"{entity_type}_count",
+                                     entity_type, entity_type)]
         else:
-            output += fmt_items(result.get('releases', []),
-                                result.get('release_count', 0), 'release matches', 'releases')
-            output += fmt_items(result.get('groups', []),
-                                result.get('group_count', 0), "group", "groups")
-            output.extend(fmt_items(result.get('sceners', []), result.get(
-                'scener_count', 0), "scener", "sceners"))
-        return '\n'.join(output) if output else "No results found."
+            sections = [find_section('releases', 'release_count', 'release matches', 'release'),
+                        find_section('groups', 'group_count', 'group', 'group'),
+                        find_section('sceners', 'scener_count', 'scener', 'scener')]
+        sections = [s for s in sections if s]
+        if not sections:
+            return "No results found."
+        if entity_type in (None, 'release'):
+            self._prefetch_releases([item['id'] for item in result.get('releases', [])], session_id)
+        return self._show_cursor(csdb_pager.new_cursor(sections), session_id)
+
+    def _paged_text(self, text: str, session_id: Optional[int]) -> str:
+        """First page of a formatted listing, keeping the rest for next/prev/page"""
+        cursor = csdb_pager.text_cursor(text)
+        if csdb_pager.page_count(cursor) == 1:
+            return text
+        return self._show_cursor(cursor, session_id)
+
+    def _show_cursor(self, cursor: dict, session_id: Optional[int]) -> str:
+        page = csdb_pager.render(cursor, 0, self._load_find_items)
+        if session_id is not None:
+            self._update_session(session_id, cursor=cursor)
+        return page
+
+    def _load_find_items(self, source: dict, offset: int, limit: int) -> List[str]:
+        """Further items of a mirror find section"""
+        if self.mirror is None:
+            return []
+        result = self.mirror.search(source['text'], source['type'], limit=limit, offset=offset)
+        items = result.get(ENTITY_TYPES.get(source['type'], f"{source['type']}s"), [])
+        return [f"  {item['id']}: {item.get('name') or item.get('text', '')}" for item in items]
+
+    def _turn_page(self, cmd: str, arg: str, session_id: int) -> str:
+        """Answer next, prev and page <n> from the session's cursor"""
+        with session_lock(session_id):
+            current = get_session_state(session_id).get('cursor')
+            # Rendered on a copy: loading further items is I/O, done outside the lock
+            cursor = copy.deepcopy(current)
+        if not cursor:
+            return "Nothing to page. Use find or cd <id> first."
+        pages = csdb_pager.page_count(cursor)
+        if cmd == 'next':
+            page = cursor['page'] + 1
+            if page >= pages:
+                return "No more pages."
+        elif cmd == 'prev':
+            page = cursor['page'] - 1
+            if page < 0:
+                return "Already at the first page."
+        else:
+            if not arg.isdigit() or not 1 <= int(arg) <= pages:
+                return f"Usage: page <1-{pages}>"
+            page = int(arg) - 1
+        text = csdb_pager.render(cursor, page, self._load_find_items)
+        with session_lock(session_id):
+            state = get_session_state(session_id)
+            # Unless another listing replaced it meanwhile
+            if state.get('cursor') is current:
+                state['cursor'] = cursor
+        return text
 
     def _cp_file(self, file_pattern: str, session_id: int) -> str:
         """Copy file(s) from a release or zip."""
-        state = get_session_state(session_id)
+        with session_lock(session_id):
+            live = get_session_state(session_id)
+            state = {key: live.get(key) for key in ('active_dir', 'active_id', 'zip_id', 'zip_files')}
         if not state.get('active_dir') == 'release' or not state.get('active_id'):
             return "cp can only be used within a release."
 
         output = []
-        tmp_dir = Path("/tmp/c64cloud")
-        tmp_dir.mkdir(exist_ok=True)
+        session_dir = self.downloads.session_dir(session_id)
 
         if state.get('zip_id') and state.get('zip_files'):
             # Copy from zip
-            zip_path = tmp_dir / f"{state['zip_id']}.zip"
-            if not zip_path.exists():
-                return f"Zip file for {state['zip_id']} not found."
-            with zipfile.ZipFile(zip_path, 'r') as z:
+            try:
+                z = self._open_zip(state['zip_id'])
+            except DownloadTooLargeError as e:
+                return f"Zip file {state['zip_id']} is too large to download: {e}"
+            except zipfile.BadZipFile:
+                return f"Zip file {state['zip_id']} is not a valid zip archive."
+            except requests.exceptions.RequestException as e:
+                return f"Zip file for {state['zip_id']} not found: {e}"
+            with z:
                 for f in state['zip_files']:
                     if fnmatch.fnmatch(f, file_pattern):
-                        z.extract(f, path=tmp_dir)
-                        output.append(f"Copied {f} to /tmp/c64cloud")
+                        size = z.getinfo(f).file_size
+                        if size > self.max_download_bytes:
+                            output.append(f"Failed to copy {f}: {size} bytes exceeds the limit of "
+                                          f"{self.max_download_bytes} bytes")
+                            continue
+                        try:
+                            z.extract(f, path=session_dir)
+                            output.append(f"Copied {f} to {session_dir}")
+                        except (requests.exceptions.RequestException, RangeNotSupportedError,
+                                zipfile.BadZipFile, zlib.error, OSError) as e:
+                            # A corrupt member or a full disk fails this file, not the whole cp
+                            output.append(f"Failed to copy {f}: {e}")
         else:
             # Copy from release
             release_info = self._get_parsed_release_info(state['active_id'])
             if not release_info or 'files' not in release_info:
                 return "No files found for this release."
 
-            for f in release_info['files']:
-                if fnmatch.fnmatch(f['name'], file_pattern):
-                    download_url = f"{CSDB_API_URL}?request=download&id={f['id']}"
-                    try:
-                        response = self.session.get(download_url)
-                        response.raise_for_status()
-                        file_path = tmp_dir / f['name']
-                        with open(file_path, 'wb') as out_file:
-                            out_file.write(response.content)
-                        output.append(f"Copied {f['name']} to /tmp/c64cloud")
-                    except requests.exceptions.RequestException as e:
-                        output.append(f"Failed to download {f['name']}: {e}")
+            matches = [f for f in release_info['files'] if fnmatch.fnmatch(f['name'], file_pattern)]
+            output = self._copy_release_files(matches, session_id)
 
         return '\n'.join(output) if output else "No files copied."
 
-    def _cd_into_zip(self, file_id: int, session_id: int) -> str:
-        """Download and extract a zip file, listing its contents."""
-        state = get_session_state(session_id)
-        download_url = f"{CSDB_API_URL}?request=download&id={file_id}"
-        tmp_dir = Path("/tmp/c64cloud")
-        tmp_dir.mkdir(exist_ok=True)
-        zip_path = tmp_dir / f"{file_id}.zip"
+    def _copy_release_files(self, files: List[Dict], session_id: int) -> List[str]:
+        """
+        Download release files concurrently into the session directory
 
-        try:
-            response = self.session.get(download_url)
-            response.raise_for_status()
-            with open(zip_path, 'wb') as f:
-                f.write(response.content)
+        Args:
+            files: Release file dicts with 'id' and 'name'
+            session_id: Session ID
+
+        Returns:
+            One status line per file in release order, plus a summary when several files were copied
+        """
+        if not files:
+            return []
+        session_dir = self.downloads.session_dir(session_id)
+        # Progress of the worker threads goes to this request's stream
+        report = getattr(self._local, 'progress', None)
+
+        def copy(f: Dict) -> str:
+            self._local.progress = report
+            try:
+                blob = self._fetch_file(f['id'], f['name'])
+                try:
+                    self.downloads.link_into_session(session_id, blob, f['name'])
+                except FileNotFoundError:
+                    # Evicted by another download since it was fetched
+                    blob = self._fetch_file(f['id'], f['name'])
+                    self.downloads.link_into_session(session_id, blob, f['name'])
+                return f"Copied {f['name']} to {session_dir}"
+            except (requests.exceptions.RequestException, DownloadTooLargeError, OSError) as e:
+                return f"Failed to download {f['name']}: {e}"
+            finally:
+                self._local.progress = None
+
+        started = time.monotonic()
+        futures = [self.download_pool.submit(copy, f) for f in files]
+        # copy() only raises when the handler pool cancelled the request
+        done, pending = wait(futures, timeout=self.cp_deadline, return_when=FIRST_EXCEPTION)
+        cancelled = any(isinstance(future.exception(), RequestCancelledError) for future in done)
+        if cancelled:
+            for future in pending:
+                future.cancel()
+            # Downloads already running stop at their next progress report
+            wait(futures, timeout=max(0.0, started + self.cp_deadline - time.monotonic()))
+
+        output = []
+        copied = 0
+        for f, future in zip(files, futures):
+            if future.done() and not future.cancelled() and future.exception() is None:
+                line = future.result()
+                copied += line.startswith("Copied")
+            else:
+                # Not started yet: drop it; already running: it finishes into the store
+                future.cancel()
+                line = f"Failed to download {f['name']}: {'cancelled' if cancelled else 'timed out'}"
+            output.append(line)
+        if len(files) > 1:
+            output.append(f"{copied} of {len(files)} files copied in {time.monotonic() - started:.1f}s.")
+        return output
 
-            with zipfile.ZipFile(zip_path, 'r') as z:
+    def _cd_into_zip(self, file_id: int, session_id: int) -> str:
+        """List the contents of a zip file, reading only its central directory when possible."""
+        try:
+            with self._open_zip(file_id) as z:
                 files = z.namelist()
-                state['zip_id'] = file_id
-                state['zip_files'] = files
+                self._update_session(session_id, zip_id=file_id, zip_files=files)
                 return "Contents of zip:\n" + "\n".join(f"  - {f}" for f in files)
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, DownloadTooLargeError) as e:
             return f"Failed to download zip: {e}"
         except zipfile.BadZipFile:
             return "Downloaded file is not a valid zip archive."
@@ -224,6 +456,92 @@ class CSDBHandler(BaseHandler):
             logger.error(f"Error handling zip: {e}")
             return "An error occurred while processing the zip file."
 
+    def _open_zip(self, file_id: int) -> zipfile.ZipFile:
+        """
+        Open a zip from the download store, remotely with Range requests, or by downloading it
+
+        A remote zip costs only its central directory when opened and the
+        bytes of each member extracted from it.
+
+        Args:
+            file_id: CSDB file id of the zip
+
+        Returns:
+            Opened zip file
+        """
+        blob = self.downloads.get(int(file_id))
+        if blob is None and self.lazy_zip:
+            remote = open_range_file(self.session, f"{CSDB_API_URL}?request=download&id={file_id}")
+            if remote is not None:
+                # Only the members read count against the limit, checked per member by the callers
+                return zipfile.ZipFile(remote, 'r')
+        if blob is None:
+            blob = self._fetch_file(file_id, f"{file_id}.zip")
+        return zipfile.ZipFile(blob, 'r')
+
+    def _fetch_file(self, file_id: int, name: str) -> Path:
+        """
+        Get a CSDB file from the download store, downloading it on first use
+
+        Args:
+            file_id: CSDB file id
+            name: File name, used for progress reports
+
+        Returns:
+            Path of the shared read-only copy
+        """
+        download_url = f"{CSDB_API_URL}?request=download&id={file_id}"
+        return self.downloads.fetch(int(file_id), name,
+                                    lambda dest: self._download(download_url, dest, name))
+
+    def _download(self, url: str, dest: Path, label: str) -> int:
+        """
+        Stream a download to disk in chunks, replacing dest only when complete
+
+        Args:
+            url: Download URL
+            dest: Target file
+            label: File name shown in progress reports
+
+        Returns:
+            Number of bytes written
+
+        Raises:
+            requests.RequestException: If the download fails
+            DownloadTooLargeError: If the file exceeds max_download_bytes
+        """
+        limit = self.max_download_bytes
+        report: Optional[Callable[[str], None]] = getattr(self._local, 'progress', None)
+        with self.session.get(url, stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            total = int(resp.headers.get('Content-Length') or 0) or None
+            if total and total > limit:
+                raise DownloadTooLargeError(f"{total} bytes exceeds the limit of {limit} bytes")
+
+            # Same directory as dest, so the final rename is atomic
+            fd, tmp_path = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix='.part')
+            try:
+                size = 0
+                next_report = PROGRESS_STEP
+                with os.fdopen(fd, 'wb') as out:
+                    for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > limit:
+                            raise DownloadTooLargeError(f"more than {limit} bytes")
+                        out.write(chunk)
+                        if report and size >= next_report:
+                            done = f"{size // 1024}/{total // 1024} KB" if total else f"{size // 1024} KB"
+                            report(f"{label}: {done}")
+                            next_report = size + PROGRESS_STEP
+                os.replace(tmp_path, dest)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        return size
+
     def _query_csdb(self, query: str) -> str:
         """
         Make a raw query to the CSDB webservice and return raw response
@@ -236,20 +554,25 @@ class CSDBHandler(BaseHandler):
             logger.error(f"CSDB query failed: {e}")
             return f"Error: Could not connect to CSDB ({e})"
 
-    def _find_csdb(self, search_text: str) -> dict:
+    def _find_csdb(self, search_text: str, entity_type: Optional[str] = None) -> dict:
         """
-        Perform CSDB find (HTML search) and return parsed result dict
+        Perform CSDB find and return parsed result dict
+        Answers from the local mirror if it has matches, else scrapes the HTML search.
         """
+        if self.mirror is not None:
+            result = self.mirror.search(search_text, entity_type)
+            if any(v for k, v in result.items() if k.endswith('_count')):
+                result['mirror_query'] = search_text
+                return result
+
+        if entity_type:
+            search_text = f"{entity_type} {search_text}".strip()
         url = f"https://csdb.dk/search/?seinsel=all&search={search_text}&Go.x=8&Go.y=9"
         try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-            html = resp.text
+            return self._get_parsed('find', search_text, url, parse_csdb_find)
         except requests.RequestException as e:
             return {'error': f"Network error: {str(e)}"}
 
-        return parse_csdb_find(html)
-
     def _get_entry_info(self, entry_type: str, entry_id: int, session_id: int, depth: int = 2) -> str:
         def format_members(members: list) -> str:
             if not members:
@@ -382,21 +705,23 @@ class CSDBHandler(BaseHandler):
                 output.append("")
             return '\n'.join(output)
         """
-        Get information for a specific CSDB entry
-        For 'group' and 'release', use HTML parser for detailed information.
+        Get information for a specific CSDB entry from the webservice XML.
+        'group' and 'release' fall back to the csdb.dk HTML pages.
         """
-        state = get_session_state(session_id)
-        if state.get('zip_id') and state.get('zip_files'):
-            return "Contents of zip file:\n" + '\n'.join(state['zip_files'])
+        self._local.viewed = (entry_type, entry_id)
+        with session_lock(session_id):
+            state = get_session_state(session_id)
+            zip_files = state.get('zip_id') and state.get('zip_files')
+        if zip_files:
+            return "Contents of zip file:\n" + '\n'.join(zip_files)
 
         if entry_type == 'group':
             try:
-                url = f"https://csdb.dk/group/?id={entry_id}"
-                logger.info(f"Fetching group HTML for id {entry_id}: {url}")
-                resp = self.session.get(url, timeout=10)
-                resp.raise_for_status()
-                group_data = parse_csdb_group_detail(resp.text)
-                return format_group_output(group_data, entry_id)
+                group_data = self._get_parsed_group_info(entry_id)
+                if 'error' in group_data:
+                    return group_data['error']
+                self._prefetch_releases([r.get('id') for r in group_data.get('releases', [])], session_id)
+                return self._paged_text(format_group_output(group_data, entry_id), session_id)
             except Exception as e:
                 return f"Error parsing group page: {e}"
 
@@ -405,59 +730,23 @@ class CSDBHandler(BaseHandler):
                 release_data = self._get_parsed_release_info(entry_id)
                 if 'error' in release_data:
                     return release_data['error']
-                return format_release_output(release_data, entry_id)
+                return self._paged_text(format_release_output(release_data, entry_id), session_id)
             except Exception as e:
                 return f"Error parsing release page: {e}"
 
         try:
-            params = {
-                'type': entry_type,
-                'id': entry_id,
-                'depth': min(depth, 4)
-            }
             logger.info(f"Fetching {entry_type} {entry_id} from CSDB XML API")
-            response = self.session.get(
-                CSDB_API_URL, params=params, timeout=10)
-            response.raise_for_status()
-            root = ET.fromstring(response.content)
-            if entry_type == 'release':
-                # This code path should not be reached anymore
-                name = root.findtext('.//Release/Name', 'Unknown')
-                release_type = root.findtext('.//Release/Type', 'Unknown')
-                release_date = root.findtext(
-                    './/Release/ReleaseDate', 'Unknown')
-                groups = [group.findtext('Name', 'Unknown') for group in root.findall(
-                    './/Release/ReleasedBy/Group')]
-                model = CSDBRelease(
-                    name=name,
-                    release_type=release_type,
-                    release_date=release_date,
-                    groups=groups
-                )
-                return format_release_output({}, entry_id)
-            elif entry_type == 'scener':
-                handle = root.findtext('.//Scener/Handle', 'Unknown')
-                real_name = root.findtext('.//Scener/RealName', None)
-                groups = [group.findtext('Name', 'Unknown')
-                          for group in root.findall('.//Scener/Groups/Group')]
-                model = CSDBScener(
-                    handle=handle,
-                    real_name=real_name,
-                    groups=groups
-                )
-                return format_scener_output(model)
+            response = self.http_cache.get(CSDB_API_URL, kind=entry_type,
+                                           params=self._webservice_params(entry_type, entry_id, depth))
+            entity = read_entity(response.content, entry_type)
+            if entity is None:
+                return f"No {entry_type} {entry_id} in CSDB response"
+            if entry_type == 'scener':
+                return format_scener_output(scener_from_xml(entity))
             elif entry_type == 'event':
-                name = root.findtext('.//Event/Name', 'Unknown')
-                start_date = root.findtext('.//Event/StartDate', 'Unknown')
-                end_date = root.findtext('.//Event/EndDate', None)
-                model = CSDBEvent(
-                    name=name,
-                    start_date=start_date,
-                    end_date=end_date
-                )
-                return format_event_output(model)
+                return format_event_output(event_from_xml(entity))
             else:
-                return self._format_generic(root)
+                return format_entity(entity)
         except requests.RequestException as e:
             logger.error(f"HTTP error querying CSDB: {e}")
             return f"Network error: {str(e)}"
@@ -468,18 +757,59 @@ class CSDBHandler(BaseHandler):
             logger.error(f"Error getting entry info: {e}")
             return f"Error: {str(e)}"
 
-    def _get_parsed_release_info(self, release_id: int) -> dict:
-        """Helper to get parsed release info from HTML."""
-        from csdb_release_parser import parse_csdb_release_detail
-        url = f"https://csdb.dk/release/?id={release_id}"
+    @staticmethod
+    def _webservice_params(entry_type: str, entry_id: int, depth: int = 2) -> dict:
+        return {'type': entry_type, 'id': entry_id, 'depth': min(depth, 4)}
+
+    def _get_parsed_detail(self, entry_type: str, entry_id: int, parse_xml, parse_html) -> dict:
+        """
+        Parsed detail of a release or group from the webservice XML, or from
+        its csdb.dk HTML page when the webservice fails or has no such entity
+        """
+        url = requests.Request('GET', CSDB_API_URL, params=self._webservice_params(entry_type, entry_id)).prepare().url
         try:
-            resp = self.session.get(url, timeout=10)
-            resp.raise_for_status()
-            html = resp.text
+            result = self._get_parsed(entry_type, ('xml', entry_id), url, parse_xml)
+            if 'error' not in result:
+                return result
+            logger.warning(f"Webservice {entry_type} {entry_id}: {result['error']}; using the HTML page")
+        except requests.RequestException as e:
+            logger.warning(f"Webservice {entry_type} {entry_id}: {e}; using the HTML page")
+
+        url = f"https://csdb.dk/{entry_type}/?id={entry_id}"
+        # A prefetch pays for the second request, and stops here if it was cancelled meanwhile
+        prefetch_checkpoint(urlparse(url).hostname)
+        try:
+            return self._get_parsed(entry_type, entry_id, url, parse_html)
         except requests.RequestException as e:
-            return {'error': f"Network error getting release info: {e}"}
+            return {'error': f"Network error getting {entry_type} info: {e}"}
 
-        return parse_csdb_release_detail(html)
+    def _get_parsed_release_info(self, release_id: int) -> dict:
+        """Helper to get parsed release info (webservice XML, HTML as fallback)."""
+        import csdb_release_parser
+        return self._get_parsed_detail('release', release_id, parse_release_xml,
+                                       csdb_release_parser.parse_csdb_release_detail)
+
+    def _get_parsed_group_info(self, group_id: int) -> dict:
+        """Helper to get parsed group info (webservice XML, HTML as fallback)."""
+        return self._get_parsed_detail('group', group_id, parse_group_xml, parse_csdb_group_detail)
+
+    def _get_parsed(self, kind: str, key, url: str, parse) -> dict:
+        """
+        Fetch a page through the HTTP cache and parse it, reusing an earlier
+        parse result of the same page body. Results are shared; do not modify them.
+        """
+        return self.flights.do((kind, key), lambda: self._fetch_and_parse(kind, key, url, parse))
+
+    def _fetch_and_parse(self, kind: str, key, url: str, parse) -> dict:
+        """Fetch and parse a page unless the parse result is cached"""
+        page = self.http_cache.get(url, kind=kind)
+        result = self.parsed_cache.get(kind, key, page.digest)
+        if result is None:
+            result = parse(page.text)
+            # Errors are not cached so the next request parses again
+            if 'error' not in result:
+                self.parsed_cache.put(kind, key, page.digest, result)
+        return result
 
     def _search_help(self, query: str) -> str:
         """
@@ -505,12 +835,16 @@ c: cd <id>       - View details of an item
 c: cd ..         - Go up one level
 c: pwd           - Show current path
 c: cp <file>     - Copy file from a release to local tmp
+c: next / prev   - Next or previous page of a long listing
+c: page <n>      - Go to page n of the listing
 exit            - Exit interactive mode"""
 
     def _parse_and_execute(self, command: str, session_id: int) -> str:
         """
         Parse and execute a command in the context of a session's CSDB state.
         """
+        # The session lock covers reading and changing the state; fetches run after it is released
+        lock = session_lock(session_id)
         state = get_session_state(session_id)
         parts = command.strip().split(maxsplit=1)
         cmd = parts[0].lower() if parts else ''
@@ -518,16 +852,17 @@ exit            - Exit interactive mode"""
 
         # PWD
         if cmd == 'pwd':
+            active_dir, active_id = self._location(session_id)[1:]
             path = "c:/"
-            if state.get('active_dir'):
-                path += state['active_dir']
-            if state.get('active_id'):
-                path += f"/{state['active_id']}"
+            if active_dir:
+                path += active_dir
+            if active_id:
+                path += f"/{active_id}"
             return path
 
         # EXIT
         if cmd == 'exit':
-            state['active_module'] = None
+            self._update_session(session_id, active_module=None)
             return "Exited CSDB mode."
 
         # CD
@@ -539,12 +874,11 @@ exit            - Exit interactive mode"""
             if arg.startswith('/'):
                 path_parts = [p for p in arg.split('/') if p]
                 if len(path_parts) == 2 and path_parts[0].lower() in ['release', 'group', 'scener', 'event', 'bbs', 'sid'] and path_parts[1].isdigit():
-                    state['active_dir'] = path_parts[0].lower()
-                    state['active_id'] = int(path_parts[1])
-                    return self._get_entry_info(state['active_dir'], state['active_id'], session_id)
+                    entry_type, entry_id = path_parts[0].lower(), int(path_parts[1])
+                    self._update_session(session_id, active_dir=entry_type, active_id=entry_id)
+                    return self._get_entry_info(entry_type, entry_id, session_id)
                 elif len(path_parts) == 3 and path_parts[0].lower() == 'release' and path_parts[1].isdigit() and path_parts[2].isdigit():
-                    state['active_dir'] = 'release'
-                    state['active_id'] = int(path_parts[1])
+                    self._update_session(session_id, active_dir='release', active_id=int(path_parts[1]))
                     # This is likely a zip file inside a release, attempt to cd into it
                     return self._cd_into_zip(int(path_parts[2]), session_id)
                 else:
@@ -552,18 +886,21 @@ exit            - Exit interactive mode"""
 
             # cd <type>
             if arg.lower() in ['release', 'group', 'scener', 'event', 'bbs', 'sid']:
-                state['active_dir'] = arg.lower()
-                state['active_id'] = None
-                return f"Switched to {state['active_dir']} directory."
+                self._update_session(session_id, active_dir=arg.lower(), active_id=None)
+                return f"Switched to {arg.lower()} directory."
             # cd <id>
             if arg.isdigit():
-                if not state.get('active_dir'):
+                with lock:
+                    active_dir = state.get('active_dir')
+                    if active_dir:
+                        state['active_id'] = int(arg)
+                if not active_dir:
                     return "Cannot cd into an ID without a directory context. Use 'cd <type>' first."
-                state['active_id'] = int(arg)
-                return self._get_entry_info(state['active_dir'], state['active_id'], session_id)
+                return self._get_entry_info(active_dir, int(arg), session_id)
             # cd <zip_file_id>
-            if arg.lower().endswith('.zip') and state.get('active_dir') == 'release' and state.get('active_id'):
-                release_info = self._get_parsed_release_info(state['active_id'])
+            active_dir, active_id = self._location(session_id)[1:]
+            if arg.lower().endswith('.zip') and active_dir == 'release' and active_id:
+                release_info = self._get_parsed_release_info(active_id)
                 file_id = None
                 for f in release_info.get('files', []):
                     if f['name'].lower() == arg.lower():
@@ -578,21 +915,26 @@ exit            - Exit interactive mode"""
 
         # FIND / LS
         if cmd in ['find', 'ls']:
-            search_text = arg if cmd == 'find' else (state.get('last_find', '') if 'ls' else '')
-            if not search_text and not state.get('active_dir'):
+            with lock:
+                search_text = arg if cmd == 'find' else state.get('last_find', '')
+                active_dir = state.get('active_dir')
+                if search_text or active_dir:
+                    state['last_find'] = search_text
+            if not search_text and not active_dir:
                 return "Usage: find <text>"
-            state['last_find'] = search_text
 
-            if state.get('active_dir'):
+            if active_dir:
                 # Search within a specific directory
-                full_query = f"{state['active_dir']} {search_text}".strip()
-                result = self._find_csdb(full_query)
-                return self._format_find_result(result, custom_section=(
-                    state['active_dir'], f"{state['active_dir']}s", state['active_dir']+'s', state['active_dir']+'_count'))
+                result = self._find_csdb(search_text, active_dir)
+                return self._format_find_result(result, entity_type=active_dir, session_id=session_id)
             else:
                 # Global search
                 result = self._find_csdb(search_text)
-                return self._format_find_result(result)
+                return self._format_find_result(result, session_id=session_id)
+
+        # NEXT / PREV / PAGE through the last listing
+        if cmd in ['next', 'prev', 'page']:
+            return self._turn_page(cmd, arg, session_id)
 
         # CP
         if cmd == 'cp':
@@ -605,4 +947,4 @@ exit            - Exit interactive mode"""
             return self._get_entry_info(cmd, int(arg), session_id)
 
         # Fallback to a general find
-        return self._format_find_result(self._find_csdb(command))
+        return self._format_find_result(self._find_csdb(command), session_id=session_id)
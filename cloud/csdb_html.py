@@ -0,0 +1,65 @@
+"""
+Shared HTML extraction for the csdb.dk page parsers
+
+Every csdb.dk page keeps its content in one `<td valign="top" width="100%">`
+cell, sectioned by `<b>` headers ("Group Type :", "Releases :", "219 release
+matches:", ...). parse_main() builds only that cell (a SoupStrainer skips
+the page header, menus and footer), and Sections indexes the `<b>` headers
+of the cell once so each parser looks its sections up instead of re-walking
+the tree for every field.
+
+Pages are built with html.parser, the tree builder the parsers always used.
+lxml is faster but repairs broken markup differently (a misnested `</font>`
+in a member table keeps rows html.parser drops), so it is only used when
+CSDB_HTML_PARSER=lxml is set.
+"""
+import os
+from typing import Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Tag
+
+# Attributes of the content cell of every csdb.dk page
+MAIN_TD_ATTRS = {'valign': 'top', 'width': '100%'}
+
+
+# BeautifulSoup tree builder; CSDB_HTML_PARSER=lxml selects the faster one
+HTML_BACKEND = os.getenv('CSDB_HTML_PARSER') or 'html.parser'
+
+_MAIN_STRAINER = SoupStrainer('td', attrs=MAIN_TD_ATTRS)
+
+
+def parse_main(html: str, backend: Optional[str] = None) -> Optional[Tag]:
+    """
+    Parse only the content cell of a csdb.dk page
+
+    Args:
+        html: Page HTML
+        backend: BeautifulSoup tree builder (default HTML_BACKEND)
+
+    Returns:
+        The content `<td>`, or None if the page has none
+    """
+    soup = BeautifulSoup(html, backend or HTML_BACKEND, parse_only=_MAIN_STRAINER)
+    return soup.find('td', attrs=MAIN_TD_ATTRS)
+
+
+class Sections:
+    """The `<b>` headers of a content cell, indexed once in document order"""
+
+    def __init__(self, main: Tag):
+        # (tag, full text, .string) per header; .string is None unless the header holds a single text
+        self._headers: List[Tuple[Tag, str, Optional[str]]] = [
+            (b, b.get_text(), b.string) for b in main.find_all('b')]
+
+    def all(self, text: str) -> Iterator[Tag]:
+        """Headers whose text contains text"""
+        return (b for b, full, _ in self._headers if text in full)
+
+    def first(self, text: str) -> Optional[Tag]:
+        """First header whose text contains text"""
+        return next(self.all(text), None)
+
+    def first_string(self, text: str) -> Optional[Tag]:
+        """First header consisting of a single string that contains text (like find('b', string=...))"""
+        return next((b for b, _, string in self._headers if string and text in string), None)
@@ -0,0 +1,330 @@
+"""
+Local CSDB mirror with a full-text index
+
+Keeps releases, groups, sceners, events, BBSes and SIDs in a SQLite FTS5
+index so `find` can be answered locally in milliseconds instead of
+scraping csdb.dk/search. The index is filled from CSDB webservice XML,
+either by importing a dump (or a single webservice response) from disk or
+by crawling the webservice id by id.
+
+Usage:
+    python csdb_mirror.py --db csdb.db import dump.xml [more.xml ...]
+    python csdb_mirror.py --db csdb.db crawl --type release --from 1 --to 5000
+    python csdb_mirror.py --db csdb.db search "edge of disgrace"
+"""
+import argparse
+import logging
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, IO, Iterable, List, Optional, Tuple, Union
+
+import requests
+
+from http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+# CSDB webservice URL used by the crawler
+CSDB_API_URL = "https://csdb.dk/webservice/"
+
+# Entity types in the index, with the result keys used by parse_csdb_find()
+ENTITY_TYPES = {
+    'release': 'releases',
+    'group': 'groups',
+    'scener': 'sceners',
+    'event': 'events',
+    'bbs': 'bbses',
+    'sid': 'sids',
+}
+
+# Webservice XML element name -> entity type
+_XML_TAGS = {
+    'Release': 'release',
+    'Group': 'group',
+    'Scener': 'scener',
+    'Event': 'event',
+    'BBS': 'bbs',
+    'SID': 'sid',
+}
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _text(element: ET.Element, path: str) -> str:
+    """Stripped text of a sub element, or ''"""
+    return (element.findtext(path) or '').strip()
+
+
+def entry_from_xml(element: ET.Element) -> Optional[Tuple[str, int, str, str, str]]:
+    """
+    Converts a webservice XML entity into an index entry.
+
+    Returns:
+        Tuple of (type, id, name, display text, extra search text), or None
+        if the element is not an entity with an ID
+    """
+    entity_type = _XML_TAGS.get(element.tag)
+    entity_id = _text(element, 'ID')
+    if not entity_type or not entity_id.isdigit():
+        return None
+
+    extra = []
+    if entity_type == 'release':
+        name = _text(element, 'Name')
+        groups = [_text(g, 'Name') for g in element.findall('ReleasedBy/Group')]
+        groups += [_text(h, 'Handle') for h in element.findall('ReleasedBy/Handle')]
+        groups = [g for g in groups if g]
+        year = _text(element, 'ReleaseYear')
+        display = name
+        if groups:
+            display += f" by {', '.join(groups)}"
+        if year:
+            display += f" ({year})"
+        extra = groups + [_text(element, 'Type')]
+    elif entity_type == 'scener':
+        name = _text(element, 'Handle/Handle') or _text(element, 'Handle')
+        display = name
+    elif entity_type == 'sid':
+        name = _text(element, 'Name')
+        author = _text(element, 'Author')
+        display = f"{name} by {author}" if author else name
+        extra = [author, _text(element, 'HVSCPath')]
+    elif entity_type == 'event':
+        name = _text(element, 'Name')
+        year = _text(element, 'StartYear')
+        display = f"{name} ({year})" if year else name
+    else:
+        name = _text(element, 'Name')
+        extra = [_text(element, 'Abbreviation')]
+        display = name
+
+    if not name:
+        return None
+    return entity_type, int(entity_id), name, display, ' '.join(e for e in extra if e)
+
+
+def fts_query(text: str) -> str:
+    """
+    Builds an FTS5 query matching all words of the text as prefixes.
+    User input is never passed to MATCH directly, so FTS syntax in it is inert.
+    """
+    return ' '.join(f'"{word}"*' for word in _WORD_RE.findall(text.lower()))
+
+
+class CSDBMirror:
+    """SQLite FTS5 index of CSDB entities"""
+
+    def __init__(self, path: str):
+        """
+        Open or create the mirror database
+
+        Args:
+            path: Database file path (':memory:' for a temporary index)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " type TEXT NOT NULL,"
+            " id INTEGER NOT NULL,"
+            " name TEXT NOT NULL,"
+            " display TEXT NOT NULL,"
+            " extra TEXT NOT NULL DEFAULT '',"
+            " PRIMARY KEY (type, id));"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+            " name, extra, type UNINDEXED,"
+            " content='entries', content_rowid='rowid',"
+            " tokenize='unicode61 remove_diacritics 2');"
+            "CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN"
+            " INSERT INTO entries_fts(rowid, name, extra, type)"
+            " VALUES (new.rowid, new.name, new.extra, new.type); END;"
+            "CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN"
+            " INSERT INTO entries_fts(entries_fts, rowid, name, extra, type)"
+            " VALUES ('delete', old.rowid, old.name, old.extra, old.type); END;")
+        self._conn.commit()
+
+    def add_many(self, entries: Iterable[Tuple[str, int, str, str, str]]) -> int:
+        """
+        Insert or replace index entries
+
+        Args:
+            entries: Tuples of (type, id, name, display text, extra search text)
+
+        Returns:
+            Number of entries written
+        """
+        count = 0
+        with self._lock, self._conn:
+            for entry in entries:
+                self._conn.execute("DELETE FROM entries WHERE type = ? AND id = ?", entry[:2])
+                self._conn.execute(
+                    "INSERT INTO entries (type, id, name, display, extra) VALUES (?, ?, ?, ?, ?)", entry)
+                count += 1
+        return count
+
+    def import_xml(self, source: Union[str, IO[bytes]]) -> int:
+        """
+        Import webservice XML: a single response or a dump with many entities
+
+        Only top-level entities are imported; groups nested in a release are
+        references and do not replace the group's own entry.
+
+        Args:
+            source: File path or binary file object
+
+        Returns:
+            Number of entities imported
+        """
+        def entries():
+            depth = 0
+            for event, element in ET.iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                # Entities sit directly below the root (<CSDbData>, or a dump root)
+                if depth == 1:
+                    entry = entry_from_xml(element)
+                    if entry:
+                        yield entry
+                    element.clear()
+
+        count = self.add_many(entries())
+        logger.info(f"Imported {count} CSDB entities")
+        return count
+
+    def crawl(self, entity_type: str, first_id: int, last_id: int,
+              session: Optional[requests.Session] = None, delay: float = 1.0) -> int:
+        """
+        Fetch entities id by id from the CSDB webservice and import them
+
+        Args:
+            entity_type: Entity type to fetch (release, group, ...)
+            first_id: First id to fetch
+            last_id: Last id to fetch (inclusive)
+            session: Session used for fetching
+            delay: Seconds to wait between requests, to be polite to csdb.dk
+
+        Returns:
+            Number of entities imported
+        """
+        session = session or get_http_session()
+        imported = 0
+        for entity_id in range(first_id, last_id + 1):
+            try:
+                resp = session.get(CSDB_API_URL, params={'type': entity_type, 'id': entity_id, 'depth': 1},
+                                   timeout=10)
+                resp.raise_for_status()
+                root = ET.fromstring(resp.content)
+                entries = [e for e in (entry_from_xml(child) for child in root) if e]
+                imported += self.add_many(entries)
+            except (requests.RequestException, ET.ParseError) as e:
+                logger.warning(f"Skipping {entity_type} {entity_id}: {e}")
+            if delay:
+                time.sleep(delay)
+        return imported
+
+    def search(self, text: str, entity_type: Optional[str] = None, limit: int = 10,
+               offset: int = 0) -> Dict[str, Any]:
+        """
+        Search the index, best matches first
+
+        Args:
+            text: Search words; each word matches as a prefix
+            entity_type: Only search this entity type
+            limit: Maximum number of items per type
+            offset: Number of best items per type to skip (for paging)
+
+        Returns:
+            Dict shaped like parse_csdb_find(): '<type>_count' totals and
+            '<plural>' lists of {'id', 'text'} items per entity type
+        """
+        query = fts_query(text)
+        types = [entity_type] if entity_type else list(ENTITY_TYPES)
+        result: Dict[str, Any] = {}
+        for t in types:
+            count, items = 0, []
+            if query and t in ENTITY_TYPES:
+                count, items = self._search_type(query, t, limit, offset)
+            result[f"{t}_count"] = count
+            result[ENTITY_TYPES.get(t, f"{t}s")] = items
+        return result
+
+    def _search_type(self, query: str, entity_type: str, limit: int,
+                     offset: int) -> Tuple[int, List[Dict[str, str]]]:
+        """Count and rank the matches of one entity type"""
+        with self._lock:
+            try:
+                count = self._conn.execute(
+                    "SELECT count(*) FROM entries_fts WHERE entries_fts MATCH ? AND type = ?",
+                    (query, entity_type)).fetchone()[0]
+                rows = self._conn.execute(
+                    "SELECT e.id, e.display FROM entries_fts"
+                    " JOIN entries e ON e.rowid = entries_fts.rowid"
+                    " WHERE entries_fts MATCH ? AND entries_fts.type = ?"
+                    # Name matches weigh more than group names, authors, ...
+                    " ORDER BY bm25(entries_fts, 10.0, 1.0), e.id LIMIT ? OFFSET ?",
+                    (query, entity_type, limit, offset)).fetchall()
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Mirror search failed for {query!r}: {e}")
+                return 0, []
+        return count, [{'id': str(row[0]), 'text': row[1]} for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    """Command line entry point for importing, crawling and searching"""
+    parser = argparse.ArgumentParser(description='Local CSDB mirror')
+    parser.add_argument('--db', default='csdb_mirror.db',
+                        help='Mirror database file (default: csdb_mirror.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_cmd = commands.add_parser('import', help='Import webservice XML files or dumps')
+    import_cmd.add_argument('files', nargs='+')
+
+    crawl_cmd = commands.add_parser('crawl', help='Fetch entities from the CSDB webservice')
+    crawl_cmd.add_argument('--type', default='release', choices=sorted(ENTITY_TYPES))
+    crawl_cmd.add_argument('--from', dest='first_id', type=int, required=True)
+    crawl_cmd.add_argument('--to', dest='last_id', type=int, required=True)
+    crawl_cmd.add_argument('--delay', type=float, default=1.0,
+                           help='Seconds between requests (default: 1.0)')
+
+    search_cmd = commands.add_parser('search', help='Search the mirror')
+    search_cmd.add_argument('text')
+    search_cmd.add_argument('--type', choices=sorted(ENTITY_TYPES))
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    mirror = CSDBMirror(args.db)
+    try:
+        if args.command == 'import':
+            for path in args.files:
+                mirror.import_xml(path)
+        elif args.command == 'crawl':
+            mirror.crawl(args.type, args.first_id, args.last_id, delay=args.delay)
+        else:
+            result = mirror.search(args.text, args.type)
+            for entity_type, key in ENTITY_TYPES.items():
+                for item in result.get(key, []):
+                    print(f"{entity_type:<8} {item['id']:>7} {item['text']}")
+        print(f"{len(mirror)} entities in {args.db}")
+    finally:
+        mirror.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Cursor paging of long CSDB listings
+
+find results and group/release details can run to hundreds of 40-column
+lines. The handler keeps the listing of a session's last command as a
+cursor in its session state and answers next/prev/page <n> from it, one
+screen of PAGE_LINES lines at a time, without another request.
+
+A cursor is plain data (it lives in the session state dict):
+
+    {'sections': [{'title': '219 release matches:', 'count': 219,
+                   'items': ['  112378: Edge of Disgrace', ...],
+                   'source': {'text': 'edge', 'type': 'release'} or None}],
+     'page': 0}
+
+Items of a section with a source are loaded on demand: when a page needs
+items past the loaded ones, load(source, offset, limit) is called for the
+next LOAD_CHUNK items. Sections without a source that know of more items
+than they hold end with an "(and N more...)" line.
+"""
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+# Lines of one screen, including the page footer
+PAGE_LINES = int(os.getenv('CSDB_PAGE_LINES', '25'))
+# Items fetched at once when paging past the loaded items of a section
+LOAD_CHUNK = 50
+
+Loader = Callable[[Dict[str, Any], int, int], List[str]]
+
+
+def section(title: Optional[str], count: int, items: List[str],
+            source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Create a cursor section
+
+    Args:
+        title: Heading line, or None
+        count: Total number of items, including those not loaded yet
+        items: Loaded item lines
+        source: What to pass to the loader to get more items, or None if there are none to load
+    """
+    return {'title': title, 'count': max(count, len(items)), 'items': list(items), 'source': source}
+
+
+def new_cursor(sections: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {'sections': sections, 'page': 0}
+
+
+def text_cursor(text: str) -> Dict[str, Any]:
+    """Cursor over the lines of an already formatted text"""
+    lines = text.split('\n')
+    return new_cursor([section(None, len(lines), lines)])
+
+
+def _section_lines(sec: Dict[str, Any]) -> int:
+    title = 1 if sec['title'] else 0
+    if sec['source']:
+        return title + sec['count']
+    more = 1 if sec['count'] > len(sec['items']) else 0
+    return title + len(sec['items']) + more
+
+
+def _page_size(cursor: Dict[str, Any]) -> int:
+    """Lines per page: a whole listing fitting one screen needs no footer"""
+    total = sum(_section_lines(sec) for sec in cursor['sections'])
+    return PAGE_LINES if total <= PAGE_LINES else PAGE_LINES - 1
+
+
+def page_count(cursor: Dict[str, Any]) -> int:
+    total = sum(_section_lines(sec) for sec in cursor['sections'])
+    size = _page_size(cursor)
+    return max(1, -(-total // size))
+
+
+def _ensure_loaded(sec: Dict[str, Any], needed: int, load: Optional[Loader]):
+    """Load items until the section holds needed of them (or all there are)"""
+    while sec['source'] and load and len(sec['items']) < min(needed, sec['count']):
+        offset = len(sec['items'])
+        items = load(sec['source'], offset, max(LOAD_CHUNK, needed - offset))
+        if not items:
+            # The source has fewer items than it counted
+            sec['count'] = len(sec['items'])
+            sec['source'] = None
+            break
+        sec['items'].extend(items)
+
+
+def render(cursor: Dict[str, Any], page: int, load: Optional[Loader] = None) -> str:
+    """
+    Render one page of a cursor and make it the current page
+
+    Args:
+        cursor: Cursor to render
+        page: Page index, 0-based
+        load: Loader of further section items
+
+    Returns:
+        The page's lines, with a footer when the listing has more than one page
+    """
+    size = _page_size(cursor)
+    start, end = page * size, (page + 1) * size
+    lines: List[str] = []
+    position = 0
+    for sec in cursor['sections']:
+        length = _section_lines(sec)
+        if position + length > start and position < end:
+            title = 1 if sec['title'] else 0
+            first, last = max(start - position, 0), min(end - position, length)
+            if sec['source']:
+                _ensure_loaded(sec, last - title, load)
+            body = ([sec['title']] if title else []) + sec['items']
+            if len(sec['items']) < sec['count']:
+                body.append(f"  (and {sec['count'] - len(sec['items'])} more...)")
+            lines.extend(body[first:last])
+            # Loading may have found fewer items than counted
+            length = _section_lines(sec)
+        position += length
+
+    cursor['page'] = page
+    pages = page_count(cursor)
+    if pages > 1:
+        lines.append(f"-- page {page + 1}/{pages}: next, prev, page <n> --")
+    return '\n'.join(lines)
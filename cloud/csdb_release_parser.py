@@ -1,10 +1,9 @@
-from bs4 import BeautifulSoup
 import re
 from typing import Dict, Any, List
+from csdb_html import Sections, parse_main
 
 
 def parse_csdb_release_detail(html: str) -> Dict[str, Any]:
-    soup = BeautifulSoup(html, 'html.parser')
     result: Dict[str, Any] = {
         'name': None,
         'groups': [],
@@ -14,9 +13,10 @@ def parse_csdb_release_detail(html: str) -> Dict[str, Any]:
         'files': []
     }
 
-    main = soup.find('td', valign='top', width="100%")
+    main = parse_main(html)
     if not main:
         return result
+    sections = Sections(main)
 
     # Release Name: look for <font size=6> or <font size='+2'>
     name_tag = main.find('font', attrs={'size': '6'})
@@ -26,7 +26,7 @@ def parse_csdb_release_detail(html: str) -> Dict[str, Any]:
         result['name'] = name_tag.get_text(strip=True)
 
     # Released by
-    b_released_by = main.find('b', string=lambda t: t and 'Released by' in t)
+    b_released_by = sections.first_string('Released by')
     if b_released_by:
         next_a = b_released_by.find_next(
             'a', href=lambda h: h and '/group/?id=' in h)
@@ -37,7 +37,7 @@ def parse_csdb_release_detail(html: str) -> Dict[str, Any]:
             result['groups'].append({'id': group_id, 'name': group_name})
 
     # Release Date
-    b_release_date = main.find('b', string=lambda t: t and 'Release Date' in t)
+    b_release_date = sections.first_string('Release Date')
     if b_release_date:
         # The date is in a <font> tag after a <br>
         br = b_release_date.find_next('br')
@@ -47,14 +47,14 @@ def parse_csdb_release_detail(html: str) -> Dict[str, Any]:
                 result['release_date'] = date_font.get_text(strip=True)
 
     # Type
-    b_type = main.find('b', string=lambda t: t and 'Type' in t)
+    b_type = sections.first_string('Type')
     if b_type:
         next_a = b_type.find_next('a')
         if next_a:
             result['type'] = next_a.get_text(strip=True)
 
     # User rating
-    b_user_rating = main.find('b', string=lambda t: t and 'User rating' in t)
+    b_user_rating = sections.first_string('User rating')
     if b_user_rating:
         rating_text = b_user_rating.parent.find_next('td').get_text(strip=True)
         match = re.search(r'(\d\.\d/\d+)\s*\((\d+)\s*votes\)', rating_text)
@@ -1,28 +1,25 @@
-from bs4 import BeautifulSoup
+import re
 import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from csdb_html import Sections, parse_main
+from http_client import get_http_session
 
 
 def parse_csdb_find(html: str) -> Dict:
-    soup = BeautifulSoup(html, 'html.parser')
     result = {}
-    main = soup.find('td', valign='top', width="100%")
+    main = parse_main(html)
     if not main:
         return result
+    sections = Sections(main)
 
     # Helper to extract items from a section
     def extract_items(section_title, id_prefix):
         # Find the <b> tag with the section title (e.g., '219 release matches:')
-        b_tag = None
-        for b in main.find_all('b'):
-            if section_title in b.get_text():
-                b_tag = b
-                break
+        b_tag = sections.first(section_title)
         items = []
         count = 0
         if b_tag:
             # Get count from b_tag text (e.g., '219 release matches:')
-            import re
             m = re.match(r"(\d+)[^\d]*", b_tag.get_text())
             if m:
                 count = int(m.group(1))
@@ -71,12 +68,16 @@ def parse_csdb_find(html: str) -> Dict:
 class CSDB:
     BASE_URL = "https://csdb.dk"
 
+    def __init__(self, session: Optional[requests.Session] = None):
+        # Shared pooled session, so repeated searches reuse warm connections
+        self.session = session or get_http_session()
+
     def search(self, query: str) -> Dict[str, Any]:
         """
         Search csdb.dk for a string and return releases and groups.
         """
         url = f"{self.BASE_URL}/search/?seinsel=all&search={query}"
-        resp = requests.get(url)
+        resp = self.session.get(url)
         return self._parse_search_html(resp.text)
 
     def latest_releases(self) -> Dict[str, Any]:
@@ -84,7 +85,7 @@ class CSDB:
         Get latest releases from csdb.dk (parsing the main page or releases page).
         """
         url = f"{self.BASE_URL}/?type=release"
-        resp = requests.get(url)
+        resp = self.session.get(url)
         # This is a placeholder; real parsing logic should be implemented for the actual page structure
         return self._parse_latest_releases_html(resp.text)
 
@@ -93,15 +94,14 @@ class CSDB:
         Get latest forum posts from csdb.dk (parsing the forum page).
         """
         url = f"{self.BASE_URL}/forums/"
-        resp = requests.get(url)
+        resp = self.session.get(url)
         # This is a placeholder; real parsing logic should be implemented for the actual page structure
         return self._parse_latest_forum_html(resp.text)
 
     def _parse_search_html(self, html: str) -> Dict[str, Any]:
-        soup = BeautifulSoup(html, 'html.parser')
         result = {"releases": [], "groups": []}
 
-        main = soup.find('td', valign='top', width="100%")
+        main = parse_main(html)
         if not main:
             return result
 
@@ -0,0 +1,341 @@
+"""
+Streaming reader for the CSDB webservice XML
+
+One fetch path for every entity type (release, group, scener, event, BBS,
+SID): https://csdb.dk/webservice/?type=<type>&id=<id>&depth=<n> is read with
+an incremental XMLPullParser and every element is dropped as soon as it has
+been read, so a depth 4 group document listing thousands of releases never
+exists as a full tree. Only the tree is bounded, not the body: the handler
+fetches through the HTTP cache, which holds the whole response to store and
+revalidate it, and read_entity() feeds that body to the parser in chunks.
+read_entity() also takes any iterable of chunks (e.g. iter_content() of a
+streamed response) for callers that do not cache. What is kept of an entity
+is an XMLEntity:
+
+- fields: text of the leaf children of the entity ('Name', 'Type') and of
+  the leaves one level below ('Handle/Handle')
+- lists: flat records (leaf text by tag) of the references. A child without
+  text of its own is a container of records ('ReleasedBy' -> Group records,
+  'DownloadLinks' -> DownloadLink records); a child with text of its own is
+  a record itself ('Release' repeated under a group)
+
+The pydantic models are filled from an XMLEntity, and release_detail() and
+group_detail() turn them into the dicts the csdb.dk HTML parsers return, so
+either source feeds the same formatting and caches.
+"""
+import calendar
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+# Webservice 'type' parameter -> entity element
+ENTITY_TAGS = {
+    'release': 'Release',
+    'group': 'Group',
+    'scener': 'Scener',
+    'event': 'Event',
+    'bbs': 'BBS',
+    'sid': 'SID',
+}
+
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class CSDBRelease(BaseModel):
+    name: str
+    release_type: Optional[str] = None
+    release_date: Optional[str] = None
+    groups: List[str]
+    group_ids: List[Optional[str]] = []
+    rating: Optional[str] = None
+    files: List[Dict[str, Any]] = []
+
+
+class CSDBGroup(BaseModel):
+    name: str
+    member_count: int
+    release_count: int
+    abbreviation: Optional[str] = None
+    country: Optional[str] = None
+    group_type: Optional[str] = None
+    rating: Optional[str] = None
+    members: List[Dict[str, Any]] = []
+    releases: List[Dict[str, Any]] = []
+
+
+class CSDBScener(BaseModel):
+    handle: str
+    real_name: Optional[str] = None
+    groups: List[str]
+
+
+class CSDBEvent(BaseModel):
+    name: str
+    start_date: str
+    end_date: Optional[str] = None
+
+
+class XMLEntity:
+    """Fields and reference records of one webservice entity"""
+
+    __slots__ = ('tag', 'fields', 'lists')
+
+    def __init__(self, tag: str):
+        self.tag = tag
+        self.fields: Dict[str, str] = {}
+        self.lists: Dict[str, List[Tuple[str, Dict[str, str]]]] = {}
+
+    def text(self, *names: str, default: Optional[str] = None) -> Optional[str]:
+        """First non-empty field among names"""
+        for name in names:
+            value = self.fields.get(name)
+            if value:
+                return value
+        return default
+
+    def records(self, container: str, tag: Optional[str] = None) -> List[Dict[str, str]]:
+        """Records listed under container, optionally only those of one element tag"""
+        return [record for record_tag, record in self.lists.get(container, [])
+                if tag is None or record_tag == tag]
+
+
+def _has_leaf(element: ET.Element) -> bool:
+    return any(len(child) == 0 for child in element)
+
+
+def _flatten(element: ET.Element) -> Dict[str, str]:
+    """Text of the leaf descendants of element by tag; shallower leaves win"""
+    record: Dict[str, str] = {}
+    level = list(element)
+    while level:
+        for child in level:
+            text = (child.text or '').strip()
+            if len(child) == 0 and text and child.tag not in record:
+                record[child.tag] = text
+        level = [grandchild for child in level for grandchild in child]
+    return record
+
+
+def read_entity(source: Union[str, bytes, Iterable[Union[str, bytes]]], entity_type: str) -> Optional[XMLEntity]:
+    """
+    Read one entity from a webservice response
+
+    Args:
+        source: Response body, or an iterable of body chunks
+        entity_type: Webservice type ('release', 'group', ...)
+
+    Returns:
+        The entity, or None if the response has none
+
+    Raises:
+        ET.ParseError: If the response is not well-formed XML
+    """
+    tag = ENTITY_TAGS[entity_type]
+    if isinstance(source, (str, bytes)):
+        body = source
+        source = (body[i:i + FEED_CHUNK_SIZE] for i in range(0, len(body), FEED_CHUNK_SIZE))
+
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    stack: List[ET.Element] = []
+    entity: Optional[XMLEntity] = None
+    # Depth of the entity element; its children are one deeper
+    entity_depth = 0
+
+    def events():
+        for chunk in source:
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    for event, element in events():
+        if event == 'start':
+            stack.append(element)
+            if entity is None and element.tag == tag:
+                entity = XMLEntity(tag)
+                entity_depth = len(stack)
+            continue
+
+        depth = len(stack)
+        stack.pop()
+        if entity is None or depth <= entity_depth:
+            if depth == entity_depth and element.tag == tag:
+                break
+            continue
+
+        parent = stack[-1]
+        if depth == entity_depth + 1:
+            if len(element) == 0 and element.tag not in entity.lists:
+                entity.fields.setdefault(element.tag, (element.text or '').strip())
+            elif _has_leaf(element):
+                # A child with data of its own is a record (repeated <Release> of a group)
+                entity.lists.setdefault(element.tag, []).append((element.tag, _flatten(element)))
+            parent.remove(element)
+        elif depth == entity_depth + 2:
+            if len(element) == 0:
+                entity.fields.setdefault(f"{parent.tag}/{element.tag}", (element.text or '').strip())
+            elif not _has_leaf(parent):
+                # Child of a container (<ReleasedBy><Group>...)
+                entity.lists.setdefault(parent.tag, []).append((element.tag, _flatten(element)))
+                parent.remove(element)
+        # Deeper elements stay until their record is flattened and dropped
+
+    return entity
+
+
+def _date(entity: XMLEntity, prefix: str) -> Optional[str]:
+    """'6 April 2008' from <prefix>Day/Month/Year, or the <prefix>Date field"""
+    date = entity.text(f'{prefix}Date')
+    if date:
+        return date
+    day = entity.text(f'{prefix}Day')
+    month = entity.text(f'{prefix}Month')
+    year = entity.text(f'{prefix}Year')
+    if month and month.isdigit() and 1 <= int(month) <= 12:
+        month = calendar.month_name[int(month)]
+    parts = [p for p in (day, month, year) if p]
+    return ' '.join(parts) or None
+
+
+def _rating(entity: XMLEntity) -> Optional[str]:
+    rating = entity.text('Rating')
+    if not rating or rating in ('0', '0.0'):
+        return None
+    votes = entity.text('Votes')
+    return f"{rating}/10 ({votes} votes)" if votes else f"{rating}/10"
+
+
+def release_from_xml(entity: XMLEntity) -> CSDBRelease:
+    """Release model of a webservice Release entity"""
+    released_by = [r for r in entity.records('ReleasedBy') if r.get('Name') or r.get('Handle')]
+    files = []
+    for link in entity.records('DownloadLinks', 'DownloadLink'):
+        file_info: Dict[str, Any] = {}
+        if link.get('ID'):
+            file_info['id'] = link['ID']
+        file_info['name'] = (link.get('Filename') or link.get('Link', '')).split('/')[-1]
+        if link.get('Downloads'):
+            file_info['downloads'] = link['Downloads']
+        if link.get('Size', '').isdigit():
+            file_info['size'] = int(link['Size'])
+        files.append(file_info)
+    return CSDBRelease(
+        name=entity.text('Name', default='Unknown'),
+        release_type=entity.text('Type'),
+        release_date=_date(entity, 'Release'),
+        groups=[r.get('Name') or r['Handle'] for r in released_by],
+        group_ids=[r.get('ID') for r in released_by],
+        rating=_rating(entity),
+        files=files,
+    )
+
+
+def group_from_xml(entity: XMLEntity) -> CSDBGroup:
+    """Group model of a webservice Group entity"""
+    members = []
+    for record in entity.records('Members') + entity.records('Member'):
+        name = record.get('Handle') or record.get('Name')
+        if not name:
+            continue
+        status = record.get('Status')
+        if not status and (record.get('LeftYear') or record.get('EndYear')):
+            status = 'ex'
+        members.append({'id': record.get('ID'), 'name': name, 'status': status,
+                        'roles': record.get('Roles') or record.get('Role') or record.get('Job')})
+    releases = [{'id': r.get('ID'), 'title': r.get('Name'), 'year': r.get('ReleaseYear'), 'type': r.get('Type')}
+                for r in entity.records('Releases', 'Release') + entity.records('Release')]
+    return CSDBGroup(
+        name=entity.text('Name', default='Unknown'),
+        member_count=len(members),
+        release_count=len(releases),
+        abbreviation=entity.text('Abbreviation', 'ShortName'),
+        country=entity.text('BaseCountry', 'Country'),
+        group_type=entity.text('Type'),
+        rating=_rating(entity),
+        members=members,
+        releases=releases,
+    )
+
+
+def scener_from_xml(entity: XMLEntity) -> CSDBScener:
+    """Scener model of a webservice Scener entity"""
+    groups = [r['Name'] for r in entity.records('Groups') if r.get('Name')]
+    return CSDBScener(
+        handle=entity.text('Handle/Handle', 'Handle', default='Unknown'),
+        real_name=entity.text('RealName', 'Realname'),
+        groups=groups,
+    )
+
+
+def event_from_xml(entity: XMLEntity) -> CSDBEvent:
+    """Event model of a webservice Event entity"""
+    return CSDBEvent(
+        name=entity.text('Name', default='Unknown'),
+        start_date=_date(entity, 'Start') or 'Unknown',
+        end_date=_date(entity, 'End'),
+    )
+
+
+def release_detail(model: CSDBRelease) -> Dict[str, Any]:
+    """Release model as the dict parse_csdb_release_detail returns"""
+    return {
+        'name': model.name,
+        'groups': [{'id': group_id, 'name': name} for group_id, name in zip(model.group_ids, model.groups)],
+        'release_date': model.release_date,
+        'type': model.release_type,
+        'user_rating': model.rating,
+        'files': model.files,
+    }
+
+
+def group_detail(model: CSDBGroup) -> Dict[str, Any]:
+    """Group model as the dict parse_csdb_group_detail returns; page-only fields are None"""
+    return {
+        'name': model.name,
+        'abbreviation': model.abbreviation,
+        'creator': None,
+        'creator_id': None,
+        'created_on': None,
+        'group_type': model.group_type,
+        'country': model.country,
+        'user_rating': model.rating,
+        'votes_needed': None,
+        'votes_left': None,
+        'vote_url': None,
+        'votestat_url': None,
+        'members': model.members,
+        'releases': model.releases,
+    }
+
+
+def _parse_detail(text: str, entity_type: str, from_xml, detail) -> Dict[str, Any]:
+    try:
+        entity = read_entity(text, entity_type)
+    except ET.ParseError as e:
+        return {'error': f"Error parsing CSDB response: {e}"}
+    if entity is None or not entity.text('Name'):
+        return {'error': f"No {entity_type} in CSDB response"}
+    return detail(from_xml(entity))
+
+
+def parse_release_xml(text: str) -> Dict[str, Any]:
+    """Release detail from a webservice response, or {'error': ...}"""
+    return _parse_detail(text, 'release', release_from_xml, release_detail)
+
+
+def parse_group_xml(text: str) -> Dict[str, Any]:
+    """Group detail from a webservice response, or {'error': ...}"""
+    return _parse_detail(text, 'group', group_from_xml, group_detail)
+
+
+def format_entity(entity: XMLEntity) -> str:
+    """Plain listing of the fields and references of an entity without a dedicated formatter"""
+    lines = [f"{name}: {value}" for name, value in entity.fields.items()
+             if value and name != 'ID' and '/' not in name]
+    for container, records in entity.lists.items():
+        names = [r.get('Name') or r.get('Handle') or r.get('ID') for _, r in records]
+        names = [n for n in names if n]
+        if names:
+            lines.append(f"{container}: {', '.join(names)}")
+    return '\n'.join(lines)
@@ -0,0 +1,307 @@
+"""
+Content-addressed store for files downloaded from CSDB
+
+Downloads are kept once per server as read-only blobs named by their
+SHA-256 and indexed by CSDB file id in SQLite, so a popular file is
+fetched once rather than once per user and the index survives restarts.
+Each session sees the files it copied in its own directory of hard links
+to the blobs, so sessions never overwrite each other's files. Blobs are
+evicted least recently used first when the store exceeds its quota, even
+while sessions link to them: a session's link keeps its own copy of the
+contents until the session ends and its directory is removed.
+
+Session ids are only unique within one process and one run, so session
+directories are named <store nonce>-<pid>-<session id>; directories of
+processes that are gone are removed when a store is opened.
+
+Layout under the store root:
+    blobs/<sha[:2]>/<sha>                 shared, read-only file contents
+    sessions/<nonce>-<pid>-<session id>/  per-session views
+    tmp/                     downloads in progress
+    index.db                 file id -> blob index
+"""
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the process-wide store
+DEFAULT_ROOT = os.getenv('CSDB_DOWNLOAD_DIR', '/tmp/c64cloud')
+DEFAULT_QUOTA_BYTES = int(os.getenv('CSDB_DOWNLOAD_QUOTA_BYTES', str(512 * 1024 * 1024)))
+
+
+def file_sha256(path: Path) -> str:
+    """
+    Hashes a file in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadStore:
+    """Shared blob store of CSDB downloads with per-session views and a disk quota"""
+
+    def __init__(self, root: str, quota_bytes: int = DEFAULT_QUOTA_BYTES,
+                 clock: Callable[[], float] = time.time):
+        """
+        Open or create the store
+
+        Args:
+            root: Store directory
+            quota_bytes: Total size of blobs kept before the least recently used are evicted
+            clock: Wall clock time source (replaceable for testing)
+        """
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self._clock = clock
+        # Distinguishes this store's session directories from those of earlier runs
+        self.nonce = uuid.uuid4().hex[:8]
+        for sub in ('blobs', 'sessions', 'tmp'):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+        self._remove_stale_sessions()
+
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._db = sqlite3.connect(str(self.root / 'index.db'), check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " file_id INTEGER PRIMARY KEY,"
+            " sha256 TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " name TEXT NOT NULL,"
+            " last_used REAL NOT NULL)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def fetch(self, file_id: int, name: str, download: Callable[[Path], int]) -> Path:
+        """
+        Get the blob of a CSDB file, downloading it if it is not stored
+
+        Concurrent fetches of the same file share one download.
+
+        Args:
+            file_id: CSDB file id
+            name: File name, for the index
+            download: Function writing the file to the given path
+
+        Returns:
+            Path of the read-only blob
+        """
+        blob = self._lookup(file_id)
+        if blob is not None:
+            return blob
+        return self._flights.do(file_id, lambda: self._lookup(file_id) or self._add(file_id, name, download))
+
+    def get(self, file_id: int) -> Optional[Path]:
+        """
+        Get the blob of a CSDB file if it is stored, without downloading it
+        """
+        return self._lookup(file_id)
+
+    def session_dir(self, session_id: int) -> Path:
+        """
+        Get (and create) the directory holding a session's files
+        """
+        path = self._session_path(session_id)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def _session_path(self, session_id: int) -> Path:
+        # The pid is taken per call: worker processes forked after the store was opened share its nonce
+        return self.root / 'sessions' / f"{self.nonce}-{os.getpid()}-{session_id}"
+
+    def _remove_stale_sessions(self):
+        """Remove session directories of earlier runs and of processes that are gone"""
+        for path in (self.root / 'sessions').iterdir():
+            parts = path.name.split('-')
+            if len(parts) == 3 and parts[1].isdigit():
+                pid = int(parts[1])
+                if pid == os.getpid():
+                    stale = parts[0] != self.nonce
+                else:
+                    stale = not _pid_alive(pid)
+            else:
+                # Named by an older version of the store
+                stale = True
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def link_into_session(self, session_id: int, blob: Path, name: str) -> Path:
+        """
+        Make a blob visible under a file name in a session's directory
+
+        Args:
+            session_id: Session ID
+            blob: Blob path returned by fetch()
+            name: File name in the session directory
+
+        Returns:
+            Path of the session's file
+
+        Raises:
+            FileNotFoundError: If the blob was evicted since it was fetched
+        """
+        target = self.session_dir(session_id) / Path(name).name
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+        # Under the lock, so the blob is not evicted between the check and the link
+        with self._lock:
+            if not blob.exists():
+                raise FileNotFoundError(f"{blob.name} was evicted from the download store")
+            try:
+                os.link(blob, tmp)
+            except OSError:
+                # Different file system or no hard link support
+                shutil.copyfile(blob, tmp)
+        os.replace(tmp, target)
+        return target
+
+    def release_session(self, session_id: int, state=None):
+        """
+        Remove a session's directory (usable as a session release listener)
+        """
+        shutil.rmtree(self._session_path(session_id), ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get size and hit counters for monitoring
+        """
+        with self._lock:
+            blobs = self._db.execute("SELECT count(*) FROM blobs").fetchone()[0]
+            size = self._stored_bytes()
+            return {
+                'blobs': blobs,
+                'bytes': size,
+                'quota_bytes': self.quota_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def close(self):
+        """Close the index"""
+        with self._lock:
+            self._db.close()
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.root / 'blobs' / sha256[:2] / sha256
+
+    def _lookup(self, file_id: int) -> Optional[Path]:
+        """Find a stored blob and mark it as used"""
+        with self._lock:
+            row = self._db.execute("SELECT sha256 FROM blobs WHERE file_id = ?", (file_id,)).fetchone()
+            if row is None:
+                return None
+            blob = self._blob_path(row[0])
+            if not blob.exists():
+                # Removed behind our back; download again
+                with self._db:
+                    self._db.execute("DELETE FROM blobs WHERE file_id = ?", (file_id,))
+                return None
+            with self._db:
+                self._db.execute("UPDATE blobs SET last_used = ? WHERE file_id = ?",
+                                 (self._clock(), file_id))
+            self.hits += 1
+            return blob
+
+    def _add(self, file_id: int, name: str, download: Callable[[Path], int]) -> Path:
+        """Download a file, store it as a blob and enforce the quota"""
+        tmp = self.root / 'tmp' / uuid.uuid4().hex
+        try:
+            download(tmp)
+            sha256 = file_sha256(tmp)
+            size = tmp.stat().st_size
+            blob = self._blob_path(sha256)
+            blob.parent.mkdir(exist_ok=True)
+            if blob.exists():
+                # Same content under another file id
+                tmp.unlink()
+            else:
+                tmp.chmod(0o444)
+                os.replace(tmp, blob)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blobs (file_id, sha256, size, name, last_used)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (file_id, sha256, size, name, self._clock()))
+            self.misses += 1
+            self._evict(keep=file_id)
+        logger.info(f"Stored CSDB file {file_id} ({name}, {size} bytes) as {sha256[:12]}")
+        return blob
+
+    def _stored_bytes(self) -> int:
+        """Size of the distinct blobs; file ids with the same content share one blob"""
+        return self._db.execute(
+            "SELECT coalesce(sum(size), 0) FROM (SELECT max(size) AS size FROM blobs GROUP BY sha256)").fetchone()[0]
+
+    def _evict(self, keep: int):
+        """Remove least recently used blobs until the store fits its quota (lock held)"""
+        total = self._stored_bytes()
+        if total <= self.quota_bytes:
+            return
+        keep_row = self._db.execute("SELECT sha256 FROM blobs WHERE file_id = ?", (keep,)).fetchone()
+        rows = self._db.execute(
+            "SELECT sha256, max(size), count(*) FROM blobs WHERE sha256 != ?"
+            " GROUP BY sha256 ORDER BY max(last_used)",
+            (keep_row[0] if keep_row else '',)).fetchall()
+        for sha256, size, file_ids in rows:
+            if total <= self.quota_bytes:
+                break
+            # Sessions linking to the blob keep their copy; it is freed when they end
+            try:
+                self._blob_path(sha256).unlink()
+            except FileNotFoundError:
+                pass
+            with self._db:
+                self._db.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+            total -= size
+            self.evictions += file_ids
+            logger.info(f"Evicted {sha256[:12]} ({file_ids} CSDB file ids) from the download store")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Process-wide store, created on first use
+_store: Optional[DownloadStore] = None
+_store_lock = threading.Lock()
+
+
+def get_download_store() -> DownloadStore:
+    """
+    Get the process-wide download store, removing session directories when sessions end
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            from shared_state import get_session_store
+            _store = DownloadStore(DEFAULT_ROOT, DEFAULT_QUOTA_BYTES)
+            get_session_store().add_release_listener(_store.release_session)
+        return _store
@@ -1,6 +1,180 @@
+import codecs
+import unicodedata
+from pydantic import validate_call
 
 
-from pydantic import validate_call
+# PETSCII $C1–$DA → ASCII $41–$5A (A–Z), PETSCII $41–$5A → ASCII $61–$7A (a–z),
+# everything else maps directly
+PETSCII_TO_ASCII = bytes.maketrans(
+    bytes(range(0xC1, 0xDB)) + bytes(range(0x41, 0x5B)),
+    bytes(range(0x41, 0x5B)) + bytes(range(0x61, 0x7B)),
+)
+
+# ASCII $41–$5A (A–Z) → PETSCII $C1–$DA, ASCII $61–$7A (a–z) → PETSCII $41–$5A,
+# everything else maps directly
+ASCII_TO_PETSCII = bytes.maketrans(
+    bytes(range(0x41, 0x5B)) + bytes(range(0x61, 0x7B)),
+    bytes(range(0xC1, 0xDB)) + bytes(range(0x41, 0x5B)),
+)
+
+# ASCII replacements for non-ASCII characters common in LLM and web output
+UNICODE_FALLBACK = {
+    '\u00a0': ' ',    # no-break space
+    '\u00ab': '"',    # left guillemet
+    '\u00bb': '"',    # right guillemet
+    '\u00b7': '*',    # middle dot
+    '\u00d7': 'x',    # multiplication sign
+    '\u00f7': '/',    # division sign
+    '\u2010': '-',    # hyphen
+    '\u2011': '-',    # non-breaking hyphen
+    '\u2012': '-',    # figure dash
+    '\u2013': '-',    # en dash
+    '\u2014': '-',    # em dash
+    '\u2018': "'",    # left single quote
+    '\u2019': "'",    # right single quote
+    '\u201a': "'",    # single low quote
+    '\u201c': '"',    # left double quote
+    '\u201d': '"',    # right double quote
+    '\u201e': '"',    # double low quote
+    '\u2022': '*',    # bullet
+    '\u2026': '...',  # ellipsis
+    '\u2190': '<-',   # left arrow
+    '\u2192': '->',   # right arrow
+    '\u2212': '-',    # minus sign
+    '\u2264': '<=',   # less-than or equal
+    '\u2265': '>=',   # greater-than or equal
+}
+
+# Replacement for characters without an ASCII approximation
+FALLBACK_CHAR = '?'
+
+
+def ascii_fallback(char: str) -> str:
+    """
+    Approximates a non-ASCII character with ASCII text.
+    Uses UNICODE_FALLBACK, then strips accents (é → e), then FALLBACK_CHAR.
+    """
+    if char in UNICODE_FALLBACK:
+        return UNICODE_FALLBACK[char]
+    stripped = unicodedata.normalize('NFKD', char).encode('ascii', 'ignore').decode('ascii')
+    return stripped or FALLBACK_CHAR
+
+
+class _FallbackTable(dict):
+    """
+    str.translate() table: ASCII maps to itself, other characters are
+    resolved with ascii_fallback() on first use and cached.
+    """
+
+    def __missing__(self, codepoint: int) -> str:
+        replacement = ascii_fallback(chr(codepoint))
+        self[codepoint] = replacement
+        return replacement
+
+
+_UNICODE_TO_ASCII = _FallbackTable((c, c) for c in range(0x80))
+
+
+def _petscii_fallback_errors(exc: UnicodeError):
+    """
+    Codec error handler that replaces unencodable characters with ascii_fallback().
+    """
+    if not isinstance(exc, UnicodeEncodeError):
+        raise exc
+    return exc.object[exc.start:exc.end].translate(_UNICODE_TO_ASCII), exc.end
+
+
+# Error handler name for encoding arbitrary Unicode text to PETSCII
+FALLBACK_ERRORS = 'petscii-fallback'
+codecs.register_error(FALLBACK_ERRORS, _petscii_fallback_errors)
+
+
+def _decoding_table(petscii_to_ascii: bytes) -> str:
+    """
+    Builds a codecs.charmap_decode() table from a PETSCII → ASCII translation table.
+    Bytes that do not map into ASCII are undefined (U+FFFE).
+    """
+    return ''.join(chr(a) if a < 0x80 else '\ufffe' for a in petscii_to_ascii)
+
+
+class PetsciiCodec(codecs.Codec):
+    """
+    PETSCII codec for the C64 shifted (upper/lower case) character set.
+    Encodes ASCII only; use errors=FALLBACK_ERRORS to approximate other text.
+    """
+
+    encoding_table = ASCII_TO_PETSCII
+    decoding_table = _decoding_table(PETSCII_TO_ASCII)
+
+    def encode(self, input, errors='strict'):
+        return input.encode('ascii', errors).translate(self.encoding_table), len(input)
+
+    def decode(self, input, errors='strict'):
+        return codecs.charmap_decode(input, errors, self.decoding_table)
+
+
+class UnshiftedPetsciiCodec(PetsciiCodec):
+    """
+    PETSCII codec for the C64 unshifted (upper case/graphics) character set.
+    Both ASCII cases encode to PETSCII $41–$5A, which decode to A–Z.
+    """
+
+    encoding_table = bytes.maketrans(
+        bytes(range(0x61, 0x7B)),
+        bytes(range(0x41, 0x5B)),
+    )
+    # PETSCII $60–$7F and $C0–$DF are graphics characters in this set
+    decoding_table = _decoding_table(
+        bytes(range(0x60)) + bytes([0x80] * 0x20) + bytes(range(0x80, 0x100)))
+
+
+def _codec_info(name: str, codec: PetsciiCodec) -> codecs.CodecInfo:
+    """
+    Builds the CodecInfo for a PETSCII variant. The mapping is one byte per
+    character, so incremental encoders and decoders need no state between calls.
+    """
+
+    class IncrementalEncoder(codecs.IncrementalEncoder):
+        def encode(self, input, final=False):
+            return codec.encode(input, self.errors)[0]
+
+    class IncrementalDecoder(codecs.IncrementalDecoder):
+        def decode(self, input, final=False):
+            return codec.decode(input, self.errors)[0]
+
+    class StreamWriter(type(codec), codecs.StreamWriter):
+        pass
+
+    class StreamReader(type(codec), codecs.StreamReader):
+        pass
+
+    return codecs.CodecInfo(
+        name=name,
+        encode=codec.encode,
+        decode=codec.decode,
+        incrementalencoder=IncrementalEncoder,
+        incrementaldecoder=IncrementalDecoder,
+        streamwriter=StreamWriter,
+        streamreader=StreamReader,
+    )
+
+
+# Codec name for the character set used by the C64 client
+PETSCII_CODEC = 'petscii-c64'
+
+_CODECS = {
+    'petscii_c64': _codec_info('petscii-c64', PetsciiCodec()),
+    'petscii_c64_shifted': _codec_info('petscii-c64-shifted', PetsciiCodec()),
+    'petscii_c64_unshifted': _codec_info('petscii-c64-unshifted', UnshiftedPetsciiCodec()),
+}
+
+
+def _search_codec(name: str):
+    """Codec search function for codecs.register()"""
+    return _CODECS.get(name.replace('-', '_'))
+
+
+codecs.register(_search_codec)
 
 
 class Petscii:
@@ -15,13 +189,8 @@ class Petscii:
         Converts a single PETSCII byte to an ASCII byte.
         Simple direct mapping based on PETSCII-ASCII conversion table.
         """
-        # PETSCII $C1–$DA → ASCII $41–$5A (A–Z)
-        if 0xC1 <= p_byte <= 0xDA:  # PETSCII A-Z
-            return p_byte - 0x80
-        # PETSCII $41–$5A → ASCII $61–$7A (a–z)
-        elif 0x41 <= p_byte <= 0x5A:  # PETSCII a-z
-            return p_byte + 0x20
-        # Everything else maps directly
+        if 0 <= p_byte <= 0xFF:
+            return PETSCII_TO_ASCII[p_byte]
         return p_byte
 
     @staticmethod
@@ -31,11 +200,6 @@ class Petscii:
         Converts a single ASCII byte to a PETSCII byte.
         Simple direct mapping based on ASCII-PETSCII conversion table.
         """
-        # ASCII $41–$5A (A–Z) → PETSCII $C1–$DA
-        if 0x41 <= a_byte <= 0x5A:  # A-Z
-            return a_byte + 0x80
-        # ASCII $61–$7A (a–z) → PETSCII $41–$5A
-        elif 0x61 <= a_byte <= 0x7A:  # a-z
-            return a_byte - 0x20
-        # Everything else maps directly
+        if 0 <= a_byte <= 0xFF:
+            return ASCII_TO_PETSCII[a_byte]
         return a_byte
@@ -0,0 +1,169 @@
+"""
+Bounded execution of request handlers for C64 Cloud Server
+
+Each handler class gets its own small thread pool with a limited queue
+and a deadline, so a hung CSDB page or LLM call only ties up the slots
+of its own handler and the client gets a quick "busy" answer instead of
+waiting indefinitely.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class HandlerBusyError(Exception):
+    """Raised when a handler pool rejects a request or misses its deadline"""
+
+
+class RequestCancelledError(Exception):
+    """Raised in a request's progress() call once its caller has given up on it"""
+
+
+class HandlerPool:
+    """Thread pool with bounded queue, deadline and counters for one handler class"""
+
+    def __init__(self, name: str, max_workers: int = 4, max_queue: int = 16, timeout: float = 30.0):
+        """
+        Initialize the pool
+
+        Args:
+            name: Handler class name, used for thread names and logging
+            max_workers: Number of requests run at the same time
+            max_queue: Number of further requests that may wait for a worker
+            timeout: Seconds a caller waits for a result before giving up
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f'handler-{name}')
+        # Requests that time out keep their slot until they really finish
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run fn(*args) on the pool and wait for its result
+
+        Args:
+            fn: Function to run
+            *args: Arguments for fn
+
+        Returns:
+            The return value of fn
+
+        Raises:
+            HandlerBusyError: If the queue is full or the deadline passes
+        """
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._timed_out()
+            raise HandlerBusyError(f"{self.name} timed out")
+
+    def run_with_progress(self, fn: Callable[..., str], *args) -> Iterator[str]:
+        """
+        Run fn(*args, progress) on the pool, yielding what it reports and then its result
+
+        fn reports by calling progress(text). The deadline applies to each
+        report: when it passes, a request still queued is dropped and a
+        running one gets RequestCancelledError from its next progress() call.
+
+        Args:
+            fn: Function to run
+            *args: Arguments for fn, before progress
+
+        Yields:
+            Each reported text, then the return value of fn
+
+        Raises:
+            HandlerBusyError: If the queue is full or the deadline passes
+        """
+        lines: "queue.Queue[Any]" = queue.Queue()
+        cancelled = threading.Event()
+
+        def progress(text: str):
+            if cancelled.is_set():
+                raise RequestCancelledError(f"{self.name} request cancelled")
+            lines.put(text)
+
+        future = self._submit(fn, *args, progress)
+        future.add_done_callback(lambda f: lines.put(f))
+        try:
+            while True:
+                try:
+                    item = lines.get(timeout=self.timeout)
+                except queue.Empty:
+                    future.cancel()
+                    self._timed_out()
+                    raise HandlerBusyError(f"{self.name} timed out")
+                if item is future:
+                    break
+                yield item
+            yield future.result()
+        finally:
+            # Also when the caller stops reading early
+            cancelled.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and rejection counters for monitoring
+        """
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'timeout': self.timeout,
+                'pending': self.pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+            }
+
+    def shutdown(self):
+        """Stop accepting requests; running ones are not waited for"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable[..., Any], *args) -> Future:
+        """Take a slot and queue fn(*args), or raise HandlerBusyError"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning(f"{self.name}: queue full, rejecting request")
+            raise HandlerBusyError(f"{self.name} is busy")
+
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except RuntimeError:
+            self._release()
+            raise HandlerBusyError(f"{self.name} is shut down")
+        future.add_done_callback(self._done)
+        return future
+
+    def _timed_out(self):
+        with self._lock:
+            self.timed_out += 1
+        logger.warning(f"{self.name}: no response within {self.timeout}s")
+
+    def _done(self, future: Future):
+        """Free the slot of a finished (or cancelled) request"""
+        self._release()
+
+    def _release(self):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
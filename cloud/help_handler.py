@@ -87,6 +87,8 @@ Returns information from the comprehensive C64 Scene Database.""",
 class HelpHandler(BaseHandler):
     """Handler for help requests"""
 
+    prefixes = ("help",)
+
     def __init__(self):
         """Initialize HelpHandler with optional LLM support"""
         self.llm = None
@@ -0,0 +1,268 @@
+"""
+HTTP response cache for CSDB.dk pages
+
+An in-memory LRU sits in front of a SQLite store on disk, both keyed by
+URL. Every entry has a time to live that depends on its kind (release,
+group, search, ...). Once it expires the page is revalidated with a
+conditional request (ETag / Last-Modified), so an unchanged page costs a
+304 instead of a full download. When csdb.dk cannot be reached, the last
+cached copy is served even if it has expired.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Seconds an entry is served without revalidation, by kind
+DEFAULT_TTLS = {
+    'release': 24 * 3600.0,
+    'group': 6 * 3600.0,
+    'scener': 6 * 3600.0,
+    'event': 24 * 3600.0,
+    'find': 600.0,
+}
+DEFAULT_TTL = 3600.0
+
+# Memory budget of the in-memory LRU
+DEFAULT_MAX_MEMORY_BYTES = 32 * 1024 * 1024
+
+
+class CachedResponse:
+    """A cached page: body, encoding and validators"""
+
+    __slots__ = ('url', 'content', 'encoding', 'etag', 'last_modified', 'fetched', 'stale', 'digest')
+
+    def __init__(self, url: str, content: bytes, encoding: Optional[str], etag: Optional[str] = None,
+                 last_modified: Optional[str] = None, fetched: float = 0.0):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched = fetched
+        # True when served after a failed revalidation
+        self.stale = False
+        # Identifies the body, e.g. to tell whether a parse result is still current
+        self.digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    @property
+    def text(self) -> str:
+        """Body decoded like requests.Response.text"""
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class HTTPCache:
+    """Two-level (memory, disk) cache of GET responses with conditional revalidation"""
+
+    def __init__(self, session: requests.Session, cache_dir: Optional[str] = None,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the cache
+
+        Args:
+            session: Session used for fetching
+            cache_dir: Directory of the on-disk store (None = memory only)
+            ttls: Per kind overrides of DEFAULT_TTLS
+            max_memory_bytes: Size of page bodies kept in memory
+            clock: Wall clock time source (replaceable for testing)
+        """
+        self.session = session
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_memory_bytes = max_memory_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._memory_bytes = 0
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stale = 0
+        self.errors = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if cache_dir:
+            try:
+                Path(cache_dir).mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(
+                    str(Path(cache_dir) / 'http_cache.db'), check_same_thread=False, timeout=10)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " url TEXT PRIMARY KEY,"
+                    " content BLOB NOT NULL,"
+                    " encoding TEXT,"
+                    " etag TEXT,"
+                    " last_modified TEXT,"
+                    " fetched REAL NOT NULL)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"HTTP cache disk store unavailable, using memory only: {e}")
+                self._db = None
+
+    def get(self, url: str, kind: str = '', params: Optional[Dict[str, Any]] = None,
+            timeout: float = 10) -> CachedResponse:
+        """
+        Get a page from the cache, fetching or revalidating it when needed
+
+        Args:
+            url: Page URL
+            kind: Entry type selecting the time to live (see DEFAULT_TTLS)
+            params: Query parameters appended to the URL
+            timeout: Request timeout in seconds
+
+        Returns:
+            The cached or fetched page
+
+        Raises:
+            requests.RequestException: If the page cannot be fetched and is not cached
+        """
+        if params:
+            url = requests.Request('GET', url, params=params).prepare().url
+
+        entry = self._lookup(url)
+        now = self._clock()
+        if entry is not None and now - entry.fetched < self.ttls.get(kind, DEFAULT_TTL):
+            with self._lock:
+                self.hits += 1
+            return entry
+
+        # Concurrent requests for the same URL share one fetch
+        return self._flights.do(url, lambda: self._fetch(url, entry, now, timeout))
+
+    def _fetch(self, url: str, entry: Optional[CachedResponse], now: float,
+               timeout: float) -> CachedResponse:
+        """Fetch or revalidate a page and store it"""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        try:
+            resp = self.session.get(url, headers=headers, timeout=timeout)
+            if resp.status_code == 304 and entry is not None:
+                entry.fetched = now
+                entry.stale = False
+                entry.etag = resp.headers.get('ETag', entry.etag)
+                entry.last_modified = resp.headers.get('Last-Modified', entry.last_modified)
+                self._store(entry)
+                with self._lock:
+                    self.revalidated += 1
+                return entry
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            # Serve the old copy when csdb.dk is down, but not when the page is gone
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if entry is not None and (status is None or status >= 500):
+                logger.warning(f"Serving stale copy of {url}: {e}")
+                entry.stale = True
+                with self._lock:
+                    self.stale += 1
+                return entry
+            with self._lock:
+                self.errors += 1
+            raise
+
+        entry = CachedResponse(
+            url, resp.content, resp.encoding or resp.apparent_encoding,
+            etag=resp.headers.get('ETag'), last_modified=resp.headers.get('Last-Modified'),
+            fetched=now)
+        self._store(entry)
+        with self._lock:
+            self.misses += 1
+        return entry
+
+    def invalidate(self, url: str):
+        """Drop a URL from both cache levels"""
+        with self._lock:
+            entry = self._memory.pop(url, None)
+            if entry is not None:
+                self._memory_bytes -= len(entry.content)
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get hit, miss and revalidation counters for monitoring
+        """
+        with self._lock:
+            return {
+                'entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'stale': self.stale,
+                'errors': self.errors,
+                'coalesced': self._flights.shared,
+            }
+
+    def close(self):
+        """Close the disk store"""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    def _lookup(self, url: str) -> Optional[CachedResponse]:
+        """Find an entry in memory, then on disk"""
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                self._memory.move_to_end(url)
+                return entry
+
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT content, encoding, etag, last_modified, fetched FROM responses WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        entry = CachedResponse(url, row[0], row[1], etag=row[2], last_modified=row[3], fetched=row[4])
+        self._remember(entry)
+        return entry
+
+    def _store(self, entry: CachedResponse):
+        """Save an entry to both cache levels"""
+        self._remember(entry)
+        if self._db is None:
+            return
+        try:
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (url, content, encoding, etag, last_modified, fetched)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry.url, entry.content, entry.encoding, entry.etag, entry.last_modified,
+                     entry.fetched))
+        except sqlite3.Error as e:
+            logger.error(f"Error writing {entry.url} to the HTTP cache: {e}")
+
+    def _remember(self, entry: CachedResponse):
+        """Put an entry in the memory LRU, evicting the least recently used ones"""
+        with self._lock:
+            old = self._memory.pop(entry.url, None)
+            if old is not None:
+                self._memory_bytes -= len(old.content)
+            self._memory[entry.url] = entry
+            self._memory_bytes += len(entry.content)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, dropped = self._memory.popitem(last=False)
+                self._memory_bytes -= len(dropped.content)
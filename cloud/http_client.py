@@ -0,0 +1,582 @@
+"""
+Resilient, pooled HTTP client for csdb.dk
+
+A requests.Session that gives every request connect and read timeouts,
+retries idempotent requests (GET, HEAD) with jittered exponential backoff
+when the server is unreachable or overloaded, and keeps a circuit breaker
+per host. Once too many recent requests to a host have failed, the
+breaker opens and requests fail at once with CircuitOpenError instead of
+tying up handler threads, until a trial request succeeds again. Since
+CircuitOpenError is a requests.ConnectionError, existing error handling
+(and the HTTP cache serving stale pages) applies unchanged.
+
+get_http_session() hands out such sessions backed by one process-wide
+transport: a connection pool sized for concurrent sessions that keeps
+connections alive between requests, optionally HTTP/2 (through httpx) and
+an optional DNS cache. Every handler should get its session there, so warm
+connections and breaker state are shared instead of each handler (or each
+bare requests.get) paying its own TCP and TLS handshakes.
+"""
+import io
+import logging
+import os
+import random
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, get_encoding_from_headers, select_proxy
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout used when a request does not set one
+DEFAULT_TIMEOUT = (3.05, 10.0)
+# Further attempts of an idempotent request after the first one fails
+DEFAULT_RETRIES = 2
+# Backoff before retry n is random between 0 and min(BACKOFF_BASE * 2**n, BACKOFF_MAX) seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 4.0
+# Status codes meaning the server is unavailable rather than the request wrong
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# Process-wide transport used by get_http_session()
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '32'))
+# Use HTTP/2 through httpx (needs `pip install httpx[http2]`)
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', '0') == '1'
+# Seconds host name lookups are cached (0 = no caching)
+DNS_CACHE_TTL = float(os.getenv('DNS_CACHE_TTL', '0'))
+USER_AGENT = 'C64-Cloud-Server/1.0'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without a request while a host's circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker over a window of recent requests"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float = 0.5, window: int = 20, min_calls: int = 5,
+                 reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a closed breaker
+
+        Args:
+            failure_rate: Share of failed requests in the window that opens the breaker
+            window: Number of recent requests considered
+            min_calls: Requests needed in the window before the breaker can open
+            reset_timeout: Seconds the breaker stays open before a trial request is let through
+            clock: Monotonic time source (replaceable for testing)
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._results: Deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """
+        Check whether a request may be sent; while half open only one trial request is allowed
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a trial request through"""
+        with self._lock:
+            return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def record(self, success: bool):
+        """Record the outcome of a request that allow() let through"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                # Outcome of the trial request decides
+                self._trial_running = False
+                if success:
+                    self._state = self.CLOSED
+                    self._results.clear()
+                    logger.info("Circuit breaker closed")
+                else:
+                    self._open()
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (len(self._results) >= self.min_calls
+                    and failures >= self.failure_rate * len(self._results)):
+                self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get state and counters for monitoring
+        """
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'calls': len(self._results),
+                'failures': self._results.count(False),
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+    def _current_state(self) -> str:
+        """State with the open timeout applied (lock held)"""
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def _open(self):
+        """Open the breaker (lock held)"""
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._results.clear()
+        self.opened += 1
+        logger.warning(f"Circuit breaker opened for {self.reset_timeout:.0f}s")
+
+
+# Breaker registry replacing the sessions' own on this thread, see use_breakers()
+_thread_breakers = threading.local()
+
+
+@contextmanager
+def use_breakers(registry: Dict[str, CircuitBreaker]) -> Iterator[None]:
+    """
+    Send the requests made on this thread through the breakers of registry
+
+    For background work (e.g. prefetching) whose failures must not open the
+    breakers that requests users wait for go through.
+
+    Args:
+        registry: Host -> breaker registry used instead of each session's own
+    """
+    previous = getattr(_thread_breakers, 'registry', None)
+    _thread_breakers.registry = registry
+    try:
+        yield
+    finally:
+        _thread_breakers.registry = previous
+
+
+class ResilientSession(requests.Session):
+    """Session with default timeouts, retries with backoff and per-host circuit breakers"""
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT,
+                 breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+                 sleep: Callable[[float], None] = time.sleep,
+                 breakers: Optional[Dict[str, CircuitBreaker]] = None):
+        """
+        Initialize the session
+
+        Args:
+            retries: Further attempts of a failed idempotent request
+            timeout: Timeout used when a request does not set one: seconds or (connect, read)
+            breaker_factory: Creates the circuit breaker of a host
+            sleep: Sleep function used for backoff (replaceable for testing)
+            breakers: Host -> breaker registry shared with other sessions (default: own)
+        """
+        super().__init__()
+        self.retries = retries
+        self.timeout = timeout
+        self._breaker_factory = breaker_factory
+        self._sleep = sleep
+        self._breakers: Dict[str, CircuitBreaker] = {} if breakers is None else breakers
+        self._lock = threading.Lock()
+        self.retried = 0
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """Get the circuit breaker of a host (from the thread's own registry inside use_breakers())"""
+        breakers = getattr(_thread_breakers, 'registry', None)
+        if breakers is None:
+            breakers = self._breakers
+        breaker = breakers.get(host)
+        if breaker is None:
+            # setdefault is atomic, so sessions sharing the registry agree on one breaker
+            breaker = breakers.setdefault(host, self._breaker_factory())
+        return breaker
+
+    def request(self, method: str, url: str, *args, **kwargs) -> requests.Response:
+        """
+        Send a request through the host's breaker, retrying idempotent requests
+
+        Raises:
+            CircuitOpenError: If the host's breaker is open
+            requests.RequestException: If the last attempt fails
+        """
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        breaker = self.breaker(urlsplit(url).hostname or '')
+        attempts = 1 + (self.retries if method.upper() in IDEMPOTENT_METHODS else 0)
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(
+                    f"CSDB unavailable, retry in {breaker.retry_after():.0f}s", request=None)
+            error: Optional[requests.RequestException] = None
+            resp = None
+            try:
+                resp = super().request(method, url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            except BaseException:
+                # Invalid URL and the like: not the host's fault, but the trial slot must be freed
+                breaker.record(True)
+                raise
+            unavailable = error is not None or resp.status_code >= 500 or resp.status_code == 429
+            breaker.record(not unavailable)
+
+            retryable = error is not None or resp.status_code in RETRY_STATUSES
+            if not retryable or attempt == attempts - 1:
+                if error is not None:
+                    raise error
+                return resp
+
+            if resp is not None:
+                resp.close()
+            delay = random.uniform(0, min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX))
+            logger.info(f"Retrying {method} {url} in {delay:.2f}s: {error or resp.status_code}")
+            with self._lock:
+                self.retried += 1
+            self._sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get retry counters and the state of each host's breaker
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+            retried = self.retried
+        return {
+            'retried': retried,
+            'breakers': {host: breaker.stats() for host, breaker in breakers.items()},
+        }
+
+
+class SharedHTTPAdapter(HTTPAdapter):
+    """Connection-pooling adapter shared by all sessions; closing a session leaves it open"""
+
+    def __init__(self, *args, dns_cache: Optional['DNSCache'] = None, **kwargs):
+        """
+        Initialize the adapter
+
+        Args:
+            dns_cache: Cache the connections of this adapter resolve host names through
+                (other code in the process keeps using socket.getaddrinfo)
+            *args, **kwargs: HTTPAdapter arguments
+        """
+        self.dns_cache = dns_cache
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        if self.dns_cache is not None:
+            self.poolmanager.pool_classes_by_scheme = _cached_dns_pools(self.dns_cache)
+
+    def close(self):
+        pass
+
+
+class _CachedDNSConnection:
+    """urllib3 connection mixin resolving the host through a DNSCache"""
+
+    dns_cache: 'DNSCache'
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache(host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(host, self, e) from e
+        error = NewConnectionError(self, f"No address found for {host}")
+        for *_, sockaddr in addresses:
+            # urllib3 connects to _dns_host; it is set back before TLS needs the host name
+            self._dns_host = sockaddr[0]
+            try:
+                return super()._new_conn()
+            except (ConnectTimeoutError, NewConnectionError) as e:
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+def _cached_dns_pools(cache: 'DNSCache') -> Dict[str, type]:
+    """urllib3 pool classes by scheme whose connections resolve through cache"""
+    attrs = {'dns_cache': cache}
+    http = type('CachedDNSHTTPConnection', (_CachedDNSConnection, HTTPConnection), attrs)
+    https = type('CachedDNSHTTPSConnection', (_CachedDNSConnection, HTTPSConnection), attrs)
+    return {
+        'http': type('CachedDNSHTTPConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http}),
+        'https': type('CachedDNSHTTPSConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https}),
+    }
+
+
+class _HTTPXRaw(io.RawIOBase):
+    """Body of an httpx response as the raw file object requests reads from"""
+
+    def __init__(self, response):
+        super().__init__()
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        self._response.close()
+        super().close()
+
+
+class HTTPXAdapter(BaseAdapter):
+    """requests transport adapter sending through an httpx client, for HTTP/2"""
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, http2: bool = True):
+        """
+        Initialize the adapter
+
+        Args:
+            pool_size: Maximum number of connections of each httpx client
+            http2: Negotiate HTTP/2 (requires the h2 package)
+
+        Raises:
+            ImportError: If httpx (or h2 for HTTP/2) is not installed
+        """
+        import httpx
+        super().__init__()
+        self._httpx = httpx
+        self.pool_size = pool_size
+        self.http2 = http2
+        self._lock = threading.Lock()
+        # httpx takes TLS and proxy settings per client, requests per request:
+        # one client per (verify, cert, proxy) combination seen
+        self._clients: Dict[Tuple, Any] = {}
+        self.client = self._client(True, None, None)
+
+    def _client(self, verify, cert, proxy: Optional[str]):
+        key = (verify, tuple(cert) if isinstance(cert, (list, tuple)) else cert, proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                httpx = self._httpx
+                client = self._clients[key] = httpx.Client(
+                    http2=self.http2, follow_redirects=False, verify=_ssl_context(verify, cert),
+                    proxy=proxy, trust_env=False,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size))
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        httpx = self._httpx
+        client = self._client(verify, cert, select_proxy(request.url, proxies or {}))
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        req = client.build_request(
+            request.method, request.url, headers=dict(request.headers), content=request.body,
+            timeout=httpx.Timeout(read, connect=connect))
+        try:
+            r = client.send(req, stream=True)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+        except httpx.ProxyError as e:
+            raise requests.exceptions.ProxyError(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        resp = requests.Response()
+        resp.status_code = r.status_code
+        resp.reason = r.reason_phrase
+        resp.headers = CaseInsensitiveDict(r.headers)
+        if 'Content-Encoding' in resp.headers:
+            # iter_bytes() decodes the body; the headers of the encoded one no longer apply
+            del resp.headers['Content-Encoding']
+            resp.headers.pop('Content-Length', None)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = _HTTPXRaw(r)
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        if not stream:
+            resp.content
+        return resp
+
+    def close(self):
+        # Shared by all sessions for the life of the process
+        pass
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext:
+    """
+    SSL context for requests' verify and cert arguments
+
+    Args:
+        verify: True (certifi bundle), False, or a CA bundle file or directory
+        cert: Client certificate file, or (certificate, key) files, or None
+    """
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        ca = DEFAULT_CA_BUNDLE_PATH if verify is True else verify
+        if os.path.isdir(ca):
+            context = ssl.create_default_context(capath=ca)
+        else:
+            context = ssl.create_default_context(cafile=ca)
+    if cert:
+        if isinstance(cert, (list, tuple)):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+    return context
+
+
+class DNSCache:
+    """Time-limited cache in front of socket.getaddrinfo"""
+
+    def __init__(self, ttl: float, resolve: Callable = socket.getaddrinfo,
+                 clock: Callable[[], float] = time.monotonic, max_entries: int = 1024):
+        """
+        Initialize an empty cache
+
+        Args:
+            ttl: Seconds a lookup result is reused
+            resolve: Resolver being cached
+            clock: Monotonic time source (replaceable for testing)
+            max_entries: Lookups kept before the cache is cleared
+        """
+        self.ttl = ttl
+        self._resolve = resolve
+        self._clock = clock
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        result = self._resolve(*args, **kwargs)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (now + self.ttl, result)
+            self.misses += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get hit and miss counters for monitoring
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# Process-wide transport, created on first use
+_transport_lock = threading.Lock()
+_adapter: Optional[BaseAdapter] = None
+_breakers: Dict[str, CircuitBreaker] = {}
+_dns_cache: Optional[DNSCache] = None
+
+
+def _shared_adapter() -> BaseAdapter:
+    """Create the process-wide adapter and DNS cache on first use"""
+    global _adapter, _dns_cache
+    with _transport_lock:
+        if _adapter is None:
+            if DNS_CACHE_TTL > 0:
+                # Used by the connections of this transport only, not installed process-wide
+                _dns_cache = DNSCache(DNS_CACHE_TTL)
+            if HTTP2_ENABLED:
+                try:
+                    _adapter = HTTPXAdapter(HTTP_POOL_SIZE, http2=True)
+                    logger.info("HTTP/2 enabled")
+                except ImportError as e:
+                    logger.warning(f"HTTP/2 not available: {e}")
+                    logger.info("Install with: pip install httpx[http2]")
+                if _adapter is not None and _dns_cache is not None:
+                    logger.warning("DNS cache is not used with HTTP/2")
+                    _dns_cache = None
+            if _adapter is None:
+                # Retries are done by ResilientSession, not urllib3
+                _adapter = SharedHTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+                                             max_retries=0, dns_cache=_dns_cache)
+                if _dns_cache is not None:
+                    logger.info(f"DNS cache enabled ({DNS_CACHE_TTL:.0f}s)")
+        return _adapter
+
+
+def get_http_session() -> ResilientSession:
+    """
+    Get a session on the process-wide transport
+
+    Sessions share connection pools and circuit breakers, while headers and
+    authentication stay per session.
+    """
+    session = ResilientSession(breakers=_breakers)
+    adapter = _shared_adapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT, 'Connection': 'keep-alive'})
+    return session
+
+
+def transport_stats() -> Dict[str, Any]:
+    """
+    Get the state of the process-wide transport for monitoring
+    """
+    adapter = _adapter
+    return {
+        'pool_size': HTTP_POOL_SIZE,
+        'http2': isinstance(adapter, HTTPXAdapter),
+        'dns_cache': _dns_cache.stats() if _dns_cache is not None else None,
+        'breakers': {host: breaker.stats() for host, breaker in list(_breakers.items())},
+    }
@@ -0,0 +1,138 @@
+"""
+Seekable read-only file over HTTP Range requests
+
+Lets zipfile.ZipFile read a remote archive without downloading it: opening
+the archive only reads the end-of-central-directory record and the central
+directory at the end of the file, and extracting a member only reads that
+member's bytes. Used by `cd <file>.zip` and `cp` inside a zip when csdb.dk
+(or the host it redirects to) supports Range requests.
+"""
+import io
+import logging
+import re
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Bytes fetched from the end of the file when opening it; covers the
+# end-of-central-directory record and the central directory of most demo zips
+DEFAULT_TAIL_SIZE = 64 * 1024
+# Minimum bytes fetched per request when reading sequentially
+DEFAULT_READAHEAD = 256 * 1024
+
+_CONTENT_RANGE_RE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class RangeNotSupportedError(Exception):
+    """Raised when the server does not answer Range requests with partial content"""
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """Read-only, seekable file whose reads are served by HTTP Range requests"""
+
+    def __init__(self, session: requests.Session, url: str, tail_size: int = DEFAULT_TAIL_SIZE,
+                 readahead: int = DEFAULT_READAHEAD, timeout: float = 30):
+        """
+        Open the remote file, fetching its tail and size
+
+        Args:
+            session: Session used for the requests
+            url: File URL; redirects are resolved once
+            tail_size: Bytes fetched from the end of the file when opening it
+            readahead: Minimum bytes fetched per request
+            timeout: Request timeout in seconds
+
+        Raises:
+            RangeNotSupportedError: If the server ignores the Range header
+            requests.RequestException: On connection or HTTP errors
+        """
+        super().__init__()
+        self.session = session
+        self.readahead = readahead
+        self.timeout = timeout
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._pos = 0
+
+        resp = self.session.get(url, headers={'Range': f'bytes=-{tail_size}'},
+                                stream=True, timeout=timeout)
+        try:
+            resp.raise_for_status()
+            match = _CONTENT_RANGE_RE.match(resp.headers.get('Content-Range', ''))
+            if resp.status_code != 206 or not match:
+                # Close without reading the (possibly large) full body
+                raise RangeNotSupportedError(f"No range support for {url}")
+            self.url = resp.url
+            self.size = int(match.group(3))
+            self._tail_start = int(match.group(1))
+            self._tail = resp.content
+        finally:
+            resp.close()
+        self._count(self._tail)
+        self._buf_start = 0
+        self._buf = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b) -> int:
+        n = min(len(b), self.size - self._pos)
+        if n <= 0:
+            return 0
+        data = self._read_at(self._pos, n)
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def _read_at(self, start: int, n: int) -> bytes:
+        """Bytes [start, start + n), from the tail, the read-ahead buffer or a new request"""
+        for buf_start, buf in ((self._tail_start, self._tail), (self._buf_start, self._buf)):
+            if buf_start <= start and start + n <= buf_start + len(buf):
+                return buf[start - buf_start:start - buf_start + n]
+
+        end = min(start + max(n, self.readahead), self.size) - 1
+        resp = self.session.get(self.url, headers={'Range': f'bytes={start}-{end}'}, timeout=self.timeout)
+        resp.raise_for_status()
+        match = _CONTENT_RANGE_RE.match(resp.headers.get('Content-Range', ''))
+        if resp.status_code != 206 or not match or int(match.group(1)) != start:
+            raise RangeNotSupportedError(f"Unexpected answer to range {start}-{end} of {self.url}")
+        self._count(resp.content)
+        self._buf_start, self._buf = start, resp.content
+        return self._buf[:n]
+
+    def _count(self, data: bytes):
+        self.requests += 1
+        self.bytes_fetched += len(data)
+
+
+def open_range_file(session: requests.Session, url: str, **kwargs) -> Optional[HTTPRangeFile]:
+    """
+    Open a remote file for ranged reads, or return None if the server does not support them
+    """
+    try:
+        return HTTPRangeFile(session, url, **kwargs)
+    except RangeNotSupportedError as e:
+        logger.info(str(e))
+        return None
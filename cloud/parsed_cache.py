@@ -0,0 +1,105 @@
+"""
+Cache of parsed CSDB pages
+
+Parsing a release or group page with BeautifulSoup costs far more than
+looking it up in the HTTP cache, so parse results are kept too, keyed by
+entity type and id. Each entry remembers the digest of the page it was
+parsed from; when the HTTP cache hands out a different page body the old
+result is simply not used. Cached results are shared between sessions
+and must be treated as read-only.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Memory budget for parsed results
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def approx_size(obj: Any) -> int:
+    """
+    Estimates the memory used by a parse result (nested dicts, lists and strings).
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(approx_size(v) for v in obj)
+    return size
+
+
+class ParsedCache:
+    """Memory-bounded LRU of parse results keyed by (kind, id)"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_bytes: Approximate memory budget for all cached results
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (kind, id) -> (page digest, result, size)
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[str, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind: str, key: Hashable, digest: str) -> Optional[Any]:
+        """
+        Get the result parsed from a page
+
+        Args:
+            kind: Entity type (release, group, find, ...)
+            key: Entity id or search text
+            digest: Digest of the current page body
+
+        Returns:
+            The cached result, or None if missing or parsed from another page body
+        """
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None or entry[0] != digest:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, kind: str, key: Hashable, digest: str, result: Any):
+        """
+        Store a parse result, evicting the least recently used ones over budget
+
+        Args:
+            kind: Entity type (release, group, find, ...)
+            key: Entity id or search text
+            digest: Digest of the page body the result was parsed from
+            result: Parse result
+        """
+        size = approx_size(result)
+        with self._lock:
+            old = self._entries.pop((kind, key), None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[(kind, key)] = (digest, result, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, dropped) = self._entries.popitem(last=False)
+                self._bytes -= dropped
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get size and hit counters for monitoring
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
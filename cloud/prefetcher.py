@@ -0,0 +1,217 @@
+"""
+Speculative background prefetching
+
+After a group or find listing the next command is usually cd into one of
+the listed releases. The Prefetcher fetches those in the background so the
+cd is answered from the caches:
+
+- Concurrency: one small thread pool for the whole process, shared by all
+  sessions and handlers.
+- Politeness: a token bucket per host, charged per HTTP request; prefetches
+  finding the bucket empty are dropped, never delayed, so speculative work
+  cannot crowd out the requests users are waiting for. A fetch making a
+  further request (e.g. the HTML page after the webservice) calls
+  prefetch_checkpoint() first, which takes that request's token.
+- Isolation: prefetches go through circuit breakers of their own, so
+  failing speculative requests cannot open the breakers of the requests
+  users are waiting for.
+- Cancellation: every session has a generation. A new batch or cancel()
+  bumps it; queued tasks of older generations are cancelled, and a task
+  checks its generation once more before it fetches and at every
+  prefetch_checkpoint().
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from http_client import CircuitBreaker, use_breakers
+
+logger = logging.getLogger(__name__)
+
+# Prefetching is opt-in
+PREFETCH_ENABLED = os.getenv('CSDB_PREFETCH', '0').lower() in ('1', 'true', 'yes')
+# Linked releases prefetched after a listing
+PREFETCH_TOP_K = int(os.getenv('CSDB_PREFETCH_TOP_K', '5'))
+# Prefetches running at once in the process
+PREFETCH_WORKERS = int(os.getenv('CSDB_PREFETCH_WORKERS', '2'))
+# Prefetch requests per second and burst allowed per host; by default a burst covers one listing
+PREFETCH_HOST_RATE = float(os.getenv('CSDB_PREFETCH_HOST_RATE', '1'))
+PREFETCH_HOST_BURST = int(os.getenv('CSDB_PREFETCH_HOST_BURST', str(PREFETCH_TOP_K)))
+
+
+class PrefetchAborted(Exception):
+    """Raised by prefetch_checkpoint() when the prefetch was cancelled or its host budget is spent"""
+
+
+# Permit check of the prefetch running on this thread, see prefetch_checkpoint()
+_thread_prefetch = threading.local()
+
+
+def prefetch_checkpoint(host: str):
+    """
+    Ask before a further HTTP request whether the prefetch running on this thread may make it
+
+    Does nothing outside prefetches.
+
+    Args:
+        host: Host the request goes to
+
+    Raises:
+        PrefetchAborted: If the prefetch was cancelled or the host's budget is spent
+    """
+    permit = getattr(_thread_prefetch, 'permit', None)
+    if permit is not None:
+        permit(host)
+
+
+class TokenBucket:
+    """Rate limit with bursts; take() never blocks"""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def take(self) -> bool:
+        """Take a token if one is available"""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class Prefetcher:
+    """Background fetches per session with a global cap and per-host budgets"""
+
+    def __init__(self, workers: int = PREFETCH_WORKERS, host_rate: float = PREFETCH_HOST_RATE,
+                 host_burst: int = PREFETCH_HOST_BURST, clock: Callable[[], float] = time.monotonic):
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='csdb-prefetch')
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        # Host -> breaker of the prefetch requests, apart from the sessions' shared ones
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # session id -> (generation, keys of the batch, futures of the batch)
+        self._sessions: Dict[int, Tuple[int, Set, List[Future]]] = {}
+        self._generation = 0
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def submit(self, session_id: int, tasks: Iterable[Tuple[object, str, Callable[[], object]]]):
+        """
+        Replace the session's prefetches with a new batch
+
+        Args:
+            session_id: Session the prefetches are for
+            tasks: (key, host, fetch) per prefetch; keys identify what is prefetched (see covers())
+        """
+        tasks = list(tasks)
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._cancel_locked(session_id)
+            futures = [self._pool.submit(self._run, session_id, generation, host, fetch)
+                       for _, host, fetch in tasks]
+            self._sessions[session_id] = (generation, {key for key, _, _ in tasks}, futures)
+            self.submitted += len(futures)
+
+    def covers(self, session_id: int, key) -> bool:
+        """Whether key is in the session's current batch"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry is not None and key in entry[1]
+
+    def cancel(self, session_id: int, state: Optional[dict] = None):
+        """Cancel the session's prefetches (also a session store release listener)"""
+        with self._lock:
+            self._cancel_locked(session_id)
+
+    def _cancel_locked(self, session_id: int):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.cancelled += sum(1 for future in entry[2] if future.cancel())
+
+    def _current(self, session_id: int, generation: int) -> bool:
+        entry = self._sessions.get(session_id)
+        return entry is not None and entry[0] == generation
+
+    def _permit(self, session_id: int, generation: int, host: str):
+        """Take a host token for one request of a prefetch that is still current"""
+        with self._lock:
+            # The batch may have been replaced or cancelled since the prefetch was queued
+            if not self._current(session_id, generation):
+                self.cancelled += 1
+                raise PrefetchAborted("cancelled")
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.host_rate, self.host_burst, self._clock)
+            if not bucket.take():
+                self.throttled += 1
+                raise PrefetchAborted(f"no budget left for {host}")
+
+    def _run(self, session_id: int, generation: int, host: str, fetch: Callable[[], object]):
+        try:
+            # The first request's token; fetch() asks for further ones at prefetch_checkpoint()
+            self._permit(session_id, generation, host)
+        except PrefetchAborted:
+            return
+        _thread_prefetch.permit = functools.partial(self._permit, session_id, generation)
+        try:
+            with use_breakers(self.breakers):
+                fetch()
+            with self._lock:
+                self.completed += 1
+        except PrefetchAborted as e:
+            logger.debug(f"Prefetch for session {session_id} stopped: {e}")
+        except Exception as e:
+            logger.debug(f"Prefetch for session {session_id} failed: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            _thread_prefetch.permit = None
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring"""
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'throttled': self.throttled,
+                'failed': self.failed,
+            }
+
+    def shutdown(self, wait: bool = True, cancel: bool = True):
+        """Stop the workers, by default dropping the prefetches not started yet"""
+        self._pool.shutdown(wait=wait, cancel_futures=cancel)
+
+
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """
+    Get the process-wide prefetcher, cancelling the prefetches of sessions that end
+    """
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            from shared_state import get_session_store
+            _prefetcher = Prefetcher()
+            get_session_store().add_release_listener(_prefetcher.cancel)
+        return _prefetcher
@@ -51,6 +51,10 @@ SAFE_MATH = {
 class PythonEvalHandler(BaseHandler):
     """Handler for Python expression evaluation"""
 
+    prefixes = ("?",)
+    # Expressions are quick; a slow one is most likely runaway
+    timeout = 5.0
+
     def __init__(self):
         """Initialize PythonEvalHandler"""
         # Create safe namespace
@@ -0,0 +1,145 @@
+"""
+Persistent session backend for C64 Cloud Server
+
+Keeps the resumable part of each session's state in a local SQLite
+database, keyed by the session token the client presents when it
+reconnects. Writes are queued and flushed in batches by a background
+thread, so saving state never blocks request handling.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Session state keys that survive a reconnect or server restart
+PERSISTENT_KEYS = (
+    'active_module',
+    'active_dir',
+    'active_id',
+    'zip_id',
+    'zip_files',
+    'last_find',
+)
+
+
+class SQLiteSessionBackend:
+    """SQLite (WAL mode) store of session state snapshots"""
+
+    def __init__(self, path: str, flush_interval: float = 0.5, batch_size: int = 100):
+        """
+        Open or create the session database
+
+        Args:
+            path: Database file path
+            flush_interval: Maximum seconds a queued write waits before it is flushed
+            batch_size: Number of queued sessions that triggers an early flush
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[str, str] = {}
+        self._pending_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self.writes = 0
+        self.flushes = 0
+
+        self._read_conn = self._connect()
+        self._write_conn = self._connect()
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " token TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated REAL NOT NULL DEFAULT (julianday('now')))")
+        self._write_conn.commit()
+
+        self._writer = threading.Thread(
+            target=self._run, name='session-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode, usable from any thread"""
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the saved state for a session token
+
+        Args:
+            token: Session token
+
+        Returns:
+            Saved state keys, or None if the token is unknown
+        """
+        with self._pending_lock:
+            data = self._pending.get(token)
+        if data is None:
+            with self._read_lock:
+                row = self._read_conn.execute(
+                    "SELECT state FROM sessions WHERE token = ?", (token,)).fetchone()
+            if row is None:
+                return None
+            data = row[0]
+        return json.loads(data)
+
+    def save(self, token: str, state: Dict[str, Any]):
+        """
+        Queue a snapshot of a session's persistent state for writing
+
+        Repeated saves of the same token before a flush are coalesced.
+
+        Args:
+            token: Session token
+            state: Session state dict
+        """
+        snapshot = json.dumps({key: state.get(key) for key in PERSISTENT_KEYS})
+        with self._pending_lock:
+            self._pending[token] = snapshot
+            queued = len(self._pending)
+        if queued >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all queued snapshots in one transaction"""
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            try:
+                with self._write_conn:
+                    self._write_conn.executemany(
+                        "INSERT OR REPLACE INTO sessions (token, state, updated)"
+                        " VALUES (?, ?, julianday('now'))",
+                        batch.items())
+                self.writes += len(batch)
+                self.flushes += 1
+            except sqlite3.Error as e:
+                logger.error(f"Error writing {len(batch)} sessions: {e}")
+                with self._pending_lock:
+                    # Keep newer snapshots queued since the batch was taken
+                    self._pending = {**batch, **self._pending}
+
+    def close(self):
+        """Flush queued writes and close the database"""
+        self._stopped = True
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        self.flush()
+        self._read_conn.close()
+        self._write_conn.close()
+
+    def _run(self):
+        """Background writer loop"""
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
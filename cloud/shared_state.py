@@ -1,22 +1,283 @@
 """
 Shared session state for C64 Cloud Server handlers
 """
-from typing import Dict, Any
+import itertools
+import logging
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
-# Per-session state: session_id (int) -> state dict
-_session_states: Dict[int, Dict[str, Any]] = {}
+logger = logging.getLogger(__name__)
+
+# Default limits for the process-wide session store
+DEFAULT_MAX_SESSIONS = 1024
+DEFAULT_IDLE_TTL = 3600.0  # seconds
+
+# Session tokens are lowercase hex, which survives the PETSCII round trip
+_TOKEN_RE = re.compile(r'^[0-9a-f]{16,64}$')
+
+
+def _new_state() -> Dict[str, Any]:
+    """Create the initial state dict of a session"""
+    return {
+        'active_module': None,
+        'active_dir': None,
+        'active_id': None,
+        'zip_id': None,
+        'zip_files': None,
+    }
+
+
+class _Session:
+    """Store entry: a session's state dict, its lock and last access time"""
+
+    __slots__ = ('state', 'lock', 'last_access')
+
+    def __init__(self, now: float):
+        self.state = _new_state()
+        self.lock = threading.RLock()
+        self.last_access = now
+
+
+class SessionStore:
+    """
+    Bounded, thread-safe store of per-session state dicts
+
+    Sessions are kept in least-recently-used order. A session is evicted
+    when it has been idle longer than idle_ttl seconds or, when the store is
+    full, if it is the least recently used one. The store lock only guards
+    the session map; code that mutates one session's state from several
+    threads can take that session's own lock via session_lock().
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, idle_ttl: float = DEFAULT_IDLE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize an empty store
+
+        Args:
+            max_sessions: Maximum number of sessions kept
+            idle_ttl: Seconds after the last access before a session expires
+            clock: Monotonic time source (replaceable for testing)
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[int, _Session]" = OrderedDict()
+        self._release_listeners: List[Callable[[int, Dict[str, Any]], None]] = []
+        # Optional persistent backend (e.g. SQLiteSessionBackend) for resumable sessions
+        self.backend = None
+        self.created = 0
+        self.released = 0
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+
+    def get(self, session_id: int) -> Dict[str, Any]:
+        """
+        Get state for a given session ID, creating it if it doesn't exist.
+        """
+        return self._entry(session_id).state
+
+    def _entry(self, session_id: int) -> _Session:
+        """Look up or create a session's entry and mark it as used"""
+        now = self._clock()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and now - entry.last_access > self.idle_ttl:
+                del self._sessions[session_id]
+                self.evicted_ttl += 1
+                dropped = [(session_id, entry.state)]
+                entry = None
+            else:
+                dropped = []
+
+            if entry is None:
+                entry = _Session(now)
+                self._sessions[session_id] = entry
+                self.created += 1
+                dropped += self._evict(now)
+            else:
+                entry.last_access = now
+                self._sessions.move_to_end(session_id)
+
+        self._notify(dropped)
+        return entry
+
+    def release(self, session_id: int) -> bool:
+        """
+        Remove a session, e.g. when its connection is closed
+
+        Returns:
+            True if the session existed
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self.released += 1
+
+        if entry is None:
+            return False
+        self._notify([(session_id, entry.state)])
+        return True
+
+    def resume(self, session_id: int, token: str) -> Optional[str]:
+        """
+        Restore a session's state from a token issued on an earlier connection
+
+        Unknown or empty tokens get a new token bound to the session.
+
+        Args:
+            session_id: Session of the current connection
+            token: Token presented by the client
+
+        Returns:
+            The session's token, or None if no persistent backend is configured
+        """
+        if self.backend is None:
+            return None
+
+        state = self.get(session_id)
+        saved = self.backend.load(token) if _TOKEN_RE.match(token or '') else None
+        if saved is None:
+            token = secrets.token_hex(8)
+            logger.info(f"Session {session_id}: issued token {token}")
+        else:
+            state.update(saved)
+            logger.info(f"Session {session_id}: resumed token {token}")
+        state['session_token'] = token
+        self.backend.save(token, state)
+        return token
+
+    def persist(self, session_id: int):
+        """
+        Queue the session's state for saving if it was resumed or issued a token
+        """
+        if self.backend is None:
+            return
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry is not None and entry.state.get('session_token'):
+            self.backend.save(entry.state['session_token'], entry.state)
+
+    def session_lock(self, session_id: int) -> threading.RLock:
+        """
+        Get the lock guarding one session's state, creating the session if needed
+
+        Hold it while reading and changing related keys of the state, but not
+        while waiting for another thread that may take it.
+        """
+        return self._entry(session_id).lock
+
+    def add_release_listener(self, listener: Callable[[int, Dict[str, Any]], None]):
+        """
+        Register a callback run with (session_id, state) when a session is
+        released or evicted, to free resources the state refers to
+        """
+        self._release_listeners.append(listener)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get size and eviction counters for monitoring
+        """
+        with self._lock:
+            return {
+                'size': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'created': self.created,
+                'released': self.released,
+                'evicted_lru': self.evicted_lru,
+                'evicted_ttl': self.evicted_ttl,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: int) -> bool:
+        return session_id in self._sessions
+
+    def _evict(self, now: float) -> List[Tuple[int, Dict[str, Any]]]:
+        """Drop expired and excess sessions (store lock held)"""
+        dropped = []
+        # Least recently used sessions come first, so expired ones form a prefix
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry.last_access <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self.evicted_ttl += 1
+            dropped.append((session_id, entry.state))
+
+        while len(self._sessions) > self.max_sessions:
+            session_id, entry = self._sessions.popitem(last=False)
+            self.evicted_lru += 1
+            dropped.append((session_id, entry.state))
+        return dropped
+
+    def _notify(self, dropped: List[Tuple[int, Dict[str, Any]]]):
+        """Run release listeners outside the store lock"""
+        for session_id, state in dropped:
+            for listener in self._release_listeners:
+                try:
+                    listener(session_id, state)
+                except Exception as e:
+                    logger.error(f"Error releasing session {session_id}: {e}")
+
+
+# Process-wide session store
+_store = SessionStore()
+
+# Session IDs are never reused within a process, unlike id() of a socket
+_session_ids = itertools.count(1)
+
+
+def get_session_store() -> SessionStore:
+    """
+    Get the process-wide session store
+    """
+    return _store
+
+
+def new_session_id() -> int:
+    """
+    Allocate a session ID for a new client connection.
+    """
+    return next(_session_ids)
 
 
 def get_session_state(session_id: int) -> Dict[str, Any]:
     """
     Get state for a given session ID, creating it if it doesn't exist.
     """
-    if session_id not in _session_states:
-        _session_states[session_id] = {
-            'active_module': None,
-            'active_dir': None,
-            'active_id': None,
-            'zip_id': None,
-            'zip_files': None,
-        }
-    return _session_states[session_id]
+    return _store.get(session_id)
+
+
+def session_lock(session_id: int) -> threading.RLock:
+    """
+    Get the lock guarding a session's state; see SessionStore.session_lock().
+    """
+    return _store.session_lock(session_id)
+
+
+def resume_session_state(session_id: int, token: str) -> Optional[str]:
+    """
+    Restore a session from its token; see SessionStore.resume().
+    """
+    return _store.resume(session_id, token)
+
+
+def persist_session_state(session_id: int):
+    """
+    Queue a session's state for the persistent backend, if any.
+    """
+    _store.persist(session_id)
+
+
+def release_session_state(session_id: int) -> bool:
+    """
+    Drop the state of a session whose connection has closed.
+    """
+    return _store.release(session_id)
@@ -0,0 +1,83 @@
+"""
+Single-flight call coalescing
+
+When several threads ask for the same key at the same time, only the
+first one runs the function; the others wait for it and get the same
+result (or exception). Used so a burst of sessions opening the same
+CSDB release costs one fetch and one parse.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """An in-flight call and its outcome"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Shares the result of concurrent calls with the same key"""
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() unless a call with the same key is already running, then wait for that one
+
+        Args:
+            key: Identifies identical calls
+            fn: Function producing the result
+
+        Returns:
+            The result of fn() or of the call in flight
+
+        Raises:
+            Exception: Whatever the call raised, in every waiting thread
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the number of calls run and calls served by another call in flight
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'calls': self.calls,
+                'shared': self.shared,
+            }
@@ -0,0 +1,56 @@
+"""
+Regression tests for the CSDB page parsers on saved pages
+"""
+import io
+import pytest
+import csdb_html
+import bench_parsers
+from bench_parsers import FIXTURE_DIR, fixtures, golden_path, parser_for, run, to_json
+
+
+class TestParserFixtures:
+    """Test parser results and speed against the recorded fixtures"""
+
+    @pytest.mark.parametrize('path', fixtures(), ids=lambda p: p.name)
+    def test_golden_result(self, path, monkeypatch):
+        """Test that each page parses to its golden JSON, key order included"""
+        monkeypatch.setattr(csdb_html, 'HTML_BACKEND', 'html.parser')
+        result = parser_for(path)(path.read_text(encoding='utf-8'))
+        assert to_json(result) == golden_path(path).read_text(encoding='utf-8')
+
+    @pytest.mark.benchmark
+    def test_no_slowdown(self):
+        """Test that no parser is more than twice as slow as its baseline"""
+        report = io.StringIO()
+        failures = run(repeat=3, threshold=1.0, out=report)
+        assert failures == [], report.getvalue()
+
+    def test_fixture_set(self):
+        """Test that every parser has pages to check"""
+        prefixes = {path.name.split('_')[0] for path in fixtures()}
+        assert prefixes == {'search', 'group', 'release'}
+
+    def test_lxml_differs_on_broken_markup(self, monkeypatch):
+        """Test that lxml keeps member rows html.parser drops, which is why it is opt-in"""
+        pytest.importorskip('lxml')
+        path = FIXTURE_DIR / 'group_broken_markup.html'
+        monkeypatch.setattr(csdb_html, 'HTML_BACKEND', 'lxml')
+
+        result = parser_for(path)(path.read_text(encoding='utf-8'))
+
+        assert to_json(result) != golden_path(path).read_text(encoding='utf-8')
+        assert len(result['members']) > 2
+
+    def test_missing_golden_fails(self, tmp_path, monkeypatch):
+        """Test that a page without golden JSON fails until goldens are written explicitly"""
+        page = tmp_path / 'release_new.html'
+        page.write_text((FIXTURE_DIR / 'release_small.html').read_text(encoding='utf-8'), encoding='utf-8')
+        monkeypatch.setattr(bench_parsers, 'FIXTURE_DIR', tmp_path)
+        monkeypatch.setattr(bench_parsers, 'BASELINE_FILE', tmp_path / 'baseline.json')
+
+        failures = run(repeat=1, out=io.StringIO())
+        assert failures == ["release_new.html: no release_new.json; check the result and run with --update-goldens"]
+        assert not golden_path(page).exists()
+
+        assert run(repeat=1, update_goldens=True, out=io.StringIO()) == []
+        assert run(repeat=1, out=io.StringIO()) == []
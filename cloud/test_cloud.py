@@ -5,7 +5,8 @@ import pytest
 import socket
 import threading
 import time
-from cloud_server import C64Server, CommandHandler, MAGIC_BYTES, ResponseType
+from cloud_server import (C64Server, AsyncC64Server, CommandHandler, CommandID, FrameDecoder,
+                          ResponseStream, MAGIC_BYTES, ResponseType)
 
 
 @pytest.fixture
@@ -26,6 +27,18 @@ def running_server(server):
     server.stop()
 
 
+@pytest.fixture
+def running_async_server():
+    """Create and start an asyncio C64 server in a background thread"""
+    srv = AsyncC64Server(host='127.0.0.1', port=0, max_workers=2)
+    thread = threading.Thread(target=srv.start, daemon=True)
+    thread.start()
+    time.sleep(0.2)  # Give server time to start
+    yield srv
+    srv.stop()
+    thread.join(timeout=2)
+
+
 class TestProtocolParsing:
     """Test protocol parsing and packet handling"""
 
@@ -67,6 +80,45 @@ class TestProtocolParsing:
             CommandHandler.parse_packet(packet)
 
 
+class TestFrameDecoder:
+    """Test reassembly of packets from a TCP byte stream"""
+
+    KEYPRESS = bytes([0xFE, 0xFF, 0x01, 0x41, 0x00])
+    TEXT = bytes([0xFE, 0xFF, 0x02, 0x48, 0x45, 0x4C, 0x50, 0x00])
+
+    def test_single_packet(self):
+        """Test that one complete packet is returned as is"""
+        decoder = FrameDecoder()
+        assert decoder.feed(self.TEXT) == [self.TEXT]
+        assert len(decoder.buffer) == 0
+
+    def test_split_packet(self):
+        """Test that a packet split over several reads is reassembled"""
+        decoder = FrameDecoder()
+        assert decoder.feed(self.TEXT[:1]) == []
+        assert decoder.feed(self.TEXT[1:4]) == []
+        assert decoder.feed(self.TEXT[4:]) == [self.TEXT]
+
+    def test_coalesced_packets(self):
+        """Test that pipelined packets in one read are returned in order"""
+        decoder = FrameDecoder()
+        packets = decoder.feed(self.TEXT + self.KEYPRESS + self.TEXT[:5])
+        assert packets == [self.TEXT, self.KEYPRESS]
+        assert decoder.feed(self.TEXT[5:]) == [self.TEXT]
+
+    def test_skips_garbage(self):
+        """Test that bytes before the magic bytes and unknown commands are skipped"""
+        decoder = FrameDecoder()
+        garbage = bytes([0x10, 0x20]) + MAGIC_BYTES + bytes([0x7F, 0x01])
+        assert decoder.feed(garbage + self.KEYPRESS) == [self.KEYPRESS]
+
+    def test_unterminated_overflow(self):
+        """Test that an unterminated text input does not grow the buffer forever"""
+        decoder = FrameDecoder(max_buffer=16)
+        decoder.feed(MAGIC_BYTES + bytes([0x02]) + b'A' * 32)
+        assert len(decoder.buffer) == 0
+
+
 class TestCommandHandlers:
     """Test command processing"""
 
@@ -162,6 +214,128 @@ class TestResponseGeneration:
         assert response[3:] == data
 
 
+class TestResponseStreaming:
+    """Test windowed streaming of long responses"""
+
+    def test_response_stream_windows(self):
+        """Test that chunks are regrouped into fixed-size windows"""
+        stream = ResponseStream(iter([b'abc', b'defgh', b'ij']), 4)
+
+        assert stream.next_window() == (b'abcd', False)
+        assert stream.next_window() == (b'efgh', False)
+        assert stream.next_window() == (b'ij', True)
+
+    def test_response_stream_exact_fit(self):
+        """Test that a response filling the window exactly ends in one window"""
+        stream = ResponseStream(iter([b'ab', b'cd']), 4)
+
+        assert stream.next_window() == (b'abcd', True)
+
+    def test_streamed_text_input(self, monkeypatch):
+        """Test that a long response is sent in windows, each after a "more" command"""
+        monkeypatch.setattr(CommandHandler, 'stream_window', 32)
+        session_id = 3064
+        # "help" in PETSCII
+        text_packet = MAGIC_BYTES + bytes([CommandID.TEXT_INPUT, 0x48, 0x45, 0x4C, 0x50, 0x00])
+        more_packet = MAGIC_BYTES + bytes([CommandID.MORE])
+
+        response = CommandHandler.process_command(text_packet, session_id)
+        windows = []
+        while response[2] == ResponseType.PETSCII_CHUNK:
+            assert len(response) == 3 + 32 + 1
+            windows.append(response[3:-1])
+            response = CommandHandler.process_command(more_packet, session_id)
+        assert response[2] == ResponseType.PETSCII_NULL_TERMINATED
+        windows.append(response[3:-1])
+
+        full = CommandHandler.get_dispatcher().dispatch(text_packet[3:], session_id)
+        assert len(windows) > 1
+        assert b''.join(windows) == full
+
+    def test_resume_session_command(self, tmp_path):
+        """Test the resume handshake through process_command"""
+        from session_backend import SQLiteSessionBackend
+        from shared_state import get_session_store, get_session_state
+        store = get_session_store()
+        store.backend = SQLiteSessionBackend(str(tmp_path / 'sessions.db'))
+        try:
+            resume = MAGIC_BYTES + bytes([CommandID.RESUME_SESSION, 0x00])
+            response = CommandHandler.process_command(resume, 3066)
+            assert response[2] == ResponseType.SESSION_TOKEN
+            token = response[3:-1]
+            assert len(token) == 16
+
+            # "c:" switches module and persists the session
+            CommandHandler.process_command(
+                MAGIC_BYTES + bytes([CommandID.TEXT_INPUT, 0x43, 0x3A, 0x00]), 3066)
+
+            response = CommandHandler.process_command(
+                MAGIC_BYTES + bytes([CommandID.RESUME_SESSION]) + token + b'\x00', 3067)
+            assert response[3:-1] == token
+            assert get_session_state(3067)['active_module'] == 'c'
+        finally:
+            store.backend.close()
+            store.backend = None
+
+    def test_more_while_command_holds_session_lock(self, monkeypatch):
+        """Test that "more" sends progress of a running command without waiting for its session lock"""
+        from base_handler import BaseHandler
+        from shared_state import session_lock
+
+        finish = threading.Event()
+
+        class SlowCopyHandler(BaseHandler):
+            prefixes = ("slowcp",)
+            reports_progress = True
+
+            def can_handle(self, text, session_id=0):
+                return False
+
+            def handle(self, text, session_id=0):
+                return "copied"
+
+            def handle_progress(self, text, session_id, progress):
+                with session_lock(session_id):
+                    for line in ("aaaaaaaaa\n", "bbbbbbbbb\n", "ccccccccc\n"):
+                        progress(line)
+                    finish.wait(5)
+                return "copied"
+
+        dispatcher = CommandHandler.get_dispatcher()
+        monkeypatch.setattr(dispatcher, 'handlers', [SlowCopyHandler()] + dispatcher.handlers)
+        dispatcher._build_routes()
+        monkeypatch.setattr(CommandHandler, 'stream_window', 10)
+        session_id = 3068
+        text_packet = (MAGIC_BYTES + bytes([CommandID.TEXT_INPUT])
+                       + BaseHandler.utf8_to_petscii("slowcp") + b'\x00')
+        more_packet = MAGIC_BYTES + bytes([CommandID.MORE])
+        try:
+            first = CommandHandler.process_command(text_packet, session_id)
+            replies = []
+            more = threading.Thread(
+                target=lambda: replies.append(CommandHandler.process_command(more_packet, session_id)))
+            more.start()
+            more.join(2)
+
+            assert not more.is_alive()
+            assert not finish.is_set()
+            assert first[2] == ResponseType.PETSCII_CHUNK
+            assert replies[0][2] == ResponseType.PETSCII_CHUNK
+            assert replies[0][3:-1] == BaseHandler.utf8_to_petscii("bbbbbbbbb\n")
+        finally:
+            finish.set()
+            while CommandHandler.process_command(more_packet, session_id)[2] == ResponseType.PETSCII_CHUNK:
+                pass
+            monkeypatch.undo()
+            dispatcher._build_routes()
+
+    def test_more_without_pending_stream(self):
+        """Test that "more" with nothing pending returns an empty response"""
+        response = CommandHandler.process_command(MAGIC_BYTES + bytes([CommandID.MORE]), 3065)
+
+        assert response == MAGIC_BYTES + bytes([ResponseType.PETSCII_NULL_TERMINATED, 0x00])
+
+
 class TestPETSCIIConversion:
     """Test PETSCII conversion utilities"""
 
@@ -235,6 +409,58 @@ class TestPETSCIIConversion:
         expected = bytes([0xC8, 0xC5, 0xCC, 0xCC, 0xCF])
         assert petscii_bytes == expected
 
+    def test_translation_tables_match_per_byte_api(self):
+        """Test that whole-buffer conversion agrees with the per-byte functions"""
+        from generate_pet_asc_table import Petscii, PETSCII_CODEC, PETSCII_TO_ASCII
+
+        all_bytes = bytes(range(256))
+        assert all_bytes.translate(PETSCII_TO_ASCII) == bytes(
+            [Petscii.petscii2ascii(b) for b in all_bytes])
+
+        ascii_text = bytes(range(128)).decode('ascii')
+        assert ascii_text.encode(PETSCII_CODEC) == bytes(
+            [Petscii.ascii2petscii(ord(c)) for c in ascii_text])
+
+    def test_codec_round_trip(self):
+        """Test the registered petscii-c64 codec"""
+        import generate_pet_asc_table  # noqa: F401 - registers the codec
+
+        encoded = "Hello C64".encode('petscii-c64')
+        assert encoded == bytes([0xC8, 0x45, 0x4C, 0x4C, 0x4F, 0x20, 0xC3, 0x36, 0x34])
+        assert encoded.decode('petscii-c64') == "Hello C64"
+        assert "Hello".encode('petscii-c64-shifted') == encoded[:5]
+
+    def test_codec_unshifted_variant(self):
+        """Test that the unshifted variant folds both cases to PETSCII $41-$5A"""
+        import generate_pet_asc_table  # noqa: F401 - registers the codec
+
+        assert "Hello".encode('petscii-c64-unshifted') == b'HELLO'
+        assert b'HELLO'.decode('petscii-c64-unshifted') == "HELLO"
+
+    def test_codec_strict_and_fallback_errors(self):
+        """Test error handling for text outside the PETSCII repertoire"""
+        from generate_pet_asc_table import FALLBACK_ERRORS
+
+        with pytest.raises(UnicodeEncodeError):
+            "\u2014".encode('petscii-c64')
+        with pytest.raises(UnicodeDecodeError):
+            bytes([0xA0]).decode('petscii-c64')
+        assert "a\u2014b".encode('petscii-c64', FALLBACK_ERRORS) == b'A-B'
+
+    def test_incremental_codec(self):
+        """Test converting a stream chunk by chunk"""
+        import codecs
+        from generate_pet_asc_table import FALLBACK_ERRORS
+
+        encoder = codecs.getincrementalencoder('petscii-c64')(FALLBACK_ERRORS)
+        decoder = codecs.getincrementaldecoder('petscii-c64')()
+        tokens = ["The ", "C64\u2019s ", "SID"]
+
+        encoded = [encoder.encode(t) for t in tokens] + [encoder.encode("", final=True)]
+        decoded = ''.join(decoder.decode(chunk) for chunk in encoded)
+
+        assert decoded == "The C64's SID"
+
 
 class TestServerIntegration:
     """Integration tests with actual TCP connections"""
@@ -298,6 +524,158 @@ class TestServerIntegration:
 
         client.close()
 
+    def test_pipelined_commands(self, running_server):
+        """Test that two commands sent in one segment get two responses"""
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client.connect((running_server.host, running_server.port))
+        client.settimeout(2)
+
+        # "? 1" and "? 2" in PETSCII
+        first = bytes([0xFE, 0xFF, 0x02, 0x3F, 0x20, 0x31, 0x00])
+        second = bytes([0xFE, 0xFF, 0x02, 0x3F, 0x20, 0x32, 0x00])
+        client.sendall(first + second)
+
+        received = b''
+        while received.count(0x00) < 2:
+            received += client.recv(1024)
+
+        responses = received.split(b'\x00')[:2]
+        assert [r[:3] for r in responses] == [
+            MAGIC_BYTES + bytes([ResponseType.PETSCII_NULL_TERMINATED])] * 2
+        assert responses[0][3:].startswith(b'1') and responses[1][3:].startswith(b'2')
+
+        client.close()
+
+    def test_session_released_on_disconnect(self, running_server):
+        """Test that a closed connection releases its session state"""
+        from shared_state import get_session_store
+        store = get_session_store()
+        released_before = store.stats()['released']
+
+        client = socket.create_connection((running_server.host, running_server.port))
+        # "test" creates session state while looking for a handler
+        client.send(bytes([0xFE, 0xFF, 0x02, 0x54, 0x45, 0x53, 0x54, 0x00]))
+        client.recv(1024)
+        client.close()
+
+        for _ in range(20):
+            if store.stats()['released'] > released_before:
+                break
+            time.sleep(0.05)
+        assert store.stats()['released'] == released_before + 1
+
+
+    @pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'), reason='SO_REUSEPORT not supported')
+    def test_reuse_port_servers_share_port(self):
+        """Test that two reuse_port servers can listen on the same port"""
+        first = C64Server(host='127.0.0.1', port=0, reuse_port=True)
+        threading.Thread(target=first.start, daemon=True).start()
+        time.sleep(0.1)
+        second = C64Server(host='127.0.0.1', port=first.port, reuse_port=True)
+        threading.Thread(target=second.start, daemon=True).start()
+        time.sleep(0.1)
+
+        assert first.running and second.running
+        client = socket.create_connection(('127.0.0.1', first.port))
+        client.send(bytes([0xFE, 0xFF, 0x02, 0x3F, 0x20, 0x31, 0x00]))  # "? 1"
+        client.settimeout(2)
+        assert client.recv(1024)[0:2] == MAGIC_BYTES
+
+        client.close()
+        first.stop()
+        second.stop()
+
+    def test_drain_stops_accepting(self, running_server):
+        """Test that drain closes the listening socket and stops the server"""
+        client = socket.create_connection((running_server.host, running_server.port))
+
+        running_server.drain(timeout=1)
+
+        assert not running_server.running
+        with pytest.raises(OSError):
+            socket.create_connection((running_server.host, running_server.port), timeout=1)
+        client.close()
+
+    def test_requested_drain_runs_in_accept_loop(self):
+        """Test that request_drain only flags the drain and the accept loop carries it out"""
+        srv = C64Server(host='127.0.0.1', port=0)
+        thread = threading.Thread(target=srv.start, daemon=True)
+        thread.start()
+        time.sleep(0.1)
+
+        # Holding the lock, as the interrupted thread might: a flag never waits for it
+        with srv.lock:
+            srv.request_drain(timeout=1)
+        thread.join(timeout=3)
+
+        assert not thread.is_alive()
+        assert not srv.running and srv.server_socket is None
+
+
+class TestAsyncServerIntegration:
+    """Integration tests for the asyncio server mode"""
+
+    def test_server_starts_and_stops(self):
+        """Test that the async server can start and stop cleanly"""
+        srv = AsyncC64Server(host='127.0.0.1', port=0)
+        thread = threading.Thread(target=srv.start, daemon=True)
+        thread.start()
+        time.sleep(0.2)
+
+        assert srv.running
+        assert srv.port != 0
+
+        srv.stop()
+        thread.join(timeout=2)
+
+        assert not srv.running
+        assert not thread.is_alive()
+
+    def test_requested_drain_stops_server(self):
+        """Test that request_drain drains on the event loop and the server stops"""
+        srv = AsyncC64Server(host='127.0.0.1', port=0)
+        thread = threading.Thread(target=srv.start, daemon=True)
+        thread.start()
+        time.sleep(0.2)
+
+        srv.request_drain(timeout=1)
+        thread.join(timeout=3)
+
+        assert not thread.is_alive()
+        assert not srv.running
+
+    def test_send_keypress_command(self, running_async_server):
+        """Test that the wire protocol is unchanged in asyncio mode"""
+        client = socket.create_connection(
+            (running_async_server.host, running_async_server.port))
+
+        client.send(bytes([0xFE, 0xFF, 0x01, 0x41, 0x00]))
+        response = client.recv(1024)
+
+        assert response[0:2] == MAGIC_BYTES
+        assert response[2] == ResponseType.PETSCII_NULL_TERMINATED
+        assert response[-1] == 0x00
+
+        client.close()
+
+    def test_many_idle_clients_share_loop(self, running_async_server):
+        """Test that idle connections do not block an active one"""
+        idle = [socket.create_connection((running_async_server.host, running_async_server.port))
+                for _ in range(20)]
+        active = socket.create_connection(
+            (running_async_server.host, running_async_server.port))
+
+        # "? 1" in PETSCII
+        active.send(bytes([0xFE, 0xFF, 0x02, 0x3F, 0x20, 0x31, 0x00]))
+        active.settimeout(2)
+        response = active.recv(1024)
+
+        assert response[0:2] == MAGIC_BYTES
+        assert len(running_async_server.clients) == 21
+
+        for c in idle + [active]:
+            c.close()
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -23,20 +23,16 @@ class TestC64TestClient(unittest.TestCase):
         # Simulate server response
         self.client.socket.recv.return_value = MAGIC_BYTES + \
             bytes([ResponseType.PETSCII_NULL_TERMINATED]) + b'abc\x00'
-        with patch('cloud_test_client.Petscii.ascii2petscii', return_value=65):
-            with patch('cloud_test_client.Petscii.petscii2ascii', side_effect=lambda b: b):
-                self.client.send_keypress('A')
-                self.client.socket.send.assert_called()
-                self.client.socket.recv.assert_called()
+        self.client.send_keypress('A')
+        self.client.socket.send.assert_called_with(MAGIC_BYTES + bytes([0x01, 0xC1, 0x00]))
+        self.client.socket.recv.assert_called()
 
     def test_send_text(self):
         self.client.socket.recv.return_value = MAGIC_BYTES + \
             bytes([ResponseType.PETSCII_NULL_TERMINATED]) + b'hello\x00'
-        with patch('cloud_test_client.Petscii.ascii2petscii', side_effect=lambda c: c):
-            with patch('cloud_test_client.Petscii.petscii2ascii', side_effect=lambda b: b):
-                self.client.send_text('hello')
-                self.client.socket.send.assert_called()
-                self.client.socket.recv.assert_called()
+        self.assertEqual(self.client.send_text('hello'), 'hello')
+        self.client.socket.send.assert_called_with(MAGIC_BYTES + bytes([0x02]) + b'HELLO\x00')
+        self.client.socket.recv.assert_called()
 
     def test_scenario_csdb_find_error(self):
         # Simulate responses for scenario: send 'c:', expect 'csdb mode', send 'find hondani', expect "error: 'name'"
@@ -0,0 +1,211 @@
+"""
+Unit tests for streamed CSDB downloads
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import requests
+from csdb_handler import CSDBHandler, DownloadTooLargeError
+from handler_pool import RequestCancelledError
+from download_store import DownloadStore
+from shared_state import get_session_state, release_session_state
+
+
+class DownloadSession:
+    """Session streaming a fixed body"""
+
+    def __init__(self, body: bytes, content_length: bool = True):
+        self.body = body
+        self.content_length = content_length
+        self.stream_args = []
+
+    def get(self, url, stream=False, timeout=None, **kwargs):
+        self.stream_args.append(stream)
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.raw = io.BytesIO(self.body)
+        resp.url = url
+        if self.content_length:
+            resp.headers['Content-Length'] = str(len(self.body))
+        return resp
+
+
+@pytest.fixture
+def handler(tmp_path_factory):
+    h = CSDBHandler()
+    session = h.session
+    h.downloads = DownloadStore(str(tmp_path_factory.mktemp('store')))
+    yield h
+    h.download_pool.shutdown(wait=True)
+    h.downloads.close()
+    session.close()
+
+
+class TestDownload:
+    """Test _download streaming, size limit and atomic replace"""
+
+    def test_streams_to_file(self, handler, tmp_path):
+        """Test that the body is streamed to the target without leftovers"""
+        handler.session = DownloadSession(b'x' * 200_000)
+        dest = tmp_path / 'demo.prg'
+
+        assert handler._download('https://csdb.dk/getinternalfile.php/1', dest, 'demo.prg') == 200_000
+        assert dest.read_bytes() == b'x' * 200_000
+        assert handler.session.stream_args == [True]
+        assert os.listdir(tmp_path) == ['demo.prg']
+
+    def test_rejects_declared_size_over_limit(self, handler, tmp_path):
+        """Test that a too large Content-Length aborts before reading the body"""
+        handler.session = DownloadSession(b'x' * 1000)
+        handler.max_download_bytes = 999
+
+        with pytest.raises(DownloadTooLargeError):
+            handler._download('https://csdb.dk/x', tmp_path / 'big.zip', 'big.zip')
+        assert os.listdir(tmp_path) == []
+
+    def test_aborts_stream_over_limit_and_keeps_old_file(self, handler, tmp_path):
+        """Test that an undeclared oversize body aborts and leaves the old file intact"""
+        handler.session = DownloadSession(b'x' * 300_000, content_length=False)
+        handler.max_download_bytes = 100_000
+        dest = tmp_path / 'big.zip'
+        dest.write_bytes(b'old')
+
+        with pytest.raises(DownloadTooLargeError):
+            handler._download('https://csdb.dk/x', dest, 'big.zip')
+        assert dest.read_bytes() == b'old'
+        assert os.listdir(tmp_path) == ['big.zip']
+
+
+class TestDownloadProgress:
+    """Test progress reporting through handle_progress"""
+
+    def test_cp_reports_progress_lines(self, handler):
+        """Test that cp reports progress lines before returning its result"""
+        session_id = 9101
+        name = f'progress-test-{os.getpid()}.d64'
+        state = get_session_state(session_id)
+        state.update(active_module='c', active_dir='release', active_id=1)
+        handler._get_parsed_release_info = lambda release_id: {'files': [{'id': 5, 'name': name}]}
+        handler.session = DownloadSession(b'x' * 600 * 1024)
+
+        lines = []
+        try:
+            result = handler.handle_progress(f"cp {name}", session_id, lines.append)
+        finally:
+            release_session_state(session_id)
+
+        assert lines == [f"{name}: 256/600 KB\n", f"{name}: 512/600 KB\n"]
+        assert result == f"Copied {name} to {handler.downloads.session_dir(session_id)}"
+
+    def test_handle_reports_no_progress(self, handler):
+        """Test that the non-streamed path only returns the result"""
+        session_id = 9102
+        name = f'progress-test-{os.getpid()}.prg'
+        get_session_state(session_id).update(active_module='c', active_dir='release', active_id=1)
+        handler._get_parsed_release_info = lambda release_id: {'files': [{'id': 5, 'name': name}]}
+        handler.session = DownloadSession(b'x' * 600 * 1024)
+
+        session_dir = handler.downloads.session_dir(session_id)
+        try:
+            assert handler.handle(f"cp {name}", session_id) == f"Copied {name} to {session_dir}"
+        finally:
+            release_session_state(session_id)
+
+
+class SlowSession:
+    """Session serving files by id, with a delay and a concurrency counter"""
+
+    def __init__(self, delays: dict, failing=()):
+        self.delays = delays
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def get(self, url, stream=False, timeout=None, **kwargs):
+        file_id = int(url.rsplit('=', 1)[1])
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delays.get(file_id, 0.1))
+            if file_id in self.failing:
+                raise requests.exceptions.ConnectionError("connection reset")
+        finally:
+            with self.lock:
+                self.active -= 1
+        return DownloadSession(f"file {file_id}".encode()).get(url)
+
+
+class TestConcurrentCopy:
+    """Test that cp of several files downloads them concurrently"""
+
+    FILES = [{'id': i, 'name': f'part{i}.prg'} for i in range(1, 5)]
+
+    def cp(self, handler, session_id, pattern='*'):
+        get_session_state(session_id).update(active_module='c', active_dir='release', active_id=1)
+        handler._get_parsed_release_info = lambda release_id: {'files': self.FILES}
+        try:
+            return handler.handle(f"cp {pattern}", session_id).split('\n')
+        finally:
+            release_session_state(session_id)
+
+    def test_files_download_in_parallel(self, handler):
+        """Test that the files overlap and are reported in release order"""
+        handler.session = SlowSession({1: 0.3})
+        session_dir = handler.downloads.session_dir(9103)
+
+        lines = self.cp(handler, 9103)
+
+        assert lines[:4] == [f"Copied part{i}.prg to {session_dir}" for i in range(1, 5)]
+        assert lines[4].startswith("4 of 4 files copied in ")
+        assert handler.session.max_active > 1
+
+    def test_failures_are_reported_per_file(self, handler):
+        """Test that one failed file does not stop the others"""
+        handler.session = SlowSession({}, failing={2})
+
+        lines = self.cp(handler, 9104)
+
+        assert lines[1] == "Failed to download part2.prg: connection reset"
+        assert lines[4].startswith("3 of 4 files copied")
+
+    def test_deadline(self, handler):
+        """Test that files not done by the deadline are reported as timed out"""
+        handler.session = SlowSession({3: 1.0})
+        handler.cp_deadline = 0.5
+
+        lines = self.cp(handler, 9105)
+
+        assert lines[2] == "Failed to download part3.prg: timed out"
+        assert lines[4].startswith("3 of 4 files copied")
+
+    def test_cancelled_request_ends_cleanly(self, handler):
+        """Test that a cancelled cp reports the files already copied and drops the others"""
+        class SizedSession:
+            def get(self, url, **kwargs):
+                size = 10 if url.endswith('=1') else 600 * 1024
+                return DownloadSession(b'x' * size).get(url)
+
+        def progress(line):
+            raise RequestCancelledError("CSDBHandler request cancelled")
+
+        handler.session = SizedSession()
+        handler.download_pool.shutdown()
+        handler.download_pool = ThreadPoolExecutor(max_workers=1)
+        session_id = 9106
+        get_session_state(session_id).update(active_module='c', active_dir='release', active_id=1)
+        handler._get_parsed_release_info = lambda release_id: {'files': self.FILES}
+        try:
+            lines = handler.handle_progress("cp *", session_id, progress).split('\n')
+        finally:
+            release_session_state(session_id)
+
+        assert lines[:4] == [f"Copied part1.prg to {handler.downloads.session_dir(session_id)}",
+                             "Failed to download part2.prg: cancelled",
+                             "Failed to download part3.prg: cancelled",
+                             "Failed to download part4.prg: cancelled"]
+        assert lines[4].startswith("1 of 4 files copied")
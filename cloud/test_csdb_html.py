@@ -0,0 +1,134 @@
+"""
+Unit tests for the shared CSDB HTML extraction and the parsers built on it
+"""
+import pytest
+import csdb_html
+from csdb_html import Sections, parse_main
+from csdb_group_parser import parse_csdb_group_detail
+from csdb_release_parser import parse_csdb_release_detail
+from csdb_search_parser import parse_csdb_find
+
+GROUP = '''<html><body><table><tr><td valign=top width=150><b>Menu Releases</b><a href="/x">x</a></td>
+<td valign="top" width="100%">
+<font size=6>Booze Design</font> (BZD)<br>
+<font size=1>Created by <a href="/scener/?id=42">Admin</a><br>On: 12 March 2003</font>
+<table>
+<tr><td><b>Group Type :</b></td><td><a href="/search/?grouptype=1">Demo Group</a></td></tr>
+<tr><td><b>Base Country :</b></td><td><a href="/search/?country=dk">Denmark</a></td></tr>
+<tr><td><b>User rating</b>:</td><td>awaiting 10 votes (4 left) <a href="/voteview.php?id=1">vote</a> <a href="/votestatistics.php?id=1">stats</a></td></tr>
+</table>
+<b>All Members :</b>
+<table><tr><td><a href="/scener/?id=8104">HCL</a></td><td>&nbsp;</td><td>Coder</td></tr>
+<tr><td><a href="/scener/?id=1">Jailbird</a> <small>(ex)</small></td><td>Graphician, Coder</td></tr></table>
+<b>Releases :</b>
+<table><tr><td><a href="/release/?id=112378">Edge of Disgrace</a></td><td></td><td><font size=1>2008</font></td><td><font size=1>C64&nbsp;Demo</font></td></tr>
+<tr><td><a href="/release/?id=72550">Cycle</a></td><td></td><td><font size=1></font></td><td><font size=1>C64&nbsp;One-File&nbsp;Demo</font></td></tr>
+<tr><td colspan=4>Not a release row</td></tr></table>
+</td></tr></table><a href="/footer">Footer</a></body></html>'''
+
+RELEASE = '''<html><body><td valign="top" width="100%">
+<font size=6>Edge of Disgrace</font>
+<table><tr><td><b>Released by :</b><br><a href="/group/?id=1">Booze Design</a></td></tr>
+<tr><td><b>Release Date :</b><br><font color=black>6 April 2008</font></td></tr>
+<tr><td><b>Type :</b><br><a href="/search/?type=1">C64 Demo</a></td></tr>
+<tr><td><b>User rating</b>:</td><td>9.8/10 (1034 votes)</td></tr></table>
+<table id=downloadLinks><tr><td><a href="download.php?id=101">http://csdb.dk/getinternalfile.php/101/edge.d64</a> (downloads: 5000, size: 174848)</td></tr>
+<tr><td><a href="download.php?id=102">http://csdb.dk/getinternalfile.php/102/edge.zip</a></td></tr></table>
+</td></body></html>'''
+
+SEARCH = '''<html><body><td valign="top" width="100%">
+<b>2 release matches:</b><ol><li><a href="/release/?id=112378">Edge of Disgrace</a> (C64 Demo) (2008) by <a href="/group/?id=1">Booze Design</a></li>
+<li><a href="/release/?id=5">Edge</a><br><font size=1>by nobody</font></li></ol>
+<b>1 group match:</b><ol><li><a href="/group/?id=1">Booze Design</a> (Denmark)</li></ol>
+</td></body></html>'''
+
+
+@pytest.fixture(params=['html.parser', 'lxml'])
+def backend(request, monkeypatch):
+    """Run a test with each installed tree builder"""
+    if request.param == 'lxml':
+        pytest.importorskip('lxml')
+    monkeypatch.setattr(csdb_html, 'HTML_BACKEND', request.param)
+    return request.param
+
+
+class TestParseMain:
+    """Test building only the content cell"""
+
+    def test_skips_page_chrome(self, backend):
+        """Test that menus and footer outside the content cell are not built"""
+        main = parse_main(GROUP)
+
+        assert main.find('font').get_text() == 'Booze Design'
+        assert 'Footer' not in main.get_text()
+        assert 'Menu Releases' not in main.get_text()
+
+    def test_missing_content_cell(self, backend):
+        """Test that a page without content cell gives None"""
+        assert parse_main('<html><body><td>Maintenance</td></body></html>') is None
+
+
+class TestSections:
+    """Test the <b> header index"""
+
+    def test_lookups(self):
+        """Test text and single-string lookups in document order"""
+        sections = Sections(parse_main(
+            '<td valign="top" width="100%"><b>Type :</b><b><i>Type</i> of <i>x</i></b>'
+            '<b><font>Released by</font></b></td>'))
+
+        assert sections.first('Type').get_text() == 'Type :'
+        assert len(list(sections.all('Type'))) == 2
+        assert sections.first_string('Released by').get_text() == 'Released by'
+        assert sections.first_string('of') is None
+        assert sections.first('Credits') is None
+
+
+class TestParsers:
+    """Test that the parsers give the same results with every backend"""
+
+    def test_group(self, backend):
+        """Test group details, members and releases"""
+        assert parse_csdb_group_detail(GROUP) == {
+            'name': 'Booze Design',
+            'abbreviation': 'BZD',
+            'creator': 'Admin',
+            'creator_id': '42',
+            'created_on': '12 March 2003',
+            'group_type': 'Demo Group',
+            'country': 'Denmark',
+            'user_rating': None,
+            'votes_needed': '10',
+            'votes_left': '4',
+            'vote_url': '/voteview.php?id=1',
+            'votestat_url': '/votestatistics.php?id=1',
+            'members': [{'id': '8104', 'name': 'HCL', 'status': None, 'roles': 'Coder'},
+                        {'id': '1', 'name': 'Jailbird', 'status': 'ex', 'roles': 'Graphician, Coder'}],
+            'releases': [{'id': '112378', 'title': 'Edge of Disgrace', 'year': '2008', 'type': 'C64 Demo'},
+                         {'id': '72550', 'title': 'Cycle', 'year': '', 'type': 'C64 One-File Demo'}],
+        }
+
+    def test_release(self, backend):
+        """Test release details and download links"""
+        assert parse_csdb_release_detail(RELEASE) == {
+            'name': 'Edge of Disgrace',
+            'groups': [{'id': '1', 'name': 'Booze Design'}],
+            'release_date': '6 April 2008',
+            'type': 'C64 Demo',
+            'user_rating': '9.8/10 (1034 votes)',
+            'files': [{'id': '101', 'name': 'edge.d64', 'downloads': '5000', 'size': 174848},
+                      {'id': '102', 'name': 'edge.zip'}],
+        }
+
+    def test_find(self, backend):
+        """Test search result sections and counts"""
+        result = parse_csdb_find(SEARCH)
+
+        assert result['release_count'] == 2
+        assert result['releases'] == [
+            {'id': '112378', 'text': 'Edge of Disgrace (C64 Demo) (2008) by Booze Design'},
+            {'id': '5', 'text': 'Edge by nobody'}]
+        assert result['groups'] == [{'id': '1', 'text': 'Booze Design (Denmark)'}]
+        assert result['scener_count'] == 0
+        assert list(result) == ['release_count', 'releases', 'group_count', 'groups', 'scener_count',
+                                'sceners', 'bbs_count', 'bbses', 'sid_count', 'sids']
@@ -0,0 +1,106 @@
+"""
+Unit tests for the local CSDB mirror
+"""
+from pathlib import Path
+import pytest
+from csdb_handler import CSDBHandler
+from csdb_mirror import CSDBMirror, fts_query
+
+DUMP = Path(__file__).parent / 'fixtures' / 'csdb_mirror_dump.xml'
+
+
+@pytest.fixture
+def mirror():
+    m = CSDBMirror(':memory:')
+    m.import_xml(str(DUMP))
+    yield m
+    m.close()
+
+
+class TestCSDBMirror:
+    """Test importing and searching the mirror"""
+
+    def test_import_top_level_entities(self, mirror):
+        """Test that every entity of the dump is imported once"""
+        assert len(mirror) == 10
+        # Re-importing replaces entries instead of duplicating them
+        mirror.import_xml(str(DUMP))
+        assert len(mirror) == 10
+
+    def test_search_all_types(self, mirror):
+        """Test that a search returns parse_csdb_find() shaped results per type"""
+        result = mirror.search('edge')
+
+        assert result['release_count'] == 2
+        assert {item['id'] for item in result['releases']} == {'112378', '139233'}
+        assert result['releases'][0]['text'] == 'Edge of Disgrace by Booze Design (2008)'
+        assert result['bbs_count'] == 1
+        assert result['sids'] == [{'id': '40000', 'text': 'Edge of Disgrace by Jeroen Tel'}]
+        assert result['group_count'] == 0
+
+    def test_name_matches_rank_first(self, mirror):
+        """Test that a name match ranks above a match on the releasing group"""
+        result = mirror.search('booze', 'release')
+
+        assert result['release_count'] == 2
+        assert result['releases'][0]['id'] == '72550'
+        assert 'groups' not in result
+
+    def test_paging(self, mirror):
+        """Test that limit and offset page through the ranked matches"""
+        first = mirror.search('demo', 'release', limit=1)
+        second = mirror.search('demo', 'release', limit=1, offset=1)
+
+        assert first['release_count'] == 3
+        assert len(first['releases']) == 1
+        assert first['releases'] != second['releases']
+
+    def test_prefix_and_diacritics(self, mirror):
+        """Test that words match as prefixes, case and accent insensitively"""
+        assert mirror.search('DISGR')['release_count'] == 1
+        assert mirror.search('hcl')['sceners'] == [{'id': '8104', 'text': 'HCL'}]
+        assert mirror.search('óxyron')['group_count'] == 1
+
+    def test_query_syntax_is_inert(self, mirror):
+        """Test that FTS operators in user input do not raise"""
+        assert fts_query('edge" OR *') == '"edge"* "or"*'
+        assert mirror.search('" AND (')['release_count'] == 0
+        assert mirror.search('')['release_count'] == 0
+
+    def test_single_webservice_response(self, tmp_path):
+        """Test that a webservice response with nested references imports only its entity"""
+        response = tmp_path / 'release.xml'
+        response.write_text(
+            '<CSDbData><Release><ID>5</ID><Name>Test</Name>'
+            '<ReleasedBy><Group><ID>9</ID><Name>Nested</Name></Group></ReleasedBy>'
+            '</Release></CSDbData>')
+        m = CSDBMirror(str(tmp_path / 'mirror.db'))
+
+        assert m.import_xml(str(response)) == 1
+        assert m.search('nested')['group_count'] == 0
+        m.close()
+
+
+class TestCSDBHandlerMirror:
+    """Test that find is answered from the mirror"""
+
+    def test_find_uses_mirror(self, mirror):
+        """Test that a mirror hit needs no network request"""
+        handler = CSDBHandler()
+        handler.mirror = mirror
+        handler._get_parsed = lambda *args: pytest.fail("live search used")
+
+        output = handler._format_find_result(handler._find_csdb('coma light'))
+
+        assert output == "1 release matches matches:\n  11589: Coma Light 13 by Oxyron (2008)"
+
+    def test_find_falls_back_to_live_search(self, mirror):
+        """Test that a miss in the mirror scrapes csdb.dk with the entity type"""
+        handler = CSDBHandler()
+        handler.mirror = mirror
+        calls = []
+        handler._get_parsed = lambda kind, key, url, parse: calls.append(key) or {'release_count': 0}
+
+        handler._find_csdb('unknown words', 'release')
+
+        assert calls == ['release unknown words']
@@ -0,0 +1,160 @@
+"""
+Unit tests for cursor paging of CSDB listings
+"""
+import pytest
+import csdb_pager
+from csdb_handler import CSDBHandler
+from csdb_mirror import CSDBMirror
+from shared_state import release_session_state
+
+
+def items(start, stop):
+    return [f"  {i}: Release {i}" for i in range(start, stop)]
+
+
+@pytest.fixture
+def mirror():
+    m = CSDBMirror(':memory:')
+    m.add_many(('release', i, f"Demo {i}", f"Demo {i}", '') for i in range(1, 121))
+    m.add_many([('group', 1, 'Demo Group', 'Demo Group', '')])
+    yield m
+    m.close()
+
+
+class TestPager:
+    """Test rendering pages of a cursor"""
+
+    def test_short_listing_has_no_footer(self):
+        """Test that a listing fitting one screen is rendered as is"""
+        cursor = csdb_pager.new_cursor([csdb_pager.section('3 release matches:', 3, items(0, 3))])
+
+        assert csdb_pager.render(cursor, 0) == "3 release matches:\n  0: Release 0\n  1: Release 1\n  2: Release 2"
+
+    def test_pages_split_sections(self):
+        """Test that pages are one screen each and continue across sections"""
+        cursor = csdb_pager.new_cursor([csdb_pager.section('30 release matches:', 30, items(0, 30)),
+                                        csdb_pager.section('1 group matches:', 1, ['  7: Group'])])
+
+        first = csdb_pager.render(cursor, 0).split('\n')
+        second = csdb_pager.render(cursor, 1).split('\n')
+
+        assert len(first) == csdb_pager.PAGE_LINES
+        assert first[-1] == "-- page 1/2: next, prev, page <n> --"
+        assert second[:-1] == items(23, 30) + ['1 group matches:', '  7: Group']
+        assert cursor['page'] == 1
+
+    def test_items_are_loaded_when_paged_to(self):
+        """Test that only the items of the shown page are loaded, in chunks"""
+        calls = []
+
+        def load(source, offset, limit):
+            calls.append((source['text'], offset, limit))
+            return items(offset, min(offset + limit, 200))
+
+        cursor = csdb_pager.new_cursor([csdb_pager.section('200 release matches:', 200, items(0, 10),
+                                                           {'text': 'demo', 'type': 'release'})])
+
+        csdb_pager.render(cursor, 0, load)
+        assert calls == [('demo', 10, 50)]
+        csdb_pager.render(cursor, 1, load)
+        assert calls == [('demo', 10, 50)]
+        page = csdb_pager.render(cursor, 8, load)
+
+        assert calls[-1] == ('demo', 60, 140)
+        assert page.split('\n')[0] == '  191: Release 191'
+        assert csdb_pager.page_count(cursor) == 9
+
+    def test_unloadable_items_are_counted(self):
+        """Test that a section without a source mentions the items it does not hold"""
+        cursor = csdb_pager.new_cursor([csdb_pager.section('40 release matches:', 40, items(0, 2))])
+
+        assert csdb_pager.render(cursor, 0).endswith("  1: Release 1\n  (and 38 more...)")
+
+
+class TestCSDBHandlerPaging:
+    """Test next/prev/page commands of the handler"""
+
+    def test_find_pages_from_mirror(self, mirror):
+        """Test that paging a mirror find loads further matches without scraping csdb.dk"""
+        handler = CSDBHandler()
+        handler.mirror = mirror
+        handler._get_parsed = lambda *args: pytest.fail("live search used")
+        session_id = 9401
+        try:
+            first = handler.handle('c: find demo', session_id)
+            second = handler.handle('next', session_id)
+            last = handler.handle('page 6', session_id)
+
+            assert first.startswith("120 release matches matches:\n")
+            assert first.endswith("-- page 1/6: next, prev, page <n> --")
+            assert len(second.split('\n')) == csdb_pager.PAGE_LINES
+            assert '1 group matches:' in last
+            assert handler.handle('next', session_id) == "No more pages."
+            assert handler.handle('prev', session_id).endswith("-- page 5/6: next, prev, page <n> --")
+            assert handler.handle('page 9', session_id) == "Usage: page <1-6>"
+        finally:
+            release_session_state(session_id)
+
+    def test_scraped_find_pages_what_it_holds(self):
+        """Test that a scraped find pages through its items without promising more it cannot load"""
+        handler = CSDBHandler()
+        releases = [{'id': str(i), 'name': f"Release {i}"} for i in range(30)]
+        handler._find_csdb = lambda text, entity_type=None: {'release_count': 219, 'releases': releases}
+        session_id = 9404
+        try:
+            first = handler.handle('c: find release', session_id)
+            second = handler.handle('next', session_id)
+
+            assert first.startswith("219 release matches matches:\n  0: Release 0")
+            assert first.endswith("-- page 1/2: next, prev, page <n> --")
+            assert second.split('\n')[-2] == "  29: Release 29"
+            assert 'more...' not in second
+        finally:
+            release_session_state(session_id)
+
+    def test_find_in_directory_pages_from_mirror(self):
+        """Test that find in a directory loads further items with the directory's entity type"""
+        m = CSDBMirror(':memory:')
+        m.add_many(('bbs', i, f"Pier {i}", f"Pier {i}", '') for i in range(1, 61))
+        handler = CSDBHandler()
+        handler.mirror = m
+        handler._get_parsed = lambda *args: pytest.fail("live search used")
+        session_id = 9405
+        try:
+            handler.handle('c: cd bbs', session_id)
+            first = handler.handle('find pier', session_id)
+            last = handler.handle('page 3', session_id)
+
+            assert first.startswith("60 bbs matches:\n")
+            assert first.endswith("-- page 1/3: next, prev, page <n> --")
+            assert len(last.split('\n')) == 60 + 1 - 2 * (csdb_pager.PAGE_LINES - 1) + 1
+        finally:
+            release_session_state(session_id)
+            m.close()
+
+    def test_group_releases_are_paged(self):
+        """Test that a group with many releases is shown one screen at a time"""
+        handler = CSDBHandler()
+        releases = [{'id': str(i), 'title': f"Release {i}", 'year': '1990', 'type': 'C64 Demo'} for i in range(60)]
+        handler._get_parsed_group_info = lambda group_id: {'name': 'Booze Design', 'releases': releases}
+        session_id = 9402
+        try:
+            first = handler.handle('c: group 1', session_id)
+            handler.handle('next', session_id)
+            third = handler.handle('next', session_id)
+
+            assert first.startswith("Booze Design\n\nReleases: (60)\n0      Release 0 (1990) [C64 Demo]")
+            assert first.endswith("-- page 1/3: next, prev, page <n> --")
+            assert "59     Release 59 (1990) [C64 Demo]" in third
+        finally:
+            release_session_state(session_id)
+
+    def test_nothing_to_page(self):
+        """Test that paging without a listing explains what to do"""
+        handler = CSDBHandler()
+        session_id = 9403
+        try:
+            handler.handle('c:', session_id)
+            assert handler.handle('next', session_id) == "Nothing to page. Use find or cd <id> first."
+        finally:
+            release_session_state(session_id)
@@ -0,0 +1,169 @@
+"""
+Unit tests for the streaming CSDB webservice XML reader
+"""
+from csdb_handler import CSDBHandler
+from csdb_group_parser import parse_csdb_group_detail
+from csdb_release_parser import parse_csdb_release_detail
+from csdb_xml import (event_from_xml, format_entity, parse_group_xml, parse_release_xml, read_entity,
+                      scener_from_xml)
+from http_cache import HTTPCache
+from parsed_cache import ParsedCache
+
+RELEASE_XML = '''<?xml version="1.0" encoding="ISO-8859-1"?>
+<CSDbData><Release><ID>112378</ID><Name>Edge of Disgrace</Name><Type>C64 Demo</Type>
+<ReleaseDay>6</ReleaseDay><ReleaseMonth>4</ReleaseMonth><ReleaseYear>2008</ReleaseYear>
+<ReleasedAt><Event><ID>1503</ID><Name>Breakpoint 2008</Name></Event></ReleasedAt>
+<Rating>9.8</Rating>
+<ReleasedBy><Group><ID>1</ID><Name>Booze Design</Name></Group></ReleasedBy>
+<DownloadLinks><DownloadLink><ID>99</ID><Link>http://csdb.dk/getinternalfile.php/99/edge.zip</Link>
+<Downloads>5000</Downloads></DownloadLink></DownloadLinks>
+</Release></CSDbData>'''
+
+
+def group_xml(releases: int) -> str:
+    """Depth 4 group document; every release repeats its own references"""
+    items = ''.join(
+        f"<Release><ID>{i}</ID><Name>Release {i}</Name><Type>C64 Demo</Type><ReleaseYear>1990</ReleaseYear>"
+        f"<ReleasedBy><Group><ID>1</ID><Name>Booze Design</Name></Group></ReleasedBy></Release>"
+        for i in range(releases))
+    return ('<CSDbData><Group><ID>1</ID><Name>Booze Design</Name><Type>Demo Group</Type>'
+            '<BaseCountry>Denmark</BaseCountry>'
+            '<Members><Member><Handle><ID>8</ID><Handle>HCL</Handle></Handle><Role>Coder</Role></Member></Members>'
+            f'{items}</Group></CSDbData>')
+
+
+RELEASE_PAGE = '''<html><body><td valign="top" width="100%">
+<font size=6>Edge of Disgrace</font>
+<table><tr><td><b>Released by :</b><br><a href="/group/?id=1">Booze Design</a></td></tr>
+<tr><td><b>Type :</b><br><a href="/search/?type=1">C64 Demo</a></td></tr>
+<tr><td><b>User rating</b>:</td><td>9.8/10 (1034 votes)</td></tr></table>
+<table id=downloadLinks><tr><td><a href="download.php?id=99">http://csdb.dk/getinternalfile.php/99/edge.zip</a>
+ (downloads: 5000)</td></tr></table>
+</td></body></html>'''
+
+# RELEASE_PAGE as webservice XML: no release date, like the page
+RELEASE_PAGE_XML = '''<CSDbData><Release><ID>112378</ID><Name>Edge of Disgrace</Name><Type>C64 Demo</Type>
+<Rating>9.8</Rating><Votes>1034</Votes>
+<ReleasedBy><Group><ID>1</ID><Name>Booze Design</Name></Group></ReleasedBy>
+<DownloadLinks><DownloadLink><ID>99</ID><Link>http://csdb.dk/getinternalfile.php/99/edge.zip</Link>
+<Downloads>5000</Downloads></DownloadLink></DownloadLinks>
+</Release></CSDbData>'''
+
+GROUP_PAGE = '''<html><body><td valign="top" width="100%">
+<font size=6>Booze Design</font> (BZD)<br>
+<table><tr><td><b>Group Type :</b></td><td><a href="/search/?grouptype=1">Demo Group</a></td></tr>
+<tr><td><b>Base Country :</b></td><td><a href="/search/?country=dk">Denmark</a></td></tr></table>
+<b>All Members :</b>
+<table><tr><td><a href="/scener/?id=8">HCL</a></td><td>&nbsp;</td><td>Coder</td></tr></table>
+<b>Releases :</b>
+<table><tr><td><a href="/release/?id=112378">Edge of Disgrace</a></td><td></td><td><font size=1>2008</font></td>
+<td><font size=1>C64&nbsp;Demo</font></td></tr></table>
+</td></body></html>'''
+
+GROUP_PAGE_XML = ('<CSDbData><Group><ID>1</ID><Name>Booze Design</Name><Abbreviation>BZD</Abbreviation>'
+                  '<Type>Demo Group</Type><BaseCountry>Denmark</BaseCountry>'
+                  '<Members><Member><Handle><ID>8</ID><Handle>HCL</Handle></Handle><Role>Coder</Role></Member></Members>'
+                  '<Release><ID>112378</ID><Name>Edge of Disgrace</Name><Type>C64 Demo</Type>'
+                  '<ReleaseYear>2008</ReleaseYear></Release></Group></CSDbData>')
+
+
+class TestReadEntity:
+    """Test fields and reference records of streamed entities"""
+
+    def test_release_detail(self):
+        """Test that a release has the shape of the HTML parser result"""
+        assert parse_release_xml(RELEASE_XML) == {
+            'name': 'Edge of Disgrace',
+            'groups': [{'id': '1', 'name': 'Booze Design'}],
+            'release_date': '6 April 2008',
+            'type': 'C64 Demo',
+            'user_rating': '9.8/10',
+            'files': [{'id': '99', 'name': 'edge.zip', 'downloads': '5000'}],
+        }
+
+    def test_group_streamed_in_chunks(self):
+        """Test that a large group read chunk by chunk keeps nested references out of its lists"""
+        xml = group_xml(2000).encode()
+        chunks = (xml[i:i + 100] for i in range(0, len(xml), 100))
+
+        entity = read_entity(chunks, 'group')
+        detail = parse_group_xml(xml.decode())
+
+        assert len(entity.records('Release')) == 2000
+        assert entity.records('Release')[5] == {
+            'ID': '5', 'Name': 'Release 5', 'Type': 'C64 Demo', 'ReleaseYear': '1990'}
+        assert detail['country'] == 'Denmark'
+        assert detail['members'] == [{'id': '8', 'name': 'HCL', 'status': None, 'roles': 'Coder'}]
+        assert detail['releases'][0] == {'id': '0', 'title': 'Release 0', 'year': '1990', 'type': 'C64 Demo'}
+
+    def test_missing_fields_are_none(self):
+        """Test that fields the webservice lacks are None, as in the HTML parser result"""
+        release = parse_release_xml('<CSDbData><Release><ID>1</ID><Name>X</Name></Release></CSDbData>')
+        group = parse_group_xml('<CSDbData><Group><ID>1</ID><Name>G</Name>'
+                                '<Release><ID>2</ID><Name>Y</Name></Release></Group></CSDbData>')
+
+        assert release['release_date'] is None
+        assert release['type'] is None
+        assert group['releases'] == [{'id': '2', 'title': 'Y', 'year': None, 'type': None}]
+        assert group['creator'] is None
+
+    def test_scener_and_event_models(self):
+        """Test that scener and event models are filled from their entities"""
+        scener = read_entity('<CSDbData><Scener><ID>8</ID><Handle><ID>8</ID><Handle>HCL</Handle></Handle>'
+                             '<RealName>Jon</RealName><Groups><Group><ID>1</ID><Name>Booze Design</Name></Group>'
+                             '</Groups></Scener></CSDbData>', 'scener')
+        event = read_entity('<CSDbData><Event><Name>X 2008</Name><StartDay>3</StartDay><StartMonth>10</StartMonth>'
+                            '<StartYear>2008</StartYear></Event></CSDbData>', 'event')
+
+        assert scener_from_xml(scener).model_dump() == {
+            'handle': 'HCL', 'real_name': 'Jon', 'groups': ['Booze Design']}
+        assert event_from_xml(event).model_dump() == {
+            'name': 'X 2008', 'start_date': '3 October 2008', 'end_date': None}
+
+    def test_missing_entity_and_bad_xml(self):
+        """Test that responses without the entity or with broken XML are errors"""
+        assert read_entity('<CSDbData></CSDbData>', 'bbs') is None
+        assert 'error' in parse_release_xml('<CSDbData><Group><Name>x</Name></Group></CSDbData>')
+        assert 'error' in parse_group_xml('<html><body>Oops')
+
+    def test_generic_entity(self):
+        """Test that entities without a dedicated formatter list their fields and references"""
+        entity = read_entity('<CSDbData><BBS><ID>3</ID><Name>The Pier</Name><Sysops><Handle><ID>4</ID>'
+                             '<Handle>Jack</Handle></Handle></Sysops></BBS></CSDbData>', 'bbs')
+
+        assert format_entity(entity) == "Name: The Pier\nSysops: Jack"
+
+
+class TestCSDBHandlerXML:
+    """Test that the handler reads entity details from the webservice"""
+
+    def test_release_from_webservice(self, page_session):
+        """Test that release info comes from the XML, not the HTML page"""
+        handler = CSDBHandler()
+        handler.http_cache = HTTPCache(page_session(RELEASE_XML.encode('latin-1')))
+        handler.parsed_cache = ParsedCache()
+
+        output = handler._get_entry_info('release', 112378, session_id=9301)
+
+        assert output.startswith("Release: Edge of Disgrace\nReleased by: 1 Booze Design\n")
+        assert "99 edge.zip (5000 d/l)" in output
+
+    def test_bbs_listing(self, page_session):
+        """Test that entity types without a formatter are listed"""
+        handler = CSDBHandler()
+        handler.http_cache = HTTPCache(page_session(b'<CSDbData><BBS><ID>3</ID><Name>The Pier</Name></BBS></CSDbData>'))
+
+        assert handler._get_entry_info('bbs', 3, session_id=9302) == "Name: The Pier"
+
+    def test_xml_and_html_render_alike(self, page_session):
+        """Test that an entity shows the same text whether it came from the XML or the HTML page"""
+        def render(entry_type, body):
+            handler = CSDBHandler()
+            handler.http_cache = HTTPCache(page_session(body.encode('utf-8')))
+            handler.parsed_cache = ParsedCache()
+            return handler._get_entry_info(entry_type, 1, session_id=9303)
+
+        assert parse_release_xml(RELEASE_PAGE_XML) == parse_csdb_release_detail(RELEASE_PAGE)
+        assert parse_group_xml(GROUP_PAGE_XML) == parse_csdb_group_detail(GROUP_PAGE)
+        assert render('release', RELEASE_PAGE_XML) == render('release', RELEASE_PAGE)
+        assert render('group', GROUP_PAGE_XML) == render('group', GROUP_PAGE)
@@ -0,0 +1,159 @@
+"""
+Unit tests for the content-addressed download store
+"""
+import os
+import threading
+import pytest
+from download_store import DownloadStore
+
+
+def writer(body: bytes, calls: list = None, gate: threading.Event = None):
+    """Download function writing a fixed body"""
+    def download(dest):
+        if calls is not None:
+            calls.append(dest)
+        if gate is not None:
+            gate.wait(5)
+        dest.write_bytes(body)
+        return len(body)
+    return download
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    s = DownloadStore(str(tmp_path / 'store'), quota_bytes=1000, clock=clock)
+    yield s
+    s.close()
+
+
+class TestDownloadStore:
+    """Test blob sharing, session views, quota and persistence"""
+
+    def test_downloads_once(self, store):
+        """Test that a stored file is served without downloading again"""
+        calls = []
+        first = store.fetch(1, 'demo.prg', writer(b'demo', calls))
+        second = store.fetch(1, 'demo.prg', writer(b'other', calls))
+
+        assert first == second
+        assert first.read_bytes() == b'demo'
+        assert len(calls) == 1
+        assert not os.access(first, os.W_OK) or os.geteuid() == 0
+        assert store.stats()['hits'] == 1
+        assert store.stats()['misses'] == 1
+
+    def test_same_content_shares_blob(self, store):
+        """Test that two file ids with the same content share one blob"""
+        a = store.fetch(1, 'a.prg', writer(b'same'))
+        b = store.fetch(2, 'b.prg', writer(b'same'))
+
+        assert a == b
+        assert store.stats()['bytes'] == 4
+
+    def test_concurrent_fetches_share_download(self, store):
+        """Test that sessions fetching the same file at once cause one download"""
+        calls, gate = [], threading.Event()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            store.fetch(7, 'x.d64', writer(b'disk', calls, gate)))) for _ in range(4)]
+        for t in threads:
+            t.start()
+        while not calls:
+            threading.Event().wait(0.01)
+        gate.set()
+        for t in threads:
+            t.join(5)
+
+        assert len(calls) == 1
+        assert len(set(results)) == 1
+
+    def test_session_views_are_separate(self, store):
+        """Test that same-named files of two sessions do not overwrite each other"""
+        one = store.link_into_session(1, store.fetch(1, 'demo.prg', writer(b'one')), 'demo.prg')
+        two = store.link_into_session(2, store.fetch(2, 'demo.prg', writer(b'two')), 'demo.prg')
+
+        assert one.read_bytes() == b'one'
+        assert two.read_bytes() == b'two'
+
+        store.release_session(1)
+        assert not one.exists()
+        assert two.exists()
+
+    def test_session_dirs_are_unique_per_store(self, store, tmp_path):
+        """Test that equal session ids of two processes or runs get separate directories"""
+        other = DownloadStore(str(tmp_path / 'store'))
+        try:
+            assert store.session_dir(1) != other.session_dir(1)
+            # Opening a store keeps the directories of live processes
+            assert store.session_dir(1).exists()
+        finally:
+            other.close()
+
+    def test_stale_session_dirs_are_removed(self, store, tmp_path):
+        """Test that session directories of earlier runs and ended processes are removed on open"""
+        sessions = tmp_path / 'store' / 'sessions'
+        for name in ('1', f"oldnonce-{os.getpid()}-1", f"oldnonce-{2 ** 22 + 1}-1", f"nonce-{os.getppid()}-1"):
+            (sessions / name).mkdir()
+
+        DownloadStore(str(tmp_path / 'store')).close()
+
+        assert [p.name for p in sessions.iterdir()] == [f"nonce-{os.getppid()}-1"]
+
+    def test_quota_enforced_while_sessions_are_live(self, store, clock):
+        """Test that blobs linked into live sessions are evicted and the sessions keep their copies"""
+        for file_id in range(1, 6):
+            blob = store.fetch(file_id, f'file{file_id}', writer(bytes([file_id]) * 400))
+            store.link_into_session(file_id, blob, f'file{file_id}')
+            clock.now += 1
+
+        assert store.stats()['bytes'] <= 1000
+        assert store.stats()['evictions'] == 3
+        assert store.get(1) is None and store.get(5) is not None
+        assert (store.session_dir(1) / 'file1').read_bytes() == b'\x01' * 400
+
+    def test_link_of_evicted_blob_fails(self, store):
+        """Test that linking a blob evicted since it was fetched raises instead of linking nothing"""
+        blob = store.fetch(1, 'old', writer(b'a' * 600))
+        store.fetch(2, 'new', writer(b'b' * 600))
+
+        with pytest.raises(FileNotFoundError):
+            store.link_into_session(1, blob, 'old')
+        assert not (store.session_dir(1) / 'old').exists()
+
+    def test_quota_evicts_least_recently_used(self, store, clock):
+        """Test that going over quota removes the least recently used blob"""
+        old = store.fetch(1, 'old', writer(b'a' * 400))
+        clock.now += 1
+        used = store.fetch(2, 'used', writer(b'b' * 400))
+        clock.now += 1
+        store.fetch(1, 'old', writer(b'unused'))  # refreshes file 1
+        clock.now += 1
+        store.fetch(3, 'new', writer(b'c' * 400))
+
+        assert old.exists()
+        assert not used.exists()
+        assert store.stats()['evictions'] == 1
+        assert store.stats()['bytes'] == 800
+
+    def test_index_survives_restart(self, store, tmp_path, clock):
+        """Test that a reopened store serves files downloaded before"""
+        blob = store.fetch(1, 'demo.prg', writer(b'demo'))
+        store.close()
+
+        reopened = DownloadStore(str(tmp_path / 'store'), quota_bytes=1000, clock=clock)
+        try:
+            assert reopened.fetch(1, 'demo.prg', writer(b'', calls=None)) == blob
+            assert reopened.stats()['hits'] == 1
+        finally:
+            reopened.close()
+
+    def test_failed_download_leaves_nothing(self, store):
+        """Test that a failing download is not indexed and leaves no temp file"""
+        def failing(dest):
+            dest.write_bytes(b'partial')
+            raise OSError("connection lost")
+
+        with pytest.raises(OSError):
+            store.fetch(1, 'demo.prg', failing)
+        assert store.stats()['blobs'] == 0
+        assert os.listdir(store.root / 'tmp') == []
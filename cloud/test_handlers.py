@@ -32,6 +32,15 @@ class TestBaseHandler:
         expected = bytes([0xC8, 0xC5, 0xCC, 0xCC, 0xCF])
         assert petscii_bytes == expected
 
+    def test_utf8_to_petscii_unicode_fallback(self):
+        """Test that non-ASCII LLM output is approximated instead of failing"""
+        petscii_bytes = BaseHandler.utf8_to_petscii("caf\u00e9 \u201cok\u201d \u2014 1\u20262 \u65e5")
+        assert BaseHandler.petscii_to_utf8(petscii_bytes) == 'cafe "ok" - 1...2 ?'
+
+    def test_petscii_to_utf8_non_ascii_bytes(self):
+        """Test that PETSCII graphics bytes decode to the replacement character"""
+        assert BaseHandler.petscii_to_utf8(bytes([0x48, 0xA0, 0x49])) == "h\ufffdi"
+
 
 class TestHelpHandler:
     """Test HelpHandler"""
@@ -147,6 +156,55 @@ class TestCSDBHandler:
         response = handler.handle("c:")
         assert "csdb mode" in response.lower() or "query" in response.lower()
 
+    def test_commands_hold_session_lock(self):
+        """Test that a command waits while another thread holds its session's lock"""
+        import threading
+        from shared_state import release_session_state, session_lock
+        handler = CSDBHandler()
+        session_id = 9601
+        responses = []
+        try:
+            with session_lock(session_id):
+                worker = threading.Thread(target=lambda: responses.append(handler.handle("c:", session_id)))
+                worker.start()
+                worker.join(0.2)
+                assert responses == []
+            worker.join(5)
+            assert responses == ["CSDB mode"]
+        finally:
+            release_session_state(session_id)
+
+    def test_fetch_runs_outside_session_lock(self):
+        """Test that the session lock is free while a command waits on the network"""
+        import threading
+        from shared_state import get_session_state, release_session_state, session_lock
+        handler = CSDBHandler()
+        session_id = 9602
+        fetching, unblock = threading.Event(), threading.Event()
+
+        def slow_release_info(release_id):
+            fetching.set()
+            unblock.wait(5)
+            return {'error': 'offline'}
+
+        handler._get_parsed_release_info = slow_release_info
+        get_session_state(session_id).update(active_module='c', active_dir='release')
+        responses = []
+        try:
+            worker = threading.Thread(target=lambda: responses.append(handler.handle("cd 42", session_id)))
+            worker.start()
+            assert fetching.wait(5)
+            acquired = session_lock(session_id).acquire(timeout=1)
+            assert acquired
+            assert get_session_state(session_id)['active_id'] == 42
+            session_lock(session_id).release()
+            unblock.set()
+            worker.join(5)
+            assert len(responses) == 1
+        finally:
+            unblock.set()
+            release_session_state(session_id)
+
     def test_help_response(self):
         """Test CSDB help for general query"""
         handler = CSDBHandler()
@@ -304,6 +362,214 @@ class TestRequestDispatcher:
         # Should get empty or minimal response
         assert len(response) > 0
 
+    def test_routes_by_prefix_and_active_module(self):
+        """Test that prefixes win over the session's active module"""
+        from cloud_server import RequestDispatcher
+        from shared_state import get_session_state, release_session_state
+
+        dispatcher = RequestDispatcher()
+        session_id = 9001
+        try:
+            assert isinstance(dispatcher._find_handler("  HELP me", session_id), HelpHandler)
+            assert isinstance(dispatcher._find_handler("C: find x", session_id), CSDBHandler)
+            assert dispatcher._find_handler("ls", session_id) is None
+
+            get_session_state(session_id)['active_module'] = 'c'
+            assert isinstance(dispatcher._find_handler("ls", session_id), CSDBHandler)
+            assert isinstance(dispatcher._find_handler("? 1", session_id), PythonEvalHandler)
+            assert isinstance(dispatcher._find_handler("i: hi", session_id), ChatHandler)
+
+            get_session_state(session_id)['active_module'] = 'i'
+            assert isinstance(dispatcher._find_handler("hi", session_id), ChatHandler)
+        finally:
+            release_session_state(session_id)
+
+    def test_routes_declared_prefixes(self):
+        """Test that a handler is routed by the prefixes it declares"""
+        from cloud_server import RequestDispatcher
+
+        class EchoHandler(BaseHandler):
+            prefixes = ("echo", "e:")
+
+            def can_handle(self, text, session_id=0):
+                return False
+
+            def handle(self, text, session_id=0):
+                return text
+
+        dispatcher = RequestDispatcher()
+        echo = EchoHandler()
+        dispatcher.handlers.append(echo)
+        dispatcher._build_routes()
+
+        assert dispatcher._find_handler("Echo hello", 0) is echo
+        assert dispatcher._find_handler("e: hello", 0) is echo
+        assert isinstance(dispatcher._find_handler("help", 0), HelpHandler)
+
+    def test_slow_handler_answers_busy(self):
+        """Test that a handler missing its deadline gets a busy answer and is counted"""
+        import threading
+        from cloud_server import RequestDispatcher
+
+        release = threading.Event()
+
+        class SlowHandler(BaseHandler):
+            prefixes = ("slow",)
+            timeout = 0.1
+            max_workers = 1
+            max_queue = 0
+
+            def can_handle(self, text, session_id=0):
+                return False
+
+            def handle(self, text, session_id=0):
+                release.wait(5)
+                return "done"
+
+        dispatcher = RequestDispatcher()
+        dispatcher.handlers.insert(0, SlowHandler())
+        dispatcher._build_routes()
+        request = BaseHandler.utf8_to_petscii("slow") + b'\x00'
+        busy = BaseHandler.utf8_to_petscii(RequestDispatcher.BUSY_MESSAGE)
+
+        try:
+            assert dispatcher.dispatch(request) == busy
+            # The hung request still holds the only slot
+            assert dispatcher.dispatch(request) == busy
+            stats = dispatcher.stats()['SlowHandler']
+            assert stats['timed_out'] == 1
+            assert stats['rejected'] == 1
+            assert stats['pending'] == 1
+        finally:
+            release.set()
+
+        # Other handlers are not affected
+        response = dispatcher.dispatch(BaseHandler.utf8_to_petscii("? 1+1") + b'\x00')
+        assert b"2" in response
+
+    def test_budget_overrides(self):
+        """Test that budgets passed to the dispatcher override handler defaults"""
+        from cloud_server import RequestDispatcher
+
+        dispatcher = RequestDispatcher(budgets={'PythonEvalHandler': {'timeout': 1.5, 'max_queue': 2}})
+        dispatcher.dispatch(BaseHandler.utf8_to_petscii("? 1") + b'\x00')
+
+        stats = dispatcher.stats()['PythonEvalHandler']
+        assert stats['timeout'] == 1.5
+        assert stats['max_queue'] == 2
+        assert stats['max_workers'] == PythonEvalHandler.max_workers
+        assert stats['submitted'] == 1
+
+    def test_slow_stream_chunk_answers_busy(self):
+        """Test that the deadline applies to each streamed chunk"""
+        import threading
+        from cloud_server import RequestDispatcher
+
+        release = threading.Event()
+
+        class SlowStreamHandler(BaseHandler):
+            prefixes = ("slow",)
+            timeout = 0.1
+
+            def can_handle(self, text, session_id=0):
+                return False
+
+            def handle(self, text, session_id=0):
+                return "".join(self.handle_stream(text, session_id))
+
+            def handle_stream(self, text, session_id=0):
+                yield "first "
+                release.wait(5)
+                yield "second"
+
+        dispatcher = RequestDispatcher()
+        dispatcher.handlers.insert(0, SlowStreamHandler())
+        dispatcher._build_routes()
+
+        try:
+            chunks = list(dispatcher.dispatch_stream(BaseHandler.utf8_to_petscii("slow") + b'\x00'))
+        finally:
+            release.set()
+
+        assert chunks == [BaseHandler.utf8_to_petscii("first "),
+                          BaseHandler.utf8_to_petscii(RequestDispatcher.BUSY_MESSAGE)]
+
+    def test_progress_runs_on_handler_pool(self):
+        """Test that progress is streamed from the pool worker running the request"""
+        import threading
+        from cloud_server import RequestDispatcher
+
+        class ProgressHandler(BaseHandler):
+            prefixes = ("progress",)
+            reports_progress = True
+
+            def can_handle(self, text, session_id=0):
+                return False
+
+            def handle(self, text, session_id=0):
+                return "done"
+
+            def handle_progress(self, text, session_id, progress):
+                progress(f"{threading.current_thread().name}\n")
+                return self.handle(text, session_id)
+
+        dispatcher = RequestDispatcher()
+        dispatcher.handlers.insert(0, ProgressHandler())
+        dispatcher._build_routes()
+
+        chunks = list(dispatcher.dispatch_stream(BaseHandler.utf8_to_petscii("progress") + b'\x00'))
+
+        assert chunks[-1] == BaseHandler.utf8_to_petscii("done")
+        assert BaseHandler.petscii_to_utf8(chunks[0]).startswith("handler-ProgressHandler")
+        assert dispatcher.stats()['ProgressHandler']['submitted'] == 1
+
+    def test_slow_progress_is_cancelled(self):
+        """Test that a request missing its progress deadline answers busy and is cancelled"""
+        import threading
+        import time
+        from cloud_server import RequestDispatcher
+        from handler_pool import RequestCancelledError
+
+        release = threading.Event()
+        outcome = []
+
+        class SlowProgressHandler(BaseHandler):
+            prefixes = ("slow",)
+            reports_progress = True
+            timeout = 0.1
+
+            def can_handle(self, text, session_id=0):
+                return False
+
+            def handle(self, text, session_id=0):
+                return "done"
+
+            def handle_progress(self, text, session_id, progress):
+                progress("first\n")
+                release.wait(5)
+                try:
+                    progress("second\n")
+                except RequestCancelledError:
+                    outcome.append('cancelled')
+                    raise
+                return "done"
+
+        dispatcher = RequestDispatcher()
+        dispatcher.handlers.insert(0, SlowProgressHandler())
+        dispatcher._build_routes()
+
+        chunks = list(dispatcher.dispatch_stream(BaseHandler.utf8_to_petscii("slow") + b'\x00'))
+        release.set()
+        for _ in range(20):
+            if dispatcher.stats()['SlowProgressHandler']['pending'] == 0:
+                break
+            time.sleep(0.05)
+
+        assert chunks == [BaseHandler.utf8_to_petscii("first\n"),
+                          BaseHandler.utf8_to_petscii(RequestDispatcher.BUSY_MESSAGE)]
+        assert outcome == ['cancelled']
+        assert dispatcher.stats()['SlowProgressHandler']['timed_out'] == 1
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,162 @@
+"""
+Unit tests for the CSDB HTTP response cache
+"""
+import pytest
+import requests
+from http_cache import HTTPCache
+
+
+class FakeSession:
+    """Session returning queued responses and recording request headers"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def queue(self, status=200, body=b'<html>page</html>', headers=None):
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = body
+        resp.encoding = 'utf-8'
+        resp.headers.update(headers or {})
+        self.responses.append(resp)
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        result.url = url
+        return result
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+
+URL = 'https://csdb.dk/release/?id=1'
+
+
+class TestHTTPCache:
+    """Test caching, revalidation and stale fallback"""
+
+    def test_fresh_entry_is_served_from_memory(self, session, clock):
+        """Test that a page within its TTL is not fetched again"""
+        cache = HTTPCache(session, ttls={'release': 60}, clock=clock)
+        session.queue(body=b'first')
+
+        assert cache.get(URL, kind='release').text == 'first'
+        clock.now += 30
+        assert cache.get(URL, kind='release').text == 'first'
+
+        assert len(session.requests) == 1
+        assert cache.stats()['misses'] == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_expired_entry_is_revalidated(self, session, clock):
+        """Test that an expired page is revalidated with its validators"""
+        cache = HTTPCache(session, ttls={'release': 60}, clock=clock)
+        session.queue(body=b'first', headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        cache.get(URL, kind='release')
+
+        clock.now += 61
+        session.queue(status=304)
+        entry = cache.get(URL, kind='release')
+
+        assert entry.text == 'first'
+        assert session.requests[1][1] == {
+            'If-None-Match': '"v1"',
+            'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT',
+        }
+        assert cache.stats()['revalidated'] == 1
+
+        # Revalidation restarts the TTL
+        clock.now += 30
+        cache.get(URL, kind='release')
+        assert len(session.requests) == 2
+
+    def test_changed_entry_is_replaced(self, session, clock):
+        """Test that a revalidation returning a new page replaces the entry"""
+        cache = HTTPCache(session, ttls={'find': 10}, clock=clock)
+        session.queue(body=b'old', headers={'ETag': '"v1"'})
+        cache.get(URL, kind='find')
+
+        clock.now += 11
+        session.queue(body=b'new', headers={'ETag': '"v2"'})
+
+        assert cache.get(URL, kind='find').text == 'new'
+        assert cache.get(URL, kind='find').etag == '"v2"'
+
+    def test_stale_entry_served_when_site_is_down(self, session, clock):
+        """Test that the old copy is served when the site cannot be reached"""
+        cache = HTTPCache(session, ttls={'release': 60}, clock=clock)
+        session.queue(body=b'cached')
+        cache.get(URL, kind='release')
+
+        clock.now += 61
+        session.responses.append(requests.ConnectionError('down'))
+        entry = cache.get(URL, kind='release')
+        assert entry.text == 'cached'
+        assert entry.stale
+
+        clock.now += 1
+        session.queue(status=503)
+        assert cache.get(URL, kind='release').text == 'cached'
+        assert cache.stats()['stale'] == 2
+
+    def test_missing_page_is_not_served_stale(self, session, clock):
+        """Test that a 404 on revalidation is raised instead of serving the old copy"""
+        cache = HTTPCache(session, ttls={'release': 60}, clock=clock)
+        session.queue(body=b'cached')
+        cache.get(URL, kind='release')
+
+        clock.now += 61
+        session.queue(status=404)
+        with pytest.raises(requests.HTTPError):
+            cache.get(URL, kind='release')
+
+    def test_error_without_cached_copy_is_raised(self, session, clock):
+        """Test that a failed first fetch raises and is counted"""
+        cache = HTTPCache(session, clock=clock)
+        session.responses.append(requests.ConnectionError('down'))
+
+        with pytest.raises(requests.ConnectionError):
+            cache.get(URL)
+        assert cache.stats()['errors'] == 1
+
+    def test_params_are_part_of_the_key(self, session, clock):
+        """Test that query parameters select different entries"""
+        cache = HTTPCache(session, clock=clock)
+        session.queue(body=b'one')
+        session.queue(body=b'two')
+
+        assert cache.get('https://csdb.dk/webservice/', params={'id': 1}).text == 'one'
+        assert cache.get('https://csdb.dk/webservice/', params={'id': 2}).text == 'two'
+        assert session.requests[0][0] == 'https://csdb.dk/webservice/?id=1'
+
+    def test_disk_store_survives_restart(self, session, clock, tmp_path):
+        """Test that a new cache instance finds pages stored by an earlier one"""
+        cache = HTTPCache(session, cache_dir=str(tmp_path), ttls={'group': 60}, clock=clock)
+        session.queue(body=b'group page', headers={'ETag': '"g"'})
+        cache.get(URL, kind='group')
+        cache.close()
+
+        reopened = HTTPCache(session, cache_dir=str(tmp_path), ttls={'group': 60}, clock=clock)
+        entry = reopened.get(URL, kind='group')
+
+        assert entry.text == 'group page'
+        assert entry.etag == '"g"'
+        assert len(session.requests) == 1
+        reopened.close()
+
+    def test_memory_lru_is_bounded(self, session, clock):
+        """Test that the least recently used pages leave memory first"""
+        cache = HTTPCache(session, max_memory_bytes=10, clock=clock)
+        for i in range(3):
+            session.queue(body=b'12345')
+            cache.get(f'{URL}{i}')
+
+        stats = cache.stats()
+        assert stats['entries'] == 2
+        assert stats['memory_bytes'] == 10
@@ -0,0 +1,267 @@
+"""
+Unit tests for the resilient HTTP client
+"""
+import gzip
+import io
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from http_client import (CircuitBreaker, CircuitOpenError, DNSCache, HTTPXAdapter, ResilientSession,
+                         SharedHTTPAdapter, get_http_session)
+
+
+class ScriptedSession(ResilientSession):
+    """ResilientSession whose transport answers from a script of statuses and exceptions"""
+
+    def __init__(self, script, **kwargs):
+        super().__init__(sleep=self.record_sleep, **kwargs)
+        self.script = list(script)
+        self.sent = []
+        self.sleeps = []
+
+    def record_sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+    def send(self, request, **kwargs):
+        self.sent.append((request.method, kwargs.get('timeout')))
+        outcome = self.script.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        resp = requests.Response()
+        resp.status_code = outcome
+        resp.url = request.url
+        resp.request = request
+        resp.raw = io.BytesIO(b'ok')
+        return resp
+
+
+class TestCircuitBreaker:
+    """Test opening, half-open trials and closing"""
+
+    def test_opens_on_failure_rate(self, clock):
+        """Test that the breaker opens once enough of the window failed"""
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, clock=clock)
+        for success in (True, False, True):
+            breaker.record(success)
+        assert breaker.state == 'closed'
+
+        breaker.record(False)
+
+        assert breaker.state == 'open'
+        assert not breaker.allow()
+        assert breaker.stats()['rejected'] == 1
+
+    def test_half_open_trial(self, clock):
+        """Test that one trial request closes or reopens the breaker"""
+        breaker = CircuitBreaker(min_calls=1, reset_timeout=30, clock=clock)
+        breaker.record(False)
+        clock.now += 30
+
+        assert breaker.allow()
+        assert not breaker.allow()  # only one trial at a time
+        breaker.record(False)
+        assert breaker.state == 'open'
+
+        clock.now += 30
+        assert breaker.allow()
+        breaker.record(True)
+        assert breaker.state == 'closed'
+        assert breaker.stats()['opened'] == 2
+
+
+class TestResilientSession:
+    """Test timeouts, retries and fail-fast behaviour"""
+
+    def test_default_timeout(self):
+        """Test that requests without a timeout get the default one"""
+        session = ScriptedSession([200, 200])
+        session.get('https://csdb.dk/')
+        session.get('https://csdb.dk/', timeout=1)
+
+        assert session.sent == [('GET', (3.05, 10.0)), ('GET', 1)]
+
+    def test_retries_get_with_backoff(self):
+        """Test that a GET is retried after connection errors and 503, with jittered backoff"""
+        session = ScriptedSession([requests.exceptions.ConnectionError("refused"), 503, 200])
+
+        assert session.get('https://csdb.dk/').status_code == 200
+        assert len(session.sent) == 3
+        assert 0 <= session.sleeps[0] <= 0.5
+        assert 0 <= session.sleeps[1] <= 1.0
+        assert session.stats()['retried'] == 2
+
+    def test_gives_up_after_retries(self):
+        """Test that the last error or response is passed on"""
+        session = ScriptedSession([503, 503, 503])
+        assert session.get('https://csdb.dk/').status_code == 503
+
+        session = ScriptedSession([requests.exceptions.Timeout("slow")] * 3)
+        with pytest.raises(requests.exceptions.Timeout):
+            session.get('https://csdb.dk/')
+
+    def test_no_retry_for_post_or_client_errors(self):
+        """Test that POSTs and 404s are sent once"""
+        session = ScriptedSession([requests.exceptions.ConnectionError("refused"), 404])
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.post('https://csdb.dk/')
+        assert session.get('https://csdb.dk/').status_code == 404
+        assert len(session.sent) == 2
+
+    def test_open_breaker_fails_fast(self):
+        """Test that an open breaker raises without sending, per host"""
+        session = ScriptedSession([500] * 5 + [200], retries=0,
+                                  breaker_factory=lambda: CircuitBreaker(min_calls=5))
+        for _ in range(5):
+            session.get('https://csdb.dk/')
+
+        with pytest.raises(CircuitOpenError, match="CSDB unavailable"):
+            session.get('https://csdb.dk/release/?id=1')
+        assert len(session.sent) == 5
+        assert session.get('https://example.org/').status_code == 200
+        assert session.stats()['breakers']['csdb.dk']['state'] == 'open'
+
+    def test_open_breaker_serves_stale_cache(self, tmp_path, clock):
+        """Test that the HTTP cache serves its stale copy while the breaker is open"""
+        from http_cache import HTTPCache
+        session = ScriptedSession([200], retries=0, breaker_factory=lambda: CircuitBreaker(min_calls=1))
+        cache = HTTPCache(session, ttls={'release': 10}, clock=clock)
+        cache.get('https://csdb.dk/release/?id=1', kind='release')
+        session.breaker('csdb.dk').record(False)
+        clock.now += 100
+
+        page = cache.get('https://csdb.dk/release/?id=1', kind='release')
+
+        assert page.stale
+        assert page.content == b'ok'
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves 'page <path>' for any path, 404 for /missing"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = f"page {self.path}".encode() * 1000
+        self.send_response(404 if self.path == '/missing' else 200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        if self.path == '/gzip':
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    s = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    s.daemon_threads = True
+    threading.Thread(target=s.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{s.server_address[1]}"
+    s.shutdown()
+    s.server_close()
+
+
+class TestSharedTransport:
+    """Test the process-wide session factory"""
+
+    def test_sessions_share_pool_and_breakers(self, server):
+        """Test that sessions share adapters and breakers but not headers"""
+        first, second = get_http_session(), get_http_session()
+        first.auth = ('user', 'secret')
+
+        assert first.get_adapter('https://csdb.dk/') is second.get_adapter('https://csdb.dk/')
+        assert first.breaker('csdb.dk') is second.breaker('csdb.dk')
+        assert second.auth is None
+        assert first.headers['User-Agent'] == 'C64-Cloud-Server/1.0'
+
+        # Closing one session leaves the shared pool usable
+        first.close()
+        assert second.get(f"{server}/a").text.startswith("page /a")
+
+    def test_dns_cache(self):
+        """Test that lookups are reused until the TTL expires"""
+        now = [0.0]
+        lookups = []
+        cache = DNSCache(60, resolve=lambda *args: lookups.append(args) or [args], clock=lambda: now[0])
+
+        cache('csdb.dk', 443)
+        cache('csdb.dk', 443)
+        cache('csdb.dk', 80)
+        now[0] = 61
+        cache('csdb.dk', 443)
+
+        assert lookups == [('csdb.dk', 443), ('csdb.dk', 80), ('csdb.dk', 443)]
+        assert cache.stats() == {'entries': 2, 'hits': 1, 'misses': 3}
+
+    def test_dns_cache_used_by_adapter_only(self, server):
+        """Test that the adapter's connections resolve through the cache and the process resolver is untouched"""
+        getaddrinfo = socket.getaddrinfo
+        lookups = []
+
+        def resolve(host, port, *args):
+            lookups.append(host)
+            return getaddrinfo('127.0.0.1', port, *args)
+
+        session = ResilientSession(retries=0)
+        session.mount('http://', SharedHTTPAdapter(max_retries=0, dns_cache=DNSCache(60, resolve=resolve)))
+        port = server.rsplit(':', 1)[1]
+
+        assert session.get(f"http://c64.invalid:{port}/a").text.startswith("page /a")
+        assert lookups == ['c64.invalid']
+        assert socket.getaddrinfo is getaddrinfo
+
+
+class TestHTTPXAdapter:
+    """Test the httpx transport behind a requests session"""
+
+    @pytest.fixture
+    def session(self):
+        pytest.importorskip('httpx')
+        session = ResilientSession(retries=0)
+        session.mount('http://', HTTPXAdapter(4, http2=False))
+        return session
+
+    def test_get_and_stream(self, session, server):
+        """Test that bodies, headers and streaming reads come through"""
+        resp = session.get(f"{server}/release")
+        assert resp.status_code == 200
+        assert resp.text == "page /release" * 1000
+        assert resp.headers['content-type'].startswith('text/plain')
+
+        with session.get(f"{server}/zip", stream=True) as resp:
+            body = b''.join(resp.iter_content(1024))
+        assert body == b"page /zip" * 1000
+
+        assert session.get(f"{server}/missing").status_code == 404
+
+    def test_connection_errors_map_to_requests(self, session):
+        """Test that httpx errors surface as requests exceptions"""
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(f"http://127.0.0.1:{port}/")
+
+    def test_decoded_body_drops_encoding_headers(self, session, server):
+        """Test that a decompressed body is not described by the compressed one's headers"""
+        resp = session.get(f"{server}/gzip")
+
+        assert resp.content == b"page /gzip" * 1000
+        assert 'Content-Encoding' not in resp.headers
+        assert 'Content-Length' not in resp.headers
+
+    def test_proxies_are_used(self, session, server):
+        """Test that proxies given to the request are not ignored"""
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(f"{server}/a", proxies={'http': f"http://127.0.0.1:{port}"})
+        assert session.get(f"{server}/a").status_code == 200
@@ -0,0 +1,205 @@
+"""
+Unit tests for the HTTP Range file adapter and lazy zip listing
+"""
+import io
+import os
+import re
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import csdb_handler
+from csdb_handler import CSDBHandler
+from download_store import DownloadStore
+from http_range_file import HTTPRangeFile, RangeNotSupportedError
+from shared_state import get_session_state, release_session_state
+
+
+def make_zip() -> bytes:
+    """A 5 MB demo zip: one large incompressible member and two small ones"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        z.writestr('demo.d64', os.urandom(5 * 1024 * 1024))
+        z.writestr('readme.txt', 'Released at X 2024')
+        z.writestr('intro.prg', b'\x01\x08' + b'\xea' * 100, compress_type=zipfile.ZIP_DEFLATED)
+    return buf.getvalue()
+
+
+class RangeServer(ThreadingHTTPServer):
+    """Local HTTP server serving one body, honouring Range unless disabled"""
+
+    daemon_threads = True
+
+    def __init__(self, body: bytes, ranges: bool = True):
+        super().__init__(('127.0.0.1', 0), RangeRequestHandler)
+        self.body = body
+        self.ranges = ranges
+        self.bytes_sent = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serves the server's body, or the requested byte range of it"""
+
+    def do_GET(self):
+        body = self.server.body
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+        if not self.server.ranges or not match:
+            self._send(200, body, {})
+            return
+        first, last = match.groups()
+        if first == '':
+            start, end = max(0, len(body) - int(last)), len(body) - 1
+        else:
+            start, end = int(first), min(int(last or len(body) - 1), len(body) - 1)
+        self._send(206, body[start:end + 1], {'Content-Range': f'bytes {start}-{end}/{len(body)}'})
+
+    def _send(self, status, data, headers):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+            self.server.bytes_sent += len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def zip_body():
+    return make_zip()
+
+
+def serve(body, ranges=True):
+    server = RangeServer(body, ranges)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def server(zip_body):
+    s = serve(zip_body)
+    yield s
+    s.shutdown()
+    s.server_close()
+
+
+class TestHTTPRangeFile:
+    """Test reading a remote file with Range requests"""
+
+    def test_reads_match_file(self, server, zip_body):
+        """Test that seeks and reads return the same bytes as the file"""
+        with requests.Session() as session:
+            f = HTTPRangeFile(session, server.url, tail_size=1024, readahead=4096)
+            assert f.size == len(zip_body)
+            f.seek(100)
+            assert f.read(10) == zip_body[100:110]
+            f.seek(-5, io.SEEK_END)
+            assert f.read() == zip_body[-5:]
+            assert f.read(1) == b''
+
+    def test_zip_listing_fetches_only_central_directory(self, server, zip_body):
+        """Test that listing a 5 MB zip transfers a few KB"""
+        with requests.Session() as session:
+            f = HTTPRangeFile(session, server.url)
+            with zipfile.ZipFile(f) as z:
+                assert z.namelist() == ['demo.d64', 'readme.txt', 'intro.prg']
+                assert z.read('intro.prg') == b'\x01\x08' + b'\xea' * 100
+
+        assert f.bytes_fetched < 100 * 1024
+        assert server.bytes_sent < 100 * 1024
+
+    def test_no_range_support(self, zip_body):
+        """Test that a server ignoring Range is detected without reading the whole body"""
+        server = serve(zip_body, ranges=False)
+        try:
+            with requests.Session() as session:
+                with pytest.raises(RangeNotSupportedError):
+                    HTTPRangeFile(session, server.url)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestLazyZip:
+    """Test cd into a zip and cp from it through Range requests"""
+
+    @pytest.fixture
+    def handler(self, server, tmp_path, monkeypatch):
+        monkeypatch.setattr(csdb_handler, 'CSDB_API_URL', server.url)
+        h = CSDBHandler()
+        h.downloads = DownloadStore(str(tmp_path))
+        yield h
+        h.downloads.close()
+        h.session.close()
+
+    def test_cd_and_cp_without_full_download(self, handler, server):
+        """Test that listing and copying a small member skip the large one"""
+        session_id = 9201
+        get_session_state(session_id).update(active_module='c', active_dir='release', active_id=1)
+        try:
+            listing = handler._cd_into_zip(77, session_id)
+            copied = handler._cp_file('*.prg', session_id)
+        finally:
+            release_session_state(session_id)
+
+        assert listing == "Contents of zip:\n  - demo.d64\n  - readme.txt\n  - intro.prg"
+        session_dir = handler.downloads.session_dir(session_id)
+        assert copied == f"Copied intro.prg to {session_dir}"
+        assert server.bytes_sent < 200 * 1024
+        assert handler.downloads.stats()['blobs'] == 0
+
+    def test_falls_back_to_download(self, handler, server):
+        """Test that a server without Range support gets the zip downloaded into the store"""
+        server.ranges = False
+        session_id = 9202
+        try:
+            listing = handler._cd_into_zip(78, session_id)
+        finally:
+            release_session_state(session_id)
+
+        assert listing.startswith("Contents of zip:\n  - demo.d64")
+        assert handler.downloads.stats()['blobs'] == 1
+
+    def test_large_zip_small_member(self, handler, server):
+        """Test that a zip over the download limit still lists and copies its small members"""
+        handler.max_download_bytes = 1024 * 1024
+        session_id = 9203
+        get_session_state(session_id).update(active_module='c', active_dir='release', active_id=1)
+        try:
+            listing = handler._cd_into_zip(79, session_id)
+            copied = handler._cp_file('*', session_id).split('\n')
+        finally:
+            release_session_state(session_id)
+
+        session_dir = handler.downloads.session_dir(session_id)
+        assert listing.startswith("Contents of zip:\n  - demo.d64")
+        assert copied[0].startswith("Failed to copy demo.d64: 5242880 bytes exceeds the limit")
+        assert copied[1:] == [f"Copied readme.txt to {session_dir}", f"Copied intro.prg to {session_dir}"]
+
+    def test_corrupt_member_fails_alone(self, handler, zip_body, monkeypatch):
+        """Test that a member failing its CRC check is reported and the others are still copied"""
+        corrupt = serve(zip_body.replace(b'Released at X 2024', b'Released at Y 2024'))
+        monkeypatch.setattr(csdb_handler, 'CSDB_API_URL', corrupt.url)
+        session_id = 9204
+        get_session_state(session_id).update(active_module='c', active_dir='release', active_id=1)
+        try:
+            handler._cd_into_zip(80, session_id)
+            copied = handler._cp_file('*.*', session_id).split('\n')
+        finally:
+            release_session_state(session_id)
+            corrupt.shutdown()
+            corrupt.server_close()
+
+        session_dir = handler.downloads.session_dir(session_id)
+        assert copied[1].startswith("Failed to copy readme.txt: Bad CRC-32")
+        assert copied[2] == f"Copied intro.prg to {session_dir}"
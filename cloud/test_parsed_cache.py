@@ -0,0 +1,97 @@
+"""
+Unit tests for the parsed CSDB page cache
+"""
+from csdb_handler import CSDBHandler
+from http_cache import HTTPCache
+from parsed_cache import ParsedCache, approx_size
+
+
+class TestParsedCache:
+    """Test lookups, digest checks and eviction"""
+
+    def test_get_returns_result_for_same_digest(self):
+        """Test that a result is only returned for the page body it came from"""
+        cache = ParsedCache()
+        result = {'name': 'Demo'}
+        cache.put('release', 1, 'abc', result)
+
+        assert cache.get('release', 1, 'abc') is result
+        assert cache.get('release', 1, 'def') is None
+        assert cache.get('group', 1, 'abc') is None
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 2
+
+    def test_evicts_least_recently_used_over_budget(self):
+        """Test that the memory budget evicts the oldest results"""
+        result = {'name': 'x' * 100}
+        cache = ParsedCache(max_bytes=approx_size(result) * 2)
+        cache.put('release', 1, 'a', result)
+        cache.put('release', 2, 'a', dict(result))
+        cache.get('release', 1, 'a')
+        cache.put('release', 3, 'a', dict(result))
+
+        assert cache.get('release', 1, 'a') is not None
+        assert cache.get('release', 2, 'a') is None
+        assert cache.stats()['evictions'] == 1
+
+
+class TestCSDBHandlerParsedCache:
+    """Test that CSDBHandler reuses parse results"""
+
+    def test_release_is_parsed_once(self, monkeypatch, page_session):
+        """Test that revisiting a release neither refetches nor reparses it"""
+        calls = []
+
+        def parse(xml):
+            calls.append(xml)
+            return {'name': 'Demo', 'files': []}
+
+        import csdb_handler
+        monkeypatch.setattr(csdb_handler, 'parse_release_xml', parse)
+        handler = CSDBHandler()
+        session = page_session(b'<CSDbData><Release><Name>Demo</Name></Release></CSDbData>')
+        handler.http_cache = HTTPCache(session)
+        handler.parsed_cache = ParsedCache()
+
+        first = handler._get_parsed_release_info(42)
+        second = handler._get_parsed_release_info(42)
+
+        assert first is second
+        assert len(calls) == 1
+        assert session.requests == 1
+
+    def test_release_page_fallback_is_parsed_once(self, monkeypatch, page_session):
+        """Test that the HTML page used when the webservice has no release is parsed once"""
+        calls = []
+
+        def parse(html):
+            calls.append(html)
+            return {'name': 'Demo', 'files': []}
+
+        import csdb_release_parser
+        monkeypatch.setattr(csdb_release_parser, 'parse_csdb_release_detail', parse)
+        handler = CSDBHandler()
+        session = page_session(b'<html>release</html>')
+        handler.http_cache = HTTPCache(session)
+        handler.parsed_cache = ParsedCache()
+
+        first = handler._get_parsed_release_info(42)
+        second = handler._get_parsed_release_info(42)
+
+        assert first is second
+        assert calls == ['<html>release</html>']
+        # One webservice and one page request
+        assert session.requests == 2
+
+    def test_changed_page_is_parsed_again(self, page_session):
+        """Test that a different page body is not answered from the parse cache"""
+        handler = CSDBHandler()
+        handler.http_cache = HTTPCache(page_session(b'one'), ttls={'find': 0})
+        handler.parsed_cache = ParsedCache()
+
+        first = handler._get_parsed('find', 'x', 'https://csdb.dk/search/?x', lambda html: {'html': html})
+        handler.http_cache.session.body = b'two'
+        second = handler._get_parsed('find', 'x', 'https://csdb.dk/search/?x', lambda html: {'html': html})
+
+        assert first == {'html': 'one'}
+        assert second == {'html': 'two'}
@@ -0,0 +1,242 @@
+"""
+Unit tests for background prefetching of CSDB entities
+"""
+import threading
+import pytest
+import requests
+from csdb_handler import CSDBHandler
+import http_client
+from http_client import ResilientSession
+from prefetcher import (PREFETCH_HOST_BURST, PREFETCH_TOP_K, Prefetcher, TokenBucket, get_prefetcher,
+                        prefetch_checkpoint)
+from shared_state import get_session_state, release_session_state
+
+
+class Gate:
+    """Fetch function recording its calls that blocks until opened"""
+
+    def __init__(self):
+        self.opened = threading.Event()
+        self.calls = []
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def fetch(self, key):
+        def run():
+            with self.lock:
+                self.calls.append(key)
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            self.opened.wait(5)
+            with self.lock:
+                self.running -= 1
+        return run
+
+
+@pytest.fixture
+def prefetcher():
+    p = Prefetcher(workers=2, host_rate=0, host_burst=100)
+    yield p
+    p.shutdown()
+
+
+class TestTokenBucket:
+    """Test the per-host politeness budget"""
+
+    def test_burst_then_rate(self, clock):
+        """Test that a burst is allowed and tokens come back at the rate"""
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+
+        assert [bucket.take() for _ in range(3)] == [True, True, False]
+        clock.now += 0.5
+        assert bucket.take()
+        assert not bucket.take()
+
+
+class TestPrefetcher:
+    """Test concurrency cap, budgets and cancellation"""
+
+    def test_concurrency_is_capped(self, prefetcher):
+        """Test that no more prefetches run at once than there are workers"""
+        gate = Gate()
+        prefetcher.submit(1, [(i, 'csdb.dk', gate.fetch(i)) for i in range(3)])
+        prefetcher.submit(2, [(i, 'csdb.dk', gate.fetch(i)) for i in range(3, 6)])
+        gate.opened.set()
+        prefetcher.shutdown(cancel=False)
+
+        assert gate.max_running <= 2
+        assert sorted(gate.calls) == list(range(6))
+        assert prefetcher.stats()['completed'] == 6
+
+    def test_host_budget_drops_prefetches(self):
+        """Test that prefetches over a host's budget are dropped, other hosts are not affected"""
+        gate = Gate()
+        gate.opened.set()
+        p = Prefetcher(workers=1, host_rate=0, host_burst=2)
+        p.submit(1, [(i, 'csdb.dk', gate.fetch(i)) for i in range(4)] + [(9, 'other', gate.fetch(9))])
+        p.shutdown(cancel=False)
+
+        assert gate.calls == [0, 1, 9]
+        assert p.stats()['throttled'] == 2
+
+    def test_new_batch_cancels_queued_prefetches(self):
+        """Test that a session's new batch replaces its queued prefetches"""
+        gate = Gate()
+        p = Prefetcher(workers=1, host_rate=0, host_burst=100)
+        p.submit(1, [(i, 'csdb.dk', gate.fetch(i)) for i in range(3)])
+        p.submit(1, [('new', 'csdb.dk', gate.fetch('new'))])
+        gate.opened.set()
+        p.shutdown(cancel=False)
+
+        # The first task may have started before the second batch came
+        assert gate.calls in (['new'], [0, 'new'])
+        assert p.covers(1, 'new') and not p.covers(1, 0)
+        assert p.stats()['cancelled'] == 4 - len(gate.calls)
+
+    def test_cancel(self, prefetcher):
+        """Test that cancelled prefetches do not run"""
+        gate = Gate()
+        blocker = Gate()
+        prefetcher.submit(1, [(i, 'csdb.dk', blocker.fetch(i)) for i in range(2)])
+        prefetcher.submit(2, [(i, 'csdb.dk', gate.fetch(i)) for i in range(3)])
+        prefetcher.cancel(2)
+        blocker.opened.set()
+        gate.opened.set()
+        prefetcher.shutdown(cancel=False)
+
+        assert gate.calls == []
+        assert not prefetcher.covers(2, 0)
+
+    def test_every_request_takes_a_token(self):
+        """Test that a prefetch's second request needs a token of its own"""
+        calls = []
+
+        def fetch():
+            calls.append('xml')
+            prefetch_checkpoint('csdb.dk')
+            calls.append('html')
+
+        p = Prefetcher(workers=1, host_rate=0, host_burst=3)
+        p.submit(1, [(i, 'csdb.dk', fetch) for i in range(2)])
+        p.shutdown(cancel=False)
+
+        assert calls == ['xml', 'html', 'xml']
+        assert p.stats()['completed'] == 1
+        assert p.stats()['throttled'] == 1
+        assert p.stats()['failed'] == 0
+
+    def test_cancel_stops_running_prefetch(self, prefetcher):
+        """Test that a prefetch cancelled during its first request makes no second one"""
+        started, gate = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch():
+            started.set()
+            gate.wait(5)
+            prefetch_checkpoint('csdb.dk')
+            calls.append('html')
+
+        prefetcher.submit(1, [(0, 'csdb.dk', fetch)])
+        assert started.wait(5)
+        prefetcher.cancel(1)
+        gate.set()
+        prefetcher.shutdown(cancel=False)
+
+        assert calls == []
+        assert prefetcher.stats()['cancelled'] == 1
+        assert prefetcher.stats()['completed'] == 0
+
+    def test_checkpoint_outside_prefetch(self):
+        """Test that requests users wait for are not charged"""
+        prefetch_checkpoint('csdb.dk')
+
+    def test_default_burst_covers_a_listing(self):
+        """Test that by default all top-K prefetches of one listing fit the host's burst"""
+        assert PREFETCH_HOST_BURST >= PREFETCH_TOP_K
+
+    def test_failures_do_not_open_shared_breaker(self):
+        """Test that failing prefetches count against the prefetcher's breakers only"""
+        class DownSession(ResilientSession):
+            def send(self, request, **kwargs):
+                raise requests.exceptions.ConnectionError("down")
+
+        session = DownSession(retries=0, breakers=http_client._breakers)
+        p = Prefetcher(workers=1, host_rate=0, host_burst=100)
+        p.submit(1, [(i, 'csdb.dk', lambda: session.get('https://csdb.dk/release/')) for i in range(10)])
+        p.shutdown(cancel=False)
+
+        assert p.stats()['failed'] == 10
+        assert p.breakers['csdb.dk'].state == 'open'
+        assert session.breaker('csdb.dk').state == 'closed'
+        assert session.breaker('csdb.dk').stats()['calls'] == 0
+
+
+class TestCSDBHandlerPrefetch:
+    """Test that the handler prefetches releases linked from listings and drops them when moving on"""
+
+    @pytest.fixture
+    def handler(self, prefetcher):
+        handler = CSDBHandler()
+        handler.prefetcher = prefetcher
+        handler.prefetch_top_k = 2
+        releases = [{'id': str(i), 'title': f"Release {i}"} for i in range(1, 6)]
+        handler._get_parsed_group_info = lambda group_id: {'name': 'Booze Design', 'releases': releases}
+        handler.fetched = []
+        handler._get_parsed_release_info = lambda release_id: (handler.fetched.append(release_id)
+                                                                or {'name': f"Release {release_id}"})
+        yield handler
+        handler.download_pool.shutdown()
+
+    def test_group_prefetches_top_releases(self, handler):
+        """Test that rendering a group prefetches its first releases"""
+        session_id = 9501
+        try:
+            handler.handle('c: group 1', session_id)
+            handler.prefetcher.shutdown(cancel=False)
+
+            assert sorted(handler.fetched) == [1, 2]
+            assert handler.prefetcher.covers(session_id, ('release', 2))
+        finally:
+            release_session_state(session_id)
+
+    def test_moving_elsewhere_cancels(self, handler):
+        """Test that opening a prefetched release keeps the batch and going elsewhere cancels it"""
+        session_id = 9502
+        try:
+            handler.handle('c: group 1', session_id)
+            handler.handle('cd /release/2', session_id)
+            assert handler.prefetcher.covers(session_id, ('release', 1))
+
+            handler.handle('cd /release/9', session_id)
+            assert not handler.prefetcher.covers(session_id, ('release', 1))
+        finally:
+            release_session_state(session_id)
+
+    def test_session_end_cancels(self):
+        """Test that ending a session cancels its prefetches"""
+        prefetcher = get_prefetcher()
+        session_id = 9503
+        get_session_state(session_id)
+        prefetcher.submit(session_id, [(('release', 1), 'csdb.dk', lambda: None)])
+
+        release_session_state(session_id)
+
+        assert not prefetcher.covers(session_id, ('release', 1))
+
+    def test_html_fallback_is_charged(self):
+        """Test that a prefetch whose webservice request fails needs another token for the HTML page"""
+        prefetcher = Prefetcher(workers=1, host_rate=0, host_burst=1)
+        handler = CSDBHandler()
+        handler.prefetcher = prefetcher
+        requested = []
+        handler._get_parsed = lambda kind, key, url, parse: requested.append(url) or {'error': 'no such release'}
+        try:
+            handler._prefetch_releases(['7'], 9504)
+            prefetcher.shutdown(cancel=False)
+        finally:
+            handler.download_pool.shutdown()
+
+        assert len(requested) == 1
+        assert 'webservice' in requested[0]
+        assert prefetcher.stats()['throttled'] == 1
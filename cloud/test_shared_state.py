@@ -0,0 +1,177 @@
+"""
+Unit tests for the shared session store
+"""
+import threading
+import pytest
+from session_backend import SQLiteSessionBackend
+from shared_state import SessionStore, new_session_id
+
+
+class TestSessionStore:
+    """Test SessionStore eviction, release and counters"""
+
+    def test_get_creates_and_reuses_state(self, clock):
+        """Test that the same session gets the same state dict"""
+        store = SessionStore(clock=clock)
+        state = store.get(1)
+        state['active_module'] = 'c'
+
+        assert store.get(1) is state
+        assert store.get(2)['active_module'] is None
+        assert store.stats()['created'] == 2
+
+    def test_lru_eviction(self, clock):
+        """Test that the least recently used session is evicted when full"""
+        store = SessionStore(max_sessions=2, clock=clock)
+        store.get(1)
+        store.get(2)
+        store.get(1)  # 2 is now least recently used
+        store.get(3)
+
+        assert 1 in store and 3 in store
+        assert 2 not in store
+        assert store.stats()['evicted_lru'] == 1
+
+    def test_idle_ttl_eviction(self, clock):
+        """Test that idle sessions expire and come back fresh"""
+        store = SessionStore(idle_ttl=10, clock=clock)
+        store.get(1)['zip_files'] = ['a.prg']
+        store.get(2)
+
+        clock.now += 5
+        store.get(2)
+        clock.now += 7
+        store.get(3)  # Sweeps session 1, idle for 12s
+
+        assert 1 not in store and 2 in store
+        clock.now += 18
+        assert store.get(2)['zip_files'] is None
+        assert store.stats()['evicted_ttl'] == 3  # 1, then 2 and 3
+
+    def test_release_runs_listeners(self, clock):
+        """Test explicit release and release listeners"""
+        store = SessionStore(max_sessions=1, clock=clock)
+        released = []
+        store.add_release_listener(lambda sid, state: released.append(sid))
+
+        store.get(1)
+        assert store.release(1)
+        assert not store.release(1)
+        store.get(2)
+        store.get(3)  # Evicts 2
+
+        assert released == [1, 2]
+        assert store.stats()['released'] == 1
+        assert len(store) == 1
+
+    def test_concurrent_access(self):
+        """Test that concurrent access keeps the store within its bound"""
+        store = SessionStore(max_sessions=50)
+
+        def worker(base):
+            for i in range(200):
+                store.get(base + i % 80)
+                with store.session_lock(base):
+                    store.get(base)['active_id'] = i
+
+        threads = [threading.Thread(target=worker, args=(n * 1000,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = store.stats()
+        assert stats['size'] <= 50
+        assert stats['created'] - stats['evicted_lru'] == stats['size']
+
+    def test_session_lock_survives_eviction(self):
+        """Test that getting a lock while other threads evict the session never fails"""
+        store = SessionStore(max_sessions=1)
+        errors = []
+
+        def worker(session_id):
+            try:
+                for _ in range(300):
+                    with store.session_lock(session_id):
+                        pass
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+
+    def test_new_session_ids_are_unique(self):
+        """Test that session IDs are never reused"""
+        ids = {new_session_id() for _ in range(100)}
+        assert len(ids) == 100
+
+
+@pytest.fixture
+def backend(tmp_path):
+    db = SQLiteSessionBackend(str(tmp_path / 'sessions.db'), flush_interval=60)
+    yield db
+    db.close()
+
+
+class TestSQLiteSessionBackend:
+    """Test persistent sessions and the resume handshake"""
+
+    def test_save_survives_restart(self, tmp_path):
+        """Test that flushed state is loaded by a new backend on the same file"""
+        path = str(tmp_path / 'sessions.db')
+        db = SQLiteSessionBackend(path)
+        db.save('00112233445566aa', {'active_module': 'c', 'active_dir': 'release',
+                                     'active_id': 248345, 'response_stream': object()})
+        db.close()
+
+        db = SQLiteSessionBackend(path)
+        state = db.load('00112233445566aa')
+        db.close()
+
+        assert state['active_dir'] == 'release'
+        assert state['active_id'] == 248345
+        assert 'response_stream' not in state
+
+    def test_writes_are_batched(self, backend):
+        """Test that saves are queued and coalesced until flushed"""
+        for i in range(5):
+            backend.save('aaaaaaaaaaaaaaaa', {'active_id': i})
+
+        assert backend.writes == 0
+        assert backend.load('aaaaaaaaaaaaaaaa')['active_id'] == 4  # Served from the queue
+        backend.flush()
+        assert backend.writes == 1
+        assert backend.flushes == 1
+
+    def test_resume_restores_state(self, backend):
+        """Test that a token issued to one connection restores state on another"""
+        store = SessionStore()
+        store.backend = backend
+
+        token = store.resume(1, '')
+        state = store.get(1)
+        state.update({'active_module': 'c', 'active_dir': 'group', 'active_id': 901})
+        store.persist(1)
+        store.release(1)
+
+        assert store.resume(2, token) == token
+        assert store.get(2)['active_id'] == 901
+        assert store.get(2)['active_module'] == 'c'
+
+    def test_unknown_token_gets_new_one(self, backend):
+        """Test that an unknown or malformed token is replaced"""
+        store = SessionStore()
+        store.backend = backend
+
+        token = store.resume(1, 'ffffffffffffffff')
+        assert token != 'ffffffffffffffff'
+        assert store.resume(2, "'; drop table sessions; --") not in (None, '')
+
+    def test_resume_without_backend(self):
+        """Test that resume is a no-op without a persistent backend"""
+        assert SessionStore().resume(1, '') is None
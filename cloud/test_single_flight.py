@@ -0,0 +1,107 @@
+"""
+Unit tests for single-flight call coalescing
+"""
+import threading
+import time
+import requests
+from http_cache import HTTPCache
+from single_flight import SingleFlight
+
+
+def _run_concurrently(count, target):
+    """Start count threads running target and wait for them"""
+    results = [None] * count
+    errors = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    return results, errors
+
+
+class TestSingleFlight:
+    """Test sharing of concurrent calls"""
+
+    def test_concurrent_calls_share_one_run(self):
+        """Test that callers arriving while a call runs get its result"""
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def slow():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return {'id': 1}
+
+        leader = threading.Thread(target=flights.do, args=('release/1', slow))
+        leader.start()
+        started.wait(5)
+        waiters = threading.Thread(target=lambda: _run_concurrently(5, lambda: flights.do('release/1', slow)))
+        waiters.start()
+        time.sleep(0.1)
+        release.set()
+        leader.join(5)
+        waiters.join(5)
+
+        assert len(runs) == 1
+        assert flights.stats() == {'in_flight': 0, 'calls': 1, 'shared': 5}
+
+    def test_error_reaches_all_waiters(self):
+        """Test that an exception of the running call is raised in every waiter"""
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise ValueError("parse failed")
+
+        threading.Timer(0.1, release.set).start()
+        results, errors = _run_concurrently(3, lambda: flights.do('k', failing))
+
+        assert all(isinstance(e, ValueError) for e in errors)
+        assert flights.stats()['in_flight'] == 0
+
+    def test_sequential_calls_run_again(self):
+        """Test that only concurrent calls are shared, not later ones"""
+        flights = SingleFlight()
+
+        assert flights.do('k', lambda: 1) == 1
+        assert flights.do('k', lambda: 2) == 2
+        assert flights.stats()['shared'] == 0
+
+
+class TestHTTPCacheCoalescing:
+    """Test that concurrent misses for one URL cause one request"""
+
+    def test_concurrent_misses_fetch_once(self):
+        """Test that sessions opening the same page at once share the fetch"""
+        count = []
+
+        class SlowSession:
+            def get(self, url, headers=None, timeout=None):
+                count.append(url)
+                time.sleep(0.2)
+                resp = requests.Response()
+                resp.status_code = 200
+                resp._content = b'release'
+                resp.encoding = 'utf-8'
+                return resp
+
+        cache = HTTPCache(SlowSession())
+        results, errors = _run_concurrently(
+            8, lambda: cache.get('https://csdb.dk/release/?id=1', kind='release'))
+
+        assert errors == [None] * 8
+        assert {r.text for r in results} == {'release'}
+        assert len(count) == 1
+        assert cache.stats()['coalesced'] == 7
@@ -0,0 +1,114 @@
+"""
+Tests for the pre-forking worker pool
+"""
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from worker_pool import WorkerPool
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='os.fork not available')
+
+
+def _wait_for(predicate, timeout=5.0):
+    """Poll until predicate() is true or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _start(pool):
+    """Run the pool supervisor in a background thread"""
+    thread = threading.Thread(target=pool.run, kwargs={'install_signals': False}, daemon=True)
+    thread.start()
+    return thread
+
+
+class TestWorkerPool:
+    """Test worker supervision, restarts and shutdown"""
+
+    def test_starts_workers_and_stops_them(self, tmp_path):
+        """Test that all workers run and exit on stop()"""
+        def target(index):
+            (tmp_path / f"worker{index}").write_text(str(os.getpid()))
+            while True:
+                time.sleep(0.1)
+
+        pool = WorkerPool(target, workers=3, shutdown_timeout=5)
+        thread = _start(pool)
+
+        assert _wait_for(lambda: len(list(tmp_path.iterdir())) == 3)
+        pool.stop()
+        thread.join(timeout=10)
+
+        assert not thread.is_alive()
+        assert pool.children == {}
+        assert pool.restarts == 0
+
+    def test_restarts_crashed_worker(self, tmp_path):
+        """Test that a worker that dies is started again"""
+        def target(index):
+            starts = tmp_path / "starts"
+            with open(starts, 'a') as f:
+                f.write('x')
+            if len(starts.read_text()) == 1:
+                raise RuntimeError("crash on first start")
+            while True:
+                time.sleep(0.1)
+
+        pool = WorkerPool(target, workers=1, restart_delay=0.05, shutdown_timeout=5)
+        thread = _start(pool)
+
+        assert _wait_for(lambda: pool.restarts == 1)
+        assert _wait_for(lambda: (tmp_path / "starts").read_text() == 'xx')
+        pool.stop()
+        thread.join(timeout=10)
+
+        assert not thread.is_alive()
+
+    def test_kills_workers_that_do_not_drain(self, tmp_path):
+        """Test that workers ignoring SIGTERM are killed after the shutdown timeout"""
+        def target(index):
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            (tmp_path / "ready").write_text('1')
+            while True:
+                time.sleep(0.1)
+
+        pool = WorkerPool(target, workers=1, shutdown_timeout=0.3)
+        thread = _start(pool)
+
+        assert _wait_for(lambda: (tmp_path / "ready").exists())
+        pool.stop()
+        thread.join(timeout=10)
+
+        assert not thread.is_alive()
+        assert pool.children == {}
+
+    def test_signal_is_handled_by_the_supervisor(self, tmp_path, caplog):
+        """Test that the signal handler only records the signal and the supervising loop stops the workers"""
+        def target(index):
+            (tmp_path / "ready").write_text('1')
+            while True:
+                time.sleep(0.1)
+
+        pool = WorkerPool(target, workers=1, shutdown_timeout=5)
+        pool._on_signal(signal.SIGTERM, None)
+        assert caplog.records == []
+        assert pool._signalled == signal.SIGTERM
+        pool._signalled = None
+
+        thread = _start(pool)
+        assert _wait_for(lambda: (tmp_path / "ready").exists())
+        with caplog.at_level('INFO', logger='worker_pool'):
+            pool._on_signal(signal.SIGTERM, None)
+            thread.join(timeout=10)
+
+        assert not thread.is_alive()
+        assert pool.children == {}
+        assert f"Received signal {signal.SIGTERM}" in caplog.text
@@ -0,0 +1,182 @@
+"""
+Pre-forking worker pool for the C64 Cloud Server
+
+Forks N worker processes that each run a complete server listening on the
+same port with SO_REUSEPORT. The kernel spreads new connections across the
+workers, and a connection stays with its worker for its whole lifetime.
+The master process only supervises: it restarts workers that die, and on
+SIGTERM/SIGINT it forwards SIGTERM so every worker drains and exits.
+"""
+import logging
+import os
+import signal
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """Supervises pre-forked server worker processes"""
+
+    # Seconds between checks for exited workers
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, worker_target: Callable[[int], None], workers: int,
+                 restart_delay: float = 1.0, max_restart_delay: float = 30.0,
+                 shutdown_timeout: float = 15.0):
+        """
+        Initialize the pool
+
+        Args:
+            worker_target: Function run in each worker with its index; returns when the worker should exit
+            workers: Number of worker processes
+            restart_delay: Initial delay before restarting a worker that crashed right after starting
+            max_restart_delay: Upper bound for the doubling restart delay
+            shutdown_timeout: Seconds to wait for workers to drain before killing them
+        """
+        self.worker_target = worker_target
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.running = False
+        self.restarts = 0
+        # pid -> (worker index, start time)
+        self.children: Dict[int, Tuple[int, float]] = {}
+        self._delays: Dict[int, float] = {}
+        # Signal received by the master; the supervising loop acts on it
+        self._signalled: Optional[int] = None
+
+    def run(self, install_signals: bool = True):
+        """
+        Start all workers and supervise them until stop() is called
+
+        Args:
+            install_signals: Handle SIGTERM/SIGINT in this process (main thread only)
+        """
+        if install_signals:
+            signal.signal(signal.SIGTERM, self._on_signal)
+            signal.signal(signal.SIGINT, self._on_signal)
+
+        self.running = True
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Started {self.workers} workers")
+
+        # Poll rather than block in waitpid(), so stop() takes effect even
+        # when no worker exits in response to it
+        while self.running:
+            if self._handle_signal():
+                break
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            if pid not in self.children:
+                continue
+
+            index, started = self.children.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if not self.running:
+                logger.info(f"Worker {index} (pid {pid}) exited with {code}")
+                break
+
+            logger.error(f"Worker {index} (pid {pid}) died with {code}, restarting")
+            # Back off when a worker keeps crashing right after it starts
+            if time.monotonic() - started < self.max_restart_delay:
+                delay = self._delays.get(index, 0) * 2 or self.restart_delay
+                self._delays[index] = min(delay, self.max_restart_delay)
+            else:
+                self._delays[index] = 0
+            self._sleep(self._delays[index])
+            if self.running:
+                self.restarts += 1
+                self._spawn(index)
+
+        self._reap(time.monotonic() + self.shutdown_timeout)
+        logger.info("All workers stopped")
+
+    def stop(self):
+        """Ask all workers to drain and exit (not from a signal handler, see _on_signal)"""
+        if not self.running:
+            return
+        self.running = False
+        logger.info(f"Stopping {len(self.children)} workers...")
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM)
+
+    def _reap(self, deadline: float):
+        """Wait for stopped workers to exit, killing those still running at the deadline"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if time.monotonic() >= deadline:
+                    for pid in list(self.children):
+                        logger.warning(f"Worker pid {pid} did not drain in time, killing it")
+                        self._kill(pid, signal.SIGKILL)
+                    deadline = float('inf')
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            if pid in self.children:
+                index, _ = self.children.pop(pid)
+                logger.info(
+                    f"Worker {index} (pid {pid}) exited with {os.waitstatus_to_exitcode(status)}")
+
+    def _spawn(self, index: int):
+        """Fork one worker process"""
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                # The master coordinates shutdown; workers only react to SIGTERM
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                self.worker_target(index)
+            except BaseException:
+                logger.exception(f"Worker {index} failed")
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+
+        self.children[pid] = (index, time.monotonic())
+        logger.info(f"Worker {index} started with pid {pid}")
+
+    def _kill(self, pid: int, sig: int):
+        """Send a signal to a worker that may already have exited"""
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _sleep(self, seconds: float):
+        """Sleep in poll intervals, returning early once stopped or signalled"""
+        deadline = time.monotonic() + seconds
+        while self.running and self._signalled is None and time.monotonic() < deadline:
+            time.sleep(min(self.POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    def _handle_signal(self) -> bool:
+        """Stop the workers if a signal arrived; True when one did"""
+        signum = self._signalled
+        if signum is None:
+            return False
+        self._signalled = None
+        logger.info(f"Received signal {signum}")
+        self.stop()
+        return True
+
+    def _on_signal(self, signum, frame):
+        """
+        SIGTERM/SIGINT handler of the master process
+
+        Only records the signal: logging takes locks the interrupted code may
+        hold, so the supervising loop logs and stops the workers.
+        """
+        self._signalled = signum